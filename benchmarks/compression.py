@@ -0,0 +1,95 @@
+"""
+Benchmark the write time and file size of each of the wxrx-raw compression
+presets.
+
+Usage:
+    python benchmarks/compression.py [--records N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from netCDF4 import Dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxrx.arinc import Arinc708Batch, ARINC708_HEADER_DTYPE, ARINC708_NUM_BINS
+from wxrx.netcdf import COMPRESSION_PRESETS, NetCDFWriter
+
+
+def make_core_file(path: str) -> None:
+    """
+    Write a minimal core file, providing the metadata used by the writer.
+    """
+    with Dataset(path, 'w') as nc:
+        nc.flight_number = 'x999'
+        nc.flight_date = '2023-01-01'
+
+
+def make_records(n: int, seed: int = 0) -> tuple[np.ndarray, Arinc708Batch]:
+    """
+    Make n records of plausible radar data: a sweeping antenna, and reflectivity
+    which is mostly clear air with a few bands of precipitation.
+    """
+    rng = np.random.default_rng(seed)
+
+    times = 1672531200 + np.arange(n) / 100
+
+    fields = np.zeros(n, dtype=ARINC708_HEADER_DTYPE)
+    fields['label'] = 0xb4
+    fields['operating_mode'] = 1
+    fields['gain'] = 0
+    fields['range'] = 16
+    fields['tilt'] = 4
+    fields['data_accept'] = 3
+    # The 12 bit scan angle wraps through zero as the antenna sweeps either side
+    # of straight ahead
+    fields['scan_angle'] = (np.abs((np.arange(n) * 8) % 1536 - 768) + 3712) % 4096
+
+    reflectivity = np.zeros((n, ARINC708_NUM_BINS), dtype=np.uint8)
+    starts = rng.integers(0, ARINC708_NUM_BINS, n)
+    lengths = rng.integers(0, 128, n)
+    bins = np.arange(ARINC708_NUM_BINS)
+    bands = (bins >= starts[:, np.newaxis]) & (bins < (starts + lengths)[:, np.newaxis])
+    reflectivity[bands] = rng.integers(1, 5, bands.sum())
+
+    return times, Arinc708Batch(fields, reflectivity)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=200_000,
+                        help='The number of records to write')
+    parser.add_argument('--block', type=int, default=4096,
+                        help='The number of records in each call to write_messages')
+    args = parser.parse_args()
+
+    times, batch = make_records(args.records)
+
+    print(f'{"preset":<10} {"write (s)":>10} {"size (MB)":>10} {"records/s":>12}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        corefile = os.path.join(tmpdir, 'core.nc')
+        make_core_file(corefile)
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            for name in COMPRESSION_PRESETS:
+                start = time.perf_counter()
+                with NetCDFWriter(corefile, compression=name) as nc:
+                    for i in range(0, args.records, args.block):
+                        s = slice(i, i + args.block)
+                        nc.write_messages(times[s], batch[s])
+                elapsed = time.perf_counter() - start
+
+                size = os.path.getsize(nc.filename) / 1e6
+                os.remove(nc.filename)
+                print(f'{name:<10} {elapsed:>10.2f} {size:>10.1f} {args.records / elapsed:>12.0f}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
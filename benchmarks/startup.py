@@ -0,0 +1,90 @@
+"""
+Check the startup time of the command line scripts, using python -X importtime.
+
+The scripts should only import the processing modules, and the heavy modules
+they depend on, once their arguments have been parsed. This fails if any of
+those modules is imported by the scripts themselves, or if the total import
+time is over --max-ms.
+
+Usage:
+    python benchmarks/startup.py [--max-ms MS] [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SCRIPTS = ('faam_wxrx', 'faam_wxrx_batch')
+
+# Modules which must not be imported before the arguments are parsed
+DEFERRED_MODULES = ('tqdm', 'pandas', 'netCDF4', 'faam_data', 'vocal')
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Import a module in a new interpreter, and return the cumulative import time
+    of every module imported, in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def help_time(script: str, repeat: int) -> float:
+    """
+    Returns the best wall clock time of running a script with --help, in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, f'{script}.py', '--help'], cwd=ROOT,
+                       capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='The maximum import time of each script, in milliseconds')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='The number of times --help is run, taking the best')
+    args = parser.parse_args()
+
+    failed = False
+    print(f'{"script":<16} {"import (ms)":>12} {"--help (ms)":>12}  slowest imports')
+    for script in SCRIPTS:
+        times = import_times(script)
+        total = times[script] / 1000
+        slowest = sorted(
+            ((t, name) for name, t in times.items() if name != script and '.' not in name),
+            reverse=True
+        )[:3]
+        print(f'{script:<16} {total:>12.0f} {help_time(script, args.repeat) * 1000:>12.0f}  '
+              + ', '.join(f'{name} ({t / 1000:.0f})' for t, name in slowest))
+
+        imported = [name for name in DEFERRED_MODULES if name in times]
+        if imported:
+            print(f'  {script} imports {", ".join(imported)} before parsing its arguments')
+            failed = True
+        if args.max_ms is not None and total > args.max_ms:
+            print(f'  {script} takes longer than {args.max_ms:.0f} ms to import')
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Generate a synthetic flight of raw WxRx data: tmp files of ARINC 708 messages,
+with junk bytes between some of them, the log file giving the size of each tmp
+file once per second, and a minimal core file.
+
+Usage:
+    python benchmarks/synthetic.py DIRECTORY [--size MB] [--tmpfiles N] [--seed N]
+"""
+import argparse
+import dataclasses
+import datetime
+import os
+import sys
+
+import numpy as np
+from netCDF4 import Dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from wxrx.arinc import (
+    Arinc708Batch, ARINC708_DELINIATOR, ARINC708_HEADER_BYTES, ARINC708_HEADER_DTYPE,
+    ARINC708_LENGTH_BYTES, ARINC708_NUM_BINS, SCAN_ANGLES
+)
+from wxrx.read_wxrx import HEADER_LAYOUT
+
+# The encoded gain and range values of the lookup tables in wxrx.converters
+GAIN_CODES = (63, 0, 5, 11, 62)
+RANGE_CODES = (1, 2, 4, 8, 16, 32, 63, 0)
+
+# The number of messages recorded each second
+MESSAGES_PER_SECOND = 100
+
+# The number of messages generated at once
+CHUNK_MESSAGES = 65536
+
+# The time at which the synthetic flight starts
+START_TIME = datetime.datetime(2023, 1, 1, 10, 0, 0)
+
+
+@dataclasses.dataclass
+class SyntheticFlight:
+    """
+    The files of a synthetic flight, and the number of messages written.
+    """
+    directory: str
+    logfile: str
+    corefile: str
+    tmpfiles: list[str]
+    messages: int
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the total size of the tmp files, in bytes.
+        """
+        return sum(os.path.getsize(os.path.join(self.directory, f)) for f in self.tmpfiles)
+
+
+def make_fields(n: int, rng: np.random.Generator, first: int = 0) -> np.ndarray:
+    """
+    Make the header fields of n messages: a valid label, gain and range, and an
+    antenna sweeping back and forth through +/- 60 degrees.
+
+    Args:
+        n (int): The number of messages
+        rng (np.random.Generator): The random number generator
+        first (int): The index of the first message in the flight
+
+    Returns:
+        np.ndarray: The header fields, with dtype ARINC708_HEADER_DTYPE
+    """
+    fields = np.zeros(n, dtype=ARINC708_HEADER_DTYPE)
+    fields['label'] = ARINC708_DELINIATOR
+    fields['control_accept'] = 3
+    fields['operating_mode'] = 1
+    fields['data_accept'] = 3
+    fields['stabilization'] = 1
+
+    # Settings change every few minutes
+    setting = (first + np.arange(n)) // (MESSAGES_PER_SECOND * 180)
+    fields['gain'] = np.asarray(GAIN_CODES)[setting % len(GAIN_CODES)]
+    fields['range'] = np.asarray(RANGE_CODES)[setting * 3 % len(RANGE_CODES)]
+    fields['tilt'] = (setting % 8) * 4
+
+    sweep = np.abs((first + np.arange(n)) % 240 - 120) - 60
+    fields['scan_angle'] = np.round(sweep / SCAN_ANGLES[-1]).astype(np.int64) % 4096
+
+    fields['faults'] = rng.random(n) < 0.001
+    return fields
+
+
+def make_reflectivity(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Make the reflectivity of n messages: mostly clear air, with a band of
+    precipitation in some rays.
+
+    Args:
+        n (int): The number of messages
+        rng (np.random.Generator): The random number generator
+
+    Returns:
+        np.ndarray: The (N, 512) reflectivity, in output bin order
+    """
+    starts = rng.integers(0, ARINC708_NUM_BINS, n)
+    lengths = rng.integers(0, 160, n) * (rng.random(n) < 0.6)
+    bins = np.arange(ARINC708_NUM_BINS)
+    bands = (bins >= starts[:, np.newaxis]) & (bins < (starts + lengths)[:, np.newaxis])
+
+    reflectivity = np.zeros((n, ARINC708_NUM_BINS), dtype=np.uint8)
+    reflectivity[bands] = rng.integers(1, 8, bands.sum())
+    return reflectivity
+
+
+def encode_messages(batch: Arinc708Batch) -> np.ndarray:
+    """
+    Encode messages as raw ARINC 708 frames. This is the inverse of
+    parse_messages.
+
+    Args:
+        batch (Arinc708Batch): The messages
+
+    Returns:
+        np.ndarray: The (N, 200) uint8 frames
+    """
+    n = len(batch)
+
+    header = np.zeros(n, dtype=np.uint64)
+    for name, shift, mask in HEADER_LAYOUT:
+        header |= (batch.header[name].astype(np.uint64) & np.uint64(mask)) << np.uint64(shift)
+
+    # Each 3 bytes hold 8 data points, in output bin order
+    points = batch.reflectivity.reshape(n, -1, 8).astype(np.uint32)
+    words = np.zeros(points.shape[:2], dtype=np.uint32)
+    for i in range(8):
+        words |= (points[..., i] & 0x7) << np.uint32(3 * i)
+
+    frames = np.empty((n, ARINC708_LENGTH_BYTES), dtype=np.uint8)
+    frames[:, :ARINC708_HEADER_BYTES] = header.astype('<u8').view(np.uint8).reshape(n, -1)
+    frames[:, ARINC708_HEADER_BYTES:] = words.astype('<u4').view(np.uint8).reshape(n, -1, 4)[..., :3].reshape(n, -1)
+    return frames
+
+
+def make_tmp_data(n: int, rng: np.random.Generator, first: int = 0, junk: float = 0.01,
+                  junk_labels: bool = False) -> bytes:
+    """
+    Make the contents of a tmp file of n messages, with runs of junk bytes
+    before a fraction of them.
+
+    Args:
+        n (int): The number of messages
+        rng (np.random.Generator): The random number generator
+        first (int): The index of the first message in the flight
+        junk (float): The fraction of messages preceded by junk
+        junk_labels (bool): Whether junk may contain the message label. If not,
+            every message is found by the scanner. Defaults to False.
+
+    Returns:
+        bytes: The raw data
+    """
+    frames = encode_messages(Arinc708Batch(make_fields(n, rng, first), make_reflectivity(n, rng)))
+
+    lengths = rng.integers(1, 300, n) * (rng.random(n) < junk)
+    junk_bytes = rng.integers(0, 256, lengths.sum(), dtype=np.uint8)
+    if not junk_labels:
+        junk_bytes[junk_bytes == ARINC708_DELINIATOR] = 0
+
+    # Insert each run of junk before its message
+    pieces = []
+    previous = 0
+    position = 0
+    for i in np.flatnonzero(lengths):
+        pieces.append(frames[previous:i].ravel())
+        pieces.append(junk_bytes[position:position + lengths[i]])
+        position += lengths[i]
+        previous = i
+    pieces.append(frames[previous:].ravel())
+    return np.concatenate(pieces).tobytes()
+
+
+def make_core_file(path: str) -> None:
+    """
+    Write a minimal core file, providing the metadata used by the writer.
+    """
+    with Dataset(path, 'w') as nc:
+        nc.flight_number = 'x999'
+        nc.flight_date = START_TIME.strftime('%Y-%m-%d')
+
+
+def make_flight(directory: str, size: float = 16.0, tmpfiles: int = 2, seed: int = 0,
+                junk: float = 0.01, junk_labels: bool = False) -> SyntheticFlight:
+    """
+    Write a synthetic flight.
+
+    Args:
+        directory (str): The directory to write the flight to. It is created if
+            it does not exist.
+        size (float): The total size of the tmp files, in MB
+        tmpfiles (int): The number of tmp files
+        seed (int): The seed of the random number generator
+        junk (float): The fraction of messages preceded by junk
+        junk_labels (bool): Whether junk may contain the message label
+
+    Returns:
+        SyntheticFlight: The flight
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    per_file = max(1, int(size * 1e6 / ARINC708_LENGTH_BYTES / tmpfiles))
+    names = [f'{i + 1:05d}.tmp' for i in range(tmpfiles)]
+
+    lines = []
+    time = START_TIME
+    for i, name in enumerate(names):
+        with open(os.path.join(directory, name), 'wb') as f:
+            for j in range(0, per_file, CHUNK_MESSAGES):
+                n = min(CHUNK_MESSAGES, per_file - j)
+                f.write(make_tmp_data(n, rng, i * per_file + j, junk, junk_labels))
+            length = f.tell()
+
+        # Log the size of the file once a second, as it is recorded
+        step = MESSAGES_PER_SECOND * ARINC708_LENGTH_BYTES
+        for recorded in list(range(0, length, step)) + [length]:
+            lines.append(f'{time:%Y-%m-%d %H:%M:%S},{recorded},{name}')
+            time += datetime.timedelta(seconds=1)
+
+    logfile = os.path.join(directory, 'flight.log')
+    with open(logfile, 'w') as f:
+        # The same four line header as a recorded log, ending with the columns
+        f.write('WxRx synthetic flight\n')
+        f.write(f'Seed {seed}, {junk:g} junk\n')
+        f.write(f'Started {START_TIME:%Y-%m-%d %H:%M:%S}\n')
+        f.write('time,size,file\n')
+        f.write('\n'.join(lines) + '\n')
+
+    corefile = os.path.join(directory, 'core_faam_20230101_v005_r0_x999_1hz.nc')
+    make_core_file(corefile)
+
+    return SyntheticFlight(directory, logfile, corefile, names, per_file * tmpfiles)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', help='The directory to write the flight to')
+    parser.add_argument('--size', type=float, default=16.0,
+                        help='The total size of the tmp files, in MB')
+    parser.add_argument('--tmpfiles', type=int, default=2, help='The number of tmp files')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed')
+    parser.add_argument('--junk', type=float, default=0.01,
+                        help='The fraction of messages preceded by junk bytes')
+    parser.add_argument('--junk-labels', action='store_true', default=False,
+                        help='Allow junk bytes to contain the message label')
+    args = parser.parse_args()
+
+    flight = make_flight(args.directory, args.size, args.tmpfiles, args.seed, args.junk,
+                         args.junk_labels)
+    print(f'Wrote {flight.messages} messages, {flight.size / 1e6:.1f} MB, to {flight.directory}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark each stage of processing, and the end to end throughput, on synthetic
+flights of several sizes.
+
+The stages are parsing the log file, scanning for messages, decoding them,
+timestamping them and writing them to the output file, each of which is timed
+over the whole flight. The per message functions, parse_message, time_at_size
+and write_message, are timed over a sample of messages. Throughput is given in
+MB of tmp file per second.
+
+Usage:
+    python benchmarks/throughput.py [--sizes MB [MB ...]] [--sample N] [--repeat N]
+"""
+import argparse
+from collections.abc import Callable
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from synthetic import make_flight, SyntheticFlight
+from wxrx.netcdf import NetCDFWriter
+from wxrx.read_wxrx import (
+    BLOCK_MESSAGES, extract_messages, load_tmp_file, parse_message, parse_messages, process,
+    scan_offsets
+)
+from wxrx.timer import LogIndex, Timer, epoch_seconds
+
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    """
+    Change the working directory for the duration of the context.
+    """
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def best_time(func: Callable[[], Any], repeat: int) -> float:
+    """
+    Returns the best time of several calls to a function, in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_flight(flight: SyntheticFlight, sample: int, repeat: int) -> list[tuple[str, float, int]]:
+    """
+    Time each stage of processing a flight.
+
+    Args:
+        flight (SyntheticFlight): The flight
+        sample (int): The number of messages over which per message functions
+            are timed
+        repeat (int): The number of times each stage is run, taking the best
+
+    Returns:
+        list[tuple[str, float, int]]: The name, time in seconds and number of
+        messages of each stage
+    """
+    results = []
+
+    with working_directory(flight.directory):
+        log_index = LogIndex.from_file(flight.logfile)
+        results.append(('log', best_time(lambda: LogIndex.from_file(flight.logfile), repeat),
+                        flight.messages))
+
+        data = {name: load_tmp_file(name) for name in flight.tmpfiles}
+        offsets = {name: scan_offsets(data[name]) for name in flight.tmpfiles}
+        results.append(('scan', best_time(
+            lambda: [scan_offsets(d) for d in data.values()], repeat
+        ), flight.messages))
+
+        def decode() -> None:
+            for name in flight.tmpfiles:
+                for i in range(0, len(offsets[name]), BLOCK_MESSAGES):
+                    parse_messages(extract_messages(data[name], offsets[name][i:i + BLOCK_MESSAGES]))
+        results.append(('decode', best_time(decode, repeat), flight.messages))
+
+        timers = {name: Timer(log_index, name) for name in flight.tmpfiles}
+        results.append(('timestamp', best_time(
+            lambda: [epoch_seconds(timers[n].times_at_sizes(offsets[n])) for n in flight.tmpfiles],
+            repeat
+        ), flight.messages))
+
+        name = flight.tmpfiles[0]
+        batch = parse_messages(extract_messages(data[name], offsets[name]))
+        times = epoch_seconds(timers[name].times_at_sizes(offsets[name]))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            def write() -> None:
+                with NetCDFWriter(flight.corefile, output_dir=output_dir) as nc:
+                    for i in range(0, len(times), BLOCK_MESSAGES):
+                        s = slice(i, i + BLOCK_MESSAGES)
+                        nc.write_messages(times[s], batch[s])
+            results.append(('write', best_time(write, repeat), len(times)))
+
+            results.append(('process', best_time(
+                lambda: process(flight.tmpfiles, flight.logfile, flight.corefile,
+                                with_progress=False, resume=False, output_dir=output_dir),
+                repeat
+            ), flight.messages))
+
+            sampled = offsets[name][:sample].tolist()
+            results.append(('parse_message', best_time(
+                lambda: [parse_message(data[name][i:i + 200]) for i in sampled], repeat
+            ), len(sampled)))
+
+            results.append(('time_at_size', best_time(
+                lambda: [timers[name].time_at_size(i, name) for i in sampled], repeat
+            ), len(sampled)))
+
+            messages = [parse_message(data[name][i:i + 200]) for i in sampled]
+            sampled_times = times[:len(sampled)].tolist()
+
+            def write_each() -> None:
+                with NetCDFWriter(flight.corefile, output_dir=output_dir) as nc:
+                    for t, message in zip(sampled_times, messages):
+                        nc.write_message(t, message)
+            results.append(('write_message', best_time(write_each, repeat), len(sampled)))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[8, 32, 128],
+                        help='The sizes of the synthetic flights, in MB')
+    parser.add_argument('--sample', type=int, default=2000,
+                        help='The number of messages over which per message functions are timed')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='The number of times each stage is run, taking the best')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed')
+    args = parser.parse_args()
+
+    print(f'{"size (MB)":>9} {"stage":<14} {"time (s)":>9} {"MB/s":>9} {"messages/s":>12}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            flight = make_flight(os.path.join(tmpdir, f'{size:g}'), size, seed=args.seed)
+            megabytes = flight.size / 1e6
+
+            for stage, elapsed, messages in benchmark_flight(flight, args.sample, args.repeat):
+                # Per message stages only cover a sample of the flight
+                mb = megabytes * messages / flight.messages
+                print(f'{size:>9g} {stage:<14} {elapsed:>9.3f} {mb / elapsed:>9.1f} '
+                      f'{messages / elapsed:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,123 @@
 import argparse
+import contextlib
+import dataclasses
+import os
 
-from wxrx.read_wxrx import process
+from wxrx.arinc import DEFAULT_LOOKAHEAD
+from wxrx.cache import DEFAULT_CACHE_BYTES, MessageCache
+from wxrx.netcdf import COMPRESSION_PRESETS, CompressionOptions
+
+# The processing modules, and the tqdm, pandas and netCDF4 modules they use, are
+# only imported once the arguments have been parsed, so that --help and argument
+# errors are quick. Check the import time with benchmarks/startup.py.
+
+
+def chunk_spec(spec: str) -> tuple[str, tuple[int, ...]]:
+    """
+    Parse a chunk size specification of the form NAME=SIZE[,SIZE...].
+    """
+    try:
+        name, sizes = spec.split('=')
+        return name, tuple(int(size) for size in sizes.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Invalid chunk specification: {spec}')
+
+
+def get_compression(args: argparse.Namespace) -> CompressionOptions:
+    """
+    Get the compression options from the command line arguments, as overrides
+    of the chosen preset.
+    """
+    options = COMPRESSION_PRESETS[args.compression]
+    overrides = {}
+
+    if args.complevel is not None:
+        overrides['zlib'] = args.complevel > 0
+        overrides['complevel'] = args.complevel
+    if args.no_shuffle:
+        overrides['shuffle'] = False
+    if args.chunk_records is not None:
+        overrides['chunk_records'] = args.chunk_records
+    if args.chunk:
+        overrides['chunksizes'] = {**options.chunksizes, **dict(args.chunk)}
+
+    return dataclasses.replace(options, **overrides)
+
+
+# The options for processing complete tmp files which do not apply to
+# following them, and the attributes they are parsed to
+FOLLOW_EXCLUDED_OPTIONS = (
+    ('--staging-dir', 'staging_dir'),
+    ('--cache-dir', 'cache_dir'),
+    ('--jobs', 'jobs'),
+    ('--no-mmap', 'no_mmap'),
+    ('--restart', 'restart'),
+    ('--stats-json', 'stats_json'),
+)
+
+
+def add_processing_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments controlling how tmp files are processed, and the output
+    written, shared with faam_wxrx_batch.py.
+    """
+    parser.add_argument('--no-mmap', action='store_true',
+                        help='Read tmp files into memory, rather than memory mapping them',
+                        default=False)
+
+    parser.add_argument('--compression', choices=list(COMPRESSION_PRESETS), default='default',
+                        help='The chunking and compression preset for the output file')
+
+    parser.add_argument('--complevel', type=int, choices=range(10), default=None,
+                        help='The zlib compression level, overriding the preset. 0 disables compression')
+
+    parser.add_argument('--no-shuffle', action='store_true', default=False,
+                        help='Disable the shuffle filter')
+
+    parser.add_argument('--chunk-records', type=int, default=None,
+                        help='The chunk size along the time dimension, overriding the preset')
+
+    parser.add_argument('--chunk', metavar='NAME=SIZE[,SIZE...]', type=chunk_spec, action='append',
+                        help='The chunk sizes for a single variable. May be given more than once')
+
+    parser.add_argument('--timing', choices=['nearest', 'interpolate'], default='nearest',
+                        help=('How message times are derived from the log file: the nearest '
+                              'whole second, or interpolated by size between log entries'))
+
+    parser.add_argument('--lookahead', metavar='N', type=int, default=DEFAULT_LOOKAHEAD,
+                        help=('The number of further labels, spaced a message apart before or after a '
+                              'label, needed to confirm it as the start of a message. 0 gives the '
+                              'strict scanner, taking every label as the start of a message'))
+    parser.add_argument('--block-size', metavar='MiB', type=int, default=None,
+                        help='The size of the blocks in which tmp files are streamed, in MiB')
+
+    parser.add_argument('--staging-dir', metavar='DIR', type=str, default=None,
+                        help=('A directory, such as fast local storage, in which the output file is '
+                              'written before it is moved to the output directory'))
+
+    parser.add_argument('--cache-dir', metavar='DIR', type=str,
+                        default=os.environ.get('WXRX_CACHE_DIR'),
+                        help=('A directory in which to cache decoded messages, so that unchanged '
+                              'tmp files are not decoded again. Defaults to $WXRX_CACHE_DIR'))
+
+    parser.add_argument('--cache-size', metavar='GiB', type=float, default=DEFAULT_CACHE_BYTES / 2**30,
+                        help='The maximum size of the cache, beyond which old entries are evicted')
+
+
+def get_cache(args: argparse.Namespace) -> MessageCache | None:
+    """
+    Get the cache of decoded messages from the command line arguments.
+    """
+    if not args.cache_dir:
+        return None
+    return MessageCache(args.cache_dir, int(args.cache_size * 2**30))
 
 
 def main():
     parser = argparse.ArgumentParser(description='Process raw WxRx data from the FAAM aircraft.')
 
     parser.add_argument('--tmpfile', '-t', metavar='tmpfile', type=str, nargs='+', action='store',
-                        required=True, help='One or more raw ARINC 708 tmp file(s)')
+                        help='One or more raw ARINC 708 tmp file(s). Not used with --follow')
 
     parser.add_argument('--logfile', '-l', metavar='logfile', type=str, nargs=1, action='store',
                         required=True, help='The log file')
@@ -21,8 +131,80 @@ def main():
     parser.add_argument('--quiet', '-q', action='store_true',
                         help='Run quietly (no consile output)', default=False)
 
+    add_processing_arguments(parser)
+
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='The number of processes used to decode messages. 0 uses one per core')
+
+    parser.add_argument('--restart', action='store_true', default=False,
+                        help='Process all tmp files from the start, ignoring the checkpoint of an earlier run')
+
+    parser.add_argument('--follow', '-f', action='store_true', default=False,
+                        help=('Follow tmp files which are still being recorded, taken from the '
+                              'log file, appending new messages to the output file as they arrive'))
+
+    parser.add_argument('--poll-interval', metavar='SECONDS', type=float, default=5.0,
+                        help='The time between polls for new data when following')
+
+    parser.add_argument('--idle-timeout', metavar='SECONDS', type=float, default=None,
+                        help='Stop following once there has been no new data for this long')
+
+    parser.add_argument('--stats-json', metavar='FILE', type=str, default=None,
+                        help=('Write the time spent in each stage of processing, and the data '
+                              'handled, overall and for each tmp file, to a JSON file. '
+                              'Can not be used with --follow'))
+
+    parser.add_argument('--profile', metavar='FILE', type=str, default=None,
+                        help='Profile the run with cProfile, writing the statistics to a file')
+
     args = parser.parse_args()
-    process(args.tmpfile, args.logfile[0], args.corefile[0], with_progress=not args.quiet)
+
+    if not args.follow and not args.tmpfile:
+        parser.error('the following arguments are required: --tmpfile/-t')
+
+    if args.follow:
+        # Following writes the output in place, from the start, as the data
+        # arrives, so these options would otherwise be silently ignored
+        given = [
+            option for option, dest in FOLLOW_EXCLUDED_OPTIONS
+            if getattr(args, dest) != parser.get_default(dest)
+        ]
+        if given:
+            parser.error(f'{", ".join(given)} can not be used with --follow')
+
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    else:
+        profiler = contextlib.nullcontext()
+
+    with profiler:
+        if args.follow:
+            from wxrx.follow import follow
+            from wxrx.pipeline import DEFAULT_BLOCK_BYTES
+
+            follow(args.logfile[0], args.corefile[0], poll_interval=args.poll_interval,
+                   idle_timeout=args.idle_timeout, with_progress=not args.quiet,
+                   compression=get_compression(args), timing=args.timing,
+                   block_size=args.block_size * 2**20 if args.block_size else DEFAULT_BLOCK_BYTES,
+                   output_dir=args.output_dir[0], lookahead=args.lookahead)
+        else:
+            from wxrx.read_wxrx import process
+            from wxrx.stats import Stats
+
+            stats = Stats() if args.stats_json else None
+            process(args.tmpfile, args.logfile[0], args.corefile[0], with_progress=not args.quiet,
+                    use_mmap=not args.no_mmap, compression=get_compression(args),
+                    timing=args.timing, jobs=args.jobs,
+                    block_size=args.block_size * 2**20 if args.block_size else None,
+                    resume=not args.restart,
+                    cache=get_cache(args), output_dir=args.output_dir[0],
+                    staging_dir=args.staging_dir, lookahead=args.lookahead, stats=stats)
+            if stats:
+                stats.write(args.stats_json)
+
+    if args.profile:
+        profiler.dump_stats(args.profile)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,72 @@
+import argparse
+import dataclasses
+import json
+import sys
+
+from faam_wxrx import add_processing_arguments, get_cache, get_compression
+from wxrx.parallel import get_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Process raw WxRx data from many FAAM flights in one invocation.'
+    )
+
+    flights = parser.add_mutually_exclusive_group(required=True)
+
+    flights.add_argument('--manifest', '-m', metavar='manifest', type=str,
+                         help=('A CSV file of flights, with logfile and corefile columns, and '
+                               'optionally directory and name columns'))
+
+    flights.add_argument('--root', '-r', metavar='root', type=str,
+                         help=('A directory tree of flights. Each directory holding one log file '
+                               'and a core_faam_*.nc core file is processed'))
+
+    parser.add_argument('--output-dir', '-o', metavar='output_dir', type=str, default=None,
+                        help=('The directory in which the output of each flight is written, to a '
+                              'directory of the flight name. Defaults to the flight directory'))
+
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='The number of flights processed at once. 0 uses one per core')
+
+    parser.add_argument('--force', action='store_true', default=False,
+                        help='Process every flight from the start, even if its output is up to date')
+
+    parser.add_argument('--summary-json', metavar='FILE', type=str, default=None,
+                        help='Write the outcome and time taken for each flight to a JSON file')
+
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='Only print the summary', default=False)
+
+    add_processing_arguments(parser)
+
+    args = parser.parse_args()
+
+    from wxrx.batch import find_flights, format_summary, read_flight_manifest, run_batch
+
+    if args.manifest:
+        flights = read_flight_manifest(args.manifest)
+    else:
+        flights = find_flights(args.root)
+
+    results = run_batch(
+        flights, workers=get_jobs(args.workers), force=args.force, with_progress=not args.quiet,
+        output_dir=args.output_dir,
+        use_mmap=not args.no_mmap, compression=get_compression(args), timing=args.timing,
+        block_size=args.block_size * 2**20 if args.block_size else None, cache=get_cache(args),
+        staging_dir=args.staging_dir, lookahead=args.lookahead
+    )
+
+    if results:
+        print(format_summary(results))
+
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump([dataclasses.asdict(result) for result in results], f, indent=2)
+
+    if any(result.status == 'failed' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from wxrx.arinc import ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES
+from wxrx.schema import DimensionSchema, ProductSchema, VariableSchema, load_schema, schema_key
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+# A minimal wxrx-raw product, given through the schema cache, so that output
+# can be written without faam_data or vocal
+SCHEMA = ProductSchema(
+    name='wxrx-raw',
+    dimensions=(DimensionSchema('time', None), DimensionSchema('bin', 512)),
+    variables=(
+        VariableSchema('time', '<f8', ('time',), None, {'units': 'seconds since 1970-01-01'}),
+        *(VariableSchema(name, '|i1', ('time',), -1, {}) for name in (
+            'control_accept', 'slave', 'mode_annunciation', 'faults', 'stabilization',
+            'operating_mode', 'data_accept'
+        )),
+        VariableSchema('tilt', '<f4', ('time',), -9999.0, {}),
+        VariableSchema('gain', '<i2', ('time',), -9999, {}),
+        VariableSchema('range', '<i2', ('time',), -9999, {}),
+        VariableSchema('scan_angle', '<f4', ('time',), -9999.0, {}),
+        VariableSchema('reflectivity', '|i1', ('time', 'bin'), -1, {}),
+    ),
+)
+
+
+@pytest.fixture(autouse=True)
+def schema(tmp_path_factory, monkeypatch):
+    cache = tmp_path_factory.mktemp('schema')
+    (cache / f'{schema_key(SCHEMA.name)}.json').write_text(json.dumps(SCHEMA.to_dict()))
+    monkeypatch.setenv('WXRX_SCHEMA_CACHE', str(cache))
+    load_schema.cache_clear()
+    yield
+    load_schema.cache_clear()
+
+
+@pytest.fixture
+def corefile(tmp_path):
+    netCDF4 = pytest.importorskip('netCDF4')
+    path = tmp_path / 'core_faam_20230101_v005_r0_x999_1hz.nc'
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.flight_number = 'x999'
+        nc.flight_date = '2023-01-01'
+        nc.time_coverage_start = ''
+        nc.time_coverage_end = ''
+    return str(path)
+
+
+def make_raw_data(seed: int = 0, n: int = 60) -> bytes:
+    """
+    Make raw data of n random messages, some with a label in their data, with
+    junk, some of it holding labels, between some of them, and a truncated
+    message at the end.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(n):
+        if rng.random() < 0.2:
+            junk = rng.integers(0, 256, rng.integers(1, 300), dtype=np.uint8)
+            junk[rng.random(len(junk)) < 0.02] = ARINC708_DELINIATOR
+            parts.append(junk)
+        message = rng.integers(0, 256, ARINC708_LENGTH_BYTES, dtype=np.uint8)
+        message[0] = ARINC708_DELINIATOR
+        if rng.random() < 0.3:
+            message[rng.integers(1, ARINC708_LENGTH_BYTES)] = ARINC708_DELINIATOR
+        parts.append(message)
+    parts.append(parts[-1][:ARINC708_LENGTH_BYTES // 2])
+    return np.concatenate(parts).tobytes()
+
+
+@pytest.fixture
+def raw_data():
+    return make_raw_data
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from synthetic import make_flight
+
+from wxrx.batch import read_flight_manifest, run_batch
+
+OUTPUT = 'faam-wxrx_20230101_r0_x999_l0.nc'
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    for seed, name in enumerate(('a', 'b')):
+        make_flight(str(tmp_path / 'flights' / name), size=0.2, tmpfiles=2, seed=seed)
+
+    filename = tmp_path / 'flights' / 'manifest.csv'
+    filename.write_text(
+        'name,logfile,corefile\n'
+        'a,a/flight.log,a/core_faam_20230101_v005_r0_x999_1hz.nc\n'
+        'b,b/flight.log,b/core_faam_20230101_v005_r0_x999_1hz.nc\n'
+    )
+    return str(filename)
+
+
+def test_batch_to_output_dir(tmp_path, monkeypatch, manifest):
+    # Run from elsewhere, with a relative output directory
+    monkeypatch.chdir(tmp_path)
+    flights = read_flight_manifest(manifest)
+
+    results = run_batch(flights, with_progress=False, output_dir='output')
+
+    assert [result.status for result in results] == ['processed', 'processed']
+    assert os.getcwd() == str(tmp_path)
+    for result, name in zip(results, ('a', 'b')):
+        assert result.output == os.path.join('output', name, OUTPUT)
+        with netCDF4.Dataset(result.output) as nc:
+            assert len(nc['time']) > 0
+        # Nothing is written to the flight directory
+        assert not os.path.exists(os.path.join(result.flight.directory, OUTPUT))
+
+    # Once processed, the flights are skipped until their inputs change
+    mtimes = [os.path.getmtime(result.output) for result in results]
+    results = run_batch(flights, with_progress=False, output_dir='output')
+    assert [result.status for result in results] == ['skipped', 'skipped']
+    assert [os.path.getmtime(result.output) for result in results] == mtimes
+
+    tmpfile = os.path.join(flights[1].directory, '00002.tmp')
+    os.utime(tmpfile, (mtimes[1] + 10, mtimes[1] + 10))
+    results = run_batch(flights, with_progress=False, output_dir='output')
+    assert [result.status for result in results] == ['skipped', 'processed']
+
+
+def test_batch_to_flight_directory(tmp_path, monkeypatch, manifest):
+    monkeypatch.chdir(tmp_path)
+    flights = read_flight_manifest(manifest)
+
+    results = run_batch(flights, with_progress=False)
+
+    assert [result.status for result in results] == ['processed', 'processed']
+    for result in results:
+        assert result.output == os.path.join(result.flight.directory, OUTPUT)
+        assert os.path.exists(result.output)
+    assert not os.path.exists(tmp_path / 'output')
@@ -0,0 +1,183 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from wxrx.cache import MessageCache
+from wxrx.read_wxrx import extract_messages, parse_messages, scan_offsets
+
+
+@pytest.fixture
+def tmpfile(tmp_path, raw_data):
+    filename = tmp_path / '00001.tmp'
+    filename.write_bytes(raw_data(n=40))
+    return str(filename)
+
+
+def decode(tmpfile):
+    with open(tmpfile, 'rb') as f:
+        data = f.read()
+    offsets = scan_offsets(data)
+    return offsets, parse_messages(extract_messages(data, offsets))
+
+
+def store(cache, tmpfile, block=7):
+    """
+    Cache the messages of a tmp file, written in blocks, and return its key.
+    """
+    key = cache.key(tmpfile)
+    offsets, batch = decode(tmpfile)
+    writer = cache.writer(key, os.path.getsize(tmpfile))
+    for i in range(0, len(offsets), block):
+        writer.write(offsets[i : i + block], batch[i : i + block])
+    writer.commit()
+    return key
+
+
+def entry_bytes(cache, key):
+    path = os.path.join(cache.directory, key)
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def test_round_trip(tmp_path, tmpfile):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    key = cache.key(tmpfile)
+    assert cache.get(key) is None
+
+    store(cache, tmpfile)
+
+    cached = cache.get(key)
+    offsets, batch = decode(tmpfile)
+    assert cached.size == os.path.getsize(tmpfile)
+    assert cached.count == len(offsets)
+    np.testing.assert_array_equal(cached.offsets, offsets)
+    np.testing.assert_array_equal(cached.header, batch.header)
+    np.testing.assert_array_equal(cached.reflectivity, batch.reflectivity)
+    # Only the finished entry is left in the cache
+    assert os.listdir(cache.directory) == [key]
+
+
+@pytest.mark.parametrize('start', [0, 1, 1000])
+def test_blocks_from_start(tmp_path, tmpfile, start):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    cached = cache.get(store(cache, tmpfile))
+    offsets, _ = decode(tmpfile)
+
+    blocks = list(cached.blocks(block_size=6, start=start))
+
+    kept = offsets[offsets >= start]
+    np.testing.assert_array_equal(np.concatenate([o for _, o, _ in blocks]), kept)
+    assert [len(o) for _, o, _ in blocks[:-1]] == [6] * (len(blocks) - 1)
+    # Each block has been processed up to the start of the next
+    consumed = [c for c, _, _ in blocks]
+    assert consumed == [int(o[0]) for _, o, _ in blocks[1:]] + [os.path.getsize(tmpfile)]
+
+
+def test_aborted_entry_is_not_cached(tmp_path, tmpfile):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    key = cache.key(tmpfile)
+    offsets, batch = decode(tmpfile)
+
+    writer = cache.writer(key, os.path.getsize(tmpfile))
+    writer.write(offsets, batch)
+    writer.abort()
+
+    assert cache.get(key) is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_changed_tmp_file_misses(tmp_path, tmpfile):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    store(cache, tmpfile)
+
+    with open(tmpfile, 'ab') as f:
+        f.write(b'\x00')
+
+    assert cache.get(cache.key(tmpfile)) is None
+
+
+def test_changed_decoder_version_misses(tmp_path, tmpfile, monkeypatch):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    store(cache, tmpfile)
+
+    monkeypatch.setattr('wxrx.cache.DECODER_VERSION', 5)
+
+    assert cache.get(cache.key(tmpfile)) is None
+
+
+def test_changed_lookahead_misses(tmp_path, tmpfile):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    store(cache, tmpfile)
+
+    assert cache.get(cache.key(tmpfile, lookahead=0)) is None
+
+
+def test_least_recently_used_evicted(tmp_path, raw_data):
+    tmpfiles = []
+    for seed in range(3):
+        filename = tmp_path / f'0000{seed + 1}.tmp'
+        filename.write_bytes(raw_data(seed=seed, n=40))
+        tmpfiles.append(str(filename))
+
+    cache = MessageCache(str(tmp_path / 'cache'))
+    first, second = store(cache, tmpfiles[0]), store(cache, tmpfiles[1])
+    now = time.time()
+    os.utime(os.path.join(cache.directory, first), (now - 200, now - 200))
+    os.utime(os.path.join(cache.directory, second), (now - 100, now - 100))
+
+    # Reading the first entry makes the second the least recently used
+    assert cache.get(first) is not None
+    size = entry_bytes(cache, first) + entry_bytes(cache, second)
+    cache.max_bytes = size + entry_bytes(cache, second) // 2
+    third = store(cache, tmpfiles[2])
+
+    assert sorted(os.listdir(cache.directory)) == sorted([first, third])
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+
+
+def test_no_eviction_within_size(tmp_path, raw_data):
+    cache = MessageCache(str(tmp_path / 'cache'))
+    keys = []
+    for seed in range(3):
+        filename = tmp_path / f'0000{seed + 1}.tmp'
+        filename.write_bytes(raw_data(seed=seed, n=40))
+        keys.append(store(cache, str(filename)))
+
+    cache.max_bytes = sum(entry_bytes(cache, key) for key in keys)
+    cache.evict()
+
+    assert sorted(os.listdir(cache.directory)) == sorted(keys)
+
+
+def test_processing_replays_cached_messages(tmp_path, monkeypatch):
+    netCDF4 = pytest.importorskip('netCDF4')
+    from synthetic import make_flight
+
+    from wxrx.read_wxrx import process
+
+    flight = make_flight(str(tmp_path / 'flight'), size=0.2, tmpfiles=2, seed=0, junk=0.05,
+                         junk_labels=True)
+    monkeypatch.chdir(flight.directory)
+    cache = MessageCache(str(tmp_path / 'cache'))
+
+    def run(output_dir):
+        process(flight.tmpfiles, flight.logfile, flight.corefile, with_progress=False,
+                resume=False, cache=cache, output_dir=str(tmp_path / output_dir))
+        with netCDF4.Dataset(tmp_path / output_dir / 'faam-wxrx_20230101_r0_x999_l0.nc') as nc:
+            return {name: np.ma.getdata(ncvar[:]) for name, ncvar in nc.variables.items()}
+
+    expected = run('first')
+    assert len(os.listdir(cache.directory)) == len(flight.tmpfiles)
+
+    # The second run reads every tmp file from the cache
+    def fail(*args, **kwargs):
+        raise AssertionError('tmp file scanned again')
+
+    monkeypatch.setattr('wxrx.pipeline.stream_tmp_file', fail)
+    output = run('second')
+
+    assert sorted(output) == sorted(expected)
+    for name in expected:
+        np.testing.assert_array_equal(output[name], expected[name], err_msg=name)
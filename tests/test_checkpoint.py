@@ -0,0 +1,145 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from synthetic import make_flight
+
+import wxrx.pipeline
+from wxrx.checkpoint import checkpoint_filename
+from wxrx.netcdf import NetCDFWriter
+from wxrx.read_wxrx import process
+
+OUTPUT = 'faam-wxrx_20230101_r0_x999_l0.nc'
+
+
+@pytest.fixture
+def flight(tmp_path, monkeypatch):
+    flight = make_flight(str(tmp_path / 'flight'), size=0.3, tmpfiles=3, seed=0, junk=0.05,
+                         junk_labels=True)
+    monkeypatch.chdir(flight.directory)
+    monkeypatch.setattr('wxrx.checkpoint.CHECKPOINT_INTERVAL', 0)
+    return flight
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """
+    Records the tmp files processed by each run.
+    """
+    processed = []
+    stream_tmp_file = wxrx.pipeline.stream_tmp_file
+
+    def recording_stream_tmp_file(tempfile, *args, **kwargs):
+        processed.append(tempfile)
+        return stream_tmp_file(tempfile, *args, **kwargs)
+
+    monkeypatch.setattr(wxrx.pipeline, 'stream_tmp_file', recording_stream_tmp_file)
+    return processed
+
+
+def run(flight, output_dir, tmpfiles=None, **kwargs):
+    process(tmpfiles or flight.tmpfiles, flight.logfile, flight.corefile, with_progress=False,
+            output_dir=str(output_dir), block_size=10000, **kwargs)
+    return os.path.join(output_dir, OUTPUT)
+
+
+def read_output(filename):
+    with netCDF4.Dataset(filename) as nc:
+        return {name: np.ma.getdata(ncvar[:]) for name, ncvar in nc.variables.items()}
+
+
+def assert_same_output(filename, expected):
+    output, expected = read_output(filename), read_output(expected)
+    assert sorted(output) == sorted(expected)
+    for name in expected:
+        np.testing.assert_array_equal(output[name], expected[name], err_msg=name)
+
+
+@pytest.mark.parametrize('interrupt_at', [2, 25])
+def test_interrupted_run_resumes(flight, tmp_path, monkeypatch, capsys, interrupt_at):
+    expected = run(flight, tmp_path / 'expected')
+
+    write_messages = NetCDFWriter.write_messages
+    calls = []
+
+    def interrupted_write_messages(self, *args):
+        calls.append(None)
+        if len(calls) == interrupt_at:
+            raise KeyboardInterrupt
+        return write_messages(self, *args)
+
+    monkeypatch.setattr(NetCDFWriter, 'write_messages', interrupted_write_messages)
+    with pytest.raises(KeyboardInterrupt):
+        run(flight, tmp_path / 'output')
+    monkeypatch.setattr(NetCDFWriter, 'write_messages', write_messages)
+
+    capsys.readouterr()
+    output = run(flight, tmp_path / 'output')
+    out = capsys.readouterr().out
+    assert 'Resuming' in out and 'from record 0\n' not in out
+
+    assert_same_output(output, expected)
+    assert sorted(os.listdir(tmp_path / 'output')) == [OUTPUT, checkpoint_filename(OUTPUT)]
+
+
+def test_new_data_is_processed_incrementally(flight, tmp_path, capsys, processed):
+    expected = run(flight, tmp_path / 'expected')
+
+    # Part way through recording, the second tmp file is only partly written,
+    # up to one of its log entries, and the third is yet to be started
+    with open(flight.logfile) as f:
+        lines = f.readlines()
+    entries = [i for i, line in enumerate(lines) if line.rstrip().endswith(',00002.tmp')]
+    cut = entries[len(entries) // 2]
+    size = int(lines[cut].split(',')[1])
+
+    shutil.copy('00002.tmp', tmp_path / '00002.tmp')
+    with open('00002.tmp', 'r+b') as f:
+        f.truncate(size)
+    with open(flight.logfile, 'w') as f:
+        f.writelines(lines[:cut + 1])
+
+    run(flight, tmp_path / 'output', tmpfiles=flight.tmpfiles[:2])
+
+    # Recording then carries on, and finishes
+    shutil.copy(tmp_path / '00002.tmp', '00002.tmp')
+    with open(flight.logfile, 'w') as f:
+        f.writelines(lines)
+
+    processed.clear()
+    capsys.readouterr()
+    output = run(flight, tmp_path / 'output')
+
+    assert 'Resuming' in capsys.readouterr().out
+    assert processed == ['00002.tmp', '00003.tmp']
+    assert_same_output(output, expected)
+
+
+@pytest.mark.parametrize('change', ['data', 'restart'])
+def test_changed_data_or_restart_rewrites_output(flight, tmp_path, capsys, processed, change):
+    output = run(flight, tmp_path / 'output')
+
+    resume = True
+    if change == 'data':
+        # Change a byte in the data of a message already processed
+        with open('00001.tmp', 'r+b') as f:
+            f.seek(1000)
+            byte = f.read(1)
+            f.seek(1000)
+            f.write(bytes([byte[0] ^ 0x01]))
+    else:
+        resume = False
+
+    expected = run(flight, tmp_path / 'expected')
+
+    processed.clear()
+    capsys.readouterr()
+    output = run(flight, tmp_path / 'output', resume=resume)
+
+    assert 'Resuming' not in capsys.readouterr().out
+    assert processed == flight.tmpfiles
+    assert_same_output(output, expected)
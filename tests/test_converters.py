@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from wxrx.converters import (
+    gain_from_int, gains_from_ints, range_from_int, ranges_from_ints, scan_angle_from_int,
+    scan_angles_from_ints, tilt_from_int, tilts_from_ints
+)
+
+
+@pytest.mark.parametrize('scalar, vectorised, size', [
+    (range_from_int, ranges_from_ints, 128),
+    (gain_from_int, gains_from_ints, 64),
+    (tilt_from_int, tilts_from_ints, 128),
+    (scan_angle_from_int, scan_angles_from_ints, 4096),
+])
+def test_vectorised_equals_scalar(scalar, vectorised, size):
+    codes = np.arange(size)
+    values = vectorised(codes)
+    mask = np.ma.getmaskarray(values)
+
+    for code in range(size):
+        try:
+            expected = scalar(code)
+        except KeyError:
+            assert mask[code], code
+            continue
+        assert not mask[code], code
+        assert values[code] == expected, code
+
+
+@pytest.mark.parametrize('vectorised, size', [
+    (ranges_from_ints, 128),
+    (gains_from_ints, 64),
+    (tilts_from_ints, 128),
+    (scan_angles_from_ints, 4096),
+])
+def test_out_of_range_codes_are_masked(vectorised, size):
+    values = vectorised(np.array([-1, 0, size, size + 384]))
+    assert np.ma.getmaskarray(values)[[0, 2, 3]].all()
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from wxrx.follow import follow
+
+
+def test_follow_without_data_stops_cleanly(tmp_path, corefile):
+    logfile = tmp_path / 'flight.log'
+    logfile.write_text('header\nheader\nheader\ntime,size,file\n')
+
+    follow(str(logfile), corefile, poll_interval=0.01, idle_timeout=0.05,
+           with_progress=False, output_dir=str(tmp_path / 'output'))
+
+    output = tmp_path / 'output' / 'faam-wxrx_20230101_r0_x999_l0.nc'
+    with netCDF4.Dataset(output) as nc:
+        assert len(nc['time']) == 0
+        assert 'time_coverage_start' not in nc.ncattrs()
+    assert os.listdir(tmp_path / 'output') == [output.name]
+
+
+@pytest.mark.parametrize('options', [
+    ['--staging-dir', 'staging'],
+    ['--cache-dir', 'cache'],
+    ['--jobs', '2'],
+    ['--no-mmap'],
+    ['--restart'],
+    ['--stats-json', 'stats.json'],
+])
+def test_follow_rejects_unused_options(monkeypatch, capsys, options):
+    import faam_wxrx
+
+    monkeypatch.setattr('sys.argv', [
+        'faam_wxrx.py', '--logfile', 'flight.log', '--corefile', 'core.nc',
+        '--follow', *options,
+    ])
+    with pytest.raises(SystemExit) as error:
+        faam_wxrx.main()
+
+    assert error.value.code == 2
+    assert f'{options[0]} can not be used with --follow' in capsys.readouterr().err
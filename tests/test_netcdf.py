@@ -0,0 +1,102 @@
+import errno
+import os
+
+import numpy as np
+import pytest
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+from wxrx.arinc import ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES
+from wxrx.netcdf import NetCDFWriter, move_file
+from wxrx.read_wxrx import parse_messages
+
+OUTPUT = 'faam-wxrx_20230101_r0_x999_l0.nc'
+
+
+def write_messages(writer: NetCDFWriter, n: int = 100, start: float = 1.6725312e9) -> None:
+    messages = np.random.default_rng(0).integers(0, 256, (n, ARINC708_LENGTH_BYTES), dtype=np.uint8)
+    messages[:, 0] = ARINC708_DELINIATOR
+    writer.write_messages(start + np.arange(n), parse_messages(messages))
+
+
+def test_output_is_staged_then_moved(tmp_path, corefile):
+    output_dir, staging_dir = tmp_path / 'output', tmp_path / 'staging'
+    destination = output_dir / OUTPUT
+
+    with NetCDFWriter(corefile, output_dir=str(output_dir), staging_dir=str(staging_dir)) as writer:
+        write_messages(writer)
+        assert os.path.dirname(writer.path) == str(staging_dir)
+        assert os.path.exists(writer.path)
+        assert not destination.exists()
+
+    assert not os.path.exists(writer.path)
+    assert os.listdir(staging_dir) == []
+    with netCDF4.Dataset(destination) as nc:
+        assert len(nc['time']) == 100
+
+
+@pytest.mark.parametrize('staged', [True, False])
+def test_failed_write_leaves_no_partial_output(tmp_path, corefile, staged):
+    output_dir = tmp_path / 'output'
+    staging_dir = tmp_path / 'staging' if staged else None
+    destination = output_dir / OUTPUT
+
+    with pytest.raises(RuntimeError):
+        with NetCDFWriter(corefile, output_dir=str(output_dir),
+                          staging_dir=str(staging_dir) if staged else None) as writer:
+            write_messages(writer)
+            raise RuntimeError('interrupted')
+
+    assert not destination.exists()
+    assert os.path.exists(writer.path)
+
+
+def test_failed_write_keeps_previous_output(tmp_path, corefile):
+    destination = tmp_path / OUTPUT
+    destination.write_bytes(b'previous output')
+
+    with pytest.raises(RuntimeError):
+        with NetCDFWriter(corefile, output_dir=str(tmp_path)) as writer:
+            write_messages(writer)
+            raise RuntimeError('interrupted')
+
+    assert destination.read_bytes() == b'previous output'
+
+
+def test_move_across_filesystems_replaces_atomically(tmp_path, monkeypatch):
+    src, dst = tmp_path / 'staged.nc', tmp_path / 'output' / OUTPUT
+    dst.parent.mkdir()
+    src.write_bytes(b'new output')
+    dst.write_bytes(b'previous output')
+
+    replace = os.replace
+    replaced = []
+
+    def cross_device_replace(a, b):
+        if str(a) == str(src):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        replaced.append(a)
+        replace(a, b)
+
+    monkeypatch.setattr(os, 'replace', cross_device_replace)
+    move_file(str(src), str(dst))
+
+    # The copy is written alongside dst, then replaces it
+    assert replaced == [str(dst.parent / f'.{OUTPUT}.part')]
+    assert dst.read_bytes() == b'new output'
+    assert not src.exists()
+    assert os.listdir(dst.parent) == [OUTPUT]
+
+
+def test_time_coverage_ends_at_last_written_record(tmp_path, corefile):
+    with NetCDFWriter(corefile, output_dir=str(tmp_path)) as writer:
+        write_messages(writer, 100, start=1.6725312e9)
+
+    # Rewrite from record 20, ending before the records left from the first run
+    with NetCDFWriter(corefile, output_dir=str(tmp_path), append_at=20,
+                      append_from=writer.filename) as writer:
+        write_messages(writer, 30, start=1.6725312e9 + 20)
+
+    with netCDF4.Dataset(writer.filename) as nc:
+        assert nc.time_coverage_start == '2023-01-01T00:00:00Z'
+        assert nc.time_coverage_end == '2023-01-01T00:00:49Z'
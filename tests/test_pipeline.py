@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from wxrx.pipeline import BlockScanner
+from wxrx.read_wxrx import extract_messages, scan_offsets
+
+
+def scan_blocks(blocks: list[bytes], lookahead: int) -> tuple[np.ndarray, np.ndarray]:
+    scanner = BlockScanner(lookahead=lookahead)
+    scanned = [scanner.scan(block) for block in blocks]
+    scanned.append(scanner.finish())
+    return (np.concatenate([offsets for offsets, _ in scanned]),
+            np.concatenate([messages for _, messages in scanned]))
+
+
+@pytest.mark.parametrize('lookahead', [0, 1, 2])
+@pytest.mark.parametrize('chunk', [1, 199, 200, 201, 4096])
+def test_block_scanner_equals_scan_offsets(raw_data, chunk, lookahead):
+    data = raw_data(n=24)
+    expected = scan_offsets(data, lookahead=lookahead)
+
+    offsets, messages = scan_blocks(
+        [data[i : i + chunk] for i in range(0, len(data), chunk)], lookahead
+    )
+
+    np.testing.assert_array_equal(offsets, expected)
+    np.testing.assert_array_equal(messages, extract_messages(data, expected))
+
+
+@pytest.mark.parametrize('lookahead', [0, 1, 2])
+@pytest.mark.parametrize('shift', [-1, 0, 1])
+def test_label_straddling_a_block_boundary(raw_data, shift, lookahead):
+    data = raw_data(seed=1)
+    expected = scan_offsets(data, lookahead=lookahead)
+    assert len(expected) > 10
+
+    # Split the data just before, at and just after the label of a message
+    split = int(expected[len(expected) // 2]) + shift
+    offsets, _ = scan_blocks([data[:split], data[split:]], lookahead)
+
+    np.testing.assert_array_equal(offsets, expected)
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from wxrx.arinc import ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES
+from wxrx.quality import QC_CLASSES, FrameQuality
+from wxrx.read_wxrx import extract_messages, parse_messages, scan_offsets
+
+
+def make_message(gain: int = 0, range: int = 1) -> np.ndarray:
+    """
+    Make a message with the given gain and range codes, and no other labels.
+    """
+    header = ARINC708_DELINIATOR | (gain << 36) | (range << 42)
+    message = np.zeros(ARINC708_LENGTH_BYTES, dtype=np.uint8)
+    message[:8] = np.frombuffer(header.to_bytes(8, 'little'), dtype=np.uint8)
+    return message
+
+
+def make_junk(n: int, labels: tuple[int, ...] = ()) -> np.ndarray:
+    """
+    Make n bytes of junk, holding labels only at the given positions.
+    """
+    junk = np.random.default_rng(n).integers(0, 256, n, dtype=np.uint8)
+    junk[junk == ARINC708_DELINIATOR] = 0
+    junk[list(labels)] = ARINC708_DELINIATOR
+    return junk
+
+
+# A tmp file holding a frame of each class, and the frames and bytes of each
+DATA = np.concatenate([
+    *[make_message() for _ in range(3)],
+    make_junk(50),
+    *[make_message() for _ in range(3)],
+    make_message(gain=1),
+    make_message(range=3),
+    *[make_message() for _ in range(2)],
+    make_junk(70, labels=(10, 40)),
+    *[make_message() for _ in range(3)],
+    make_message()[:120],
+]).tobytes()
+
+FRAMES = {'valid': 11, 'bad_label': 1, 'truncated': 1, 'unknown_code': 2, 'resync_skip': 1}
+
+BYTES = {'valid': 11 * ARINC708_LENGTH_BYTES, 'bad_label': 50, 'truncated': 120,
+         'unknown_code': 2 * ARINC708_LENGTH_BYTES, 'resync_skip': 70}
+
+RANGES = [
+    [600, 650, 'bad_label'],
+    [2050, 2120, 'resync_skip'],
+    [2720, 2840, 'truncated'],
+]
+
+
+@pytest.fixture
+def tmpfile(tmp_path):
+    filename = tmp_path / '00001.tmp'
+    filename.write_bytes(DATA)
+    return str(filename)
+
+
+def classify(quality, offsets, block):
+    header = parse_messages(extract_messages(DATA, offsets)).header
+    for i in range(0, len(offsets), block):
+        quality.add(offsets[i : i + block], header[i : i + block])
+
+
+@pytest.mark.parametrize('loaded', [True, False])
+@pytest.mark.parametrize('block', [1, 4, 100])
+def test_every_byte_is_classified(tmpfile, loaded, block):
+    offsets = scan_offsets(DATA)
+    quality = FrameQuality(tmpfile, data=DATA if loaded else None)
+
+    classify(quality, offsets, block)
+    quality.finish()
+
+    assert list(quality.frames) == list(QC_CLASSES)
+    assert quality.frames == FRAMES
+    assert quality.bytes == BYTES
+    assert sum(quality.bytes.values()) == len(DATA)
+    assert quality.report()['ranges'] == RANGES
+    assert quality.problems() == ('1 bad label (50 bytes), 1 truncated (120 bytes), '
+                                  '2 unknown code (400 bytes), 1 resync skip (70 bytes)')
+
+
+@pytest.mark.parametrize('split', [1, 3, 6, 10])
+def test_resumed_classification(tmpfile, split):
+    offsets = scan_offsets(DATA)
+    first = FrameQuality(tmpfile)
+    classify(first, offsets[:split], 2)
+
+    quality = FrameQuality(tmpfile, start=int(offsets[split]), summary=first.summary())
+    classify(quality, offsets[split:], 2)
+    quality.finish()
+
+    assert quality.frames == FRAMES
+    assert quality.bytes == BYTES
+    assert sum(quality.bytes.values()) == len(DATA)
+
+
+def test_trailing_junk_is_skipped(tmp_path):
+    data = DATA[:-120] + make_junk(30).tobytes()
+    filename = tmp_path / '00001.tmp'
+    filename.write_bytes(data)
+    offsets = scan_offsets(data)
+    header = parse_messages(extract_messages(data, offsets)).header
+
+    quality = FrameQuality(str(filename))
+    quality.add(offsets, header)
+    quality.finish()
+
+    assert quality.frames['truncated'] == 0
+    assert quality.frames['bad_label'] == 2
+    assert quality.bytes['bad_label'] == 80
+    assert sum(quality.bytes.values()) == len(data)
@@ -0,0 +1,222 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from wxrx.arinc import ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES, Arinc708Message
+from wxrx.read_wxrx import (
+    confirm_candidates, parse_message, parse_messages, reconcile_offsets, scan_offsets,
+    scan_offsets_parallel, scan_tmp_range, scan_window
+)
+
+# The shift and mask of each header field, in the order of Arinc708Message
+FIELDS = (
+    ('label', 0, 0xff),
+    ('control_accept', 8, 0x3),
+    ('slave', 10, 0x1),
+    ('spare1', 11, 0x3),
+    ('mode_annunciation', 13, 0x1f),
+    ('faults', 18, 0x7f),
+    ('stabilization', 25, 0x1),
+    ('operating_mode', 26, 0x7),
+    ('tilt', 29, 0x7f),
+    ('gain', 36, 0x3f),
+    ('range', 42, 0x7f),
+    ('spare2', 48, 0x1),
+    ('data_accept', 49, 0x3),
+    ('scan_angle', 51, 0xfff),
+)
+
+
+def reference_message(data: bytes) -> Arinc708Message:
+    """
+    Parse a message one bit field at a time, as python integers. Data shorter
+    than a message is taken as zero padded.
+    """
+    header = int.from_bytes(data[:8], 'little')
+    bins = int.from_bytes(data[8:ARINC708_LENGTH_BYTES], 'little')
+    return Arinc708Message(
+        **{name: (header >> shift) & mask for name, shift, mask in FIELDS},
+        data=[(bins >> shift) & 0x7 for shift in range(1533, -1, -3)]
+    )
+
+
+def assert_messages_equal(message: Arinc708Message, expected: Arinc708Message) -> None:
+    for name, _, _ in FIELDS:
+        assert getattr(message, name) == getattr(expected, name), name
+    np.testing.assert_array_equal(message.data, expected.data)
+
+
+@pytest.fixture
+def messages():
+    rng = np.random.default_rng(0)
+    messages = rng.integers(0, 256, (64, ARINC708_LENGTH_BYTES), dtype=np.uint8)
+    messages[:, 0] = ARINC708_DELINIATOR
+    messages[0] = 0
+    messages[1] = 0xff
+    return messages
+
+
+def test_parse_messages_equals_parse_message(messages):
+    batch = parse_messages(messages)
+    assert len(batch) == len(messages)
+
+    for i, raw in enumerate(messages):
+        expected = reference_message(raw.tobytes())
+        assert_messages_equal(parse_message(raw.tobytes()), expected)
+        assert_messages_equal(batch[i], expected)
+
+
+@pytest.mark.parametrize('length', [0, 1, 7, 8, 9, 100, ARINC708_LENGTH_BYTES - 1])
+def test_short_message_is_zero_padded(messages, length):
+    data = messages[2, :length].tobytes()
+
+    padded = np.zeros((1, ARINC708_LENGTH_BYTES), dtype=np.uint8)
+    padded[0, :length] = messages[2, :length]
+
+    expected = reference_message(data)
+    assert_messages_equal(parse_message(data), expected)
+    assert_messages_equal(parse_messages(padded)[0], expected)
+
+
+def test_long_data_is_truncated(messages):
+    data = messages[2].tobytes() + b'\xff' * 10
+    assert_messages_equal(parse_message(data), reference_message(messages[2].tobytes()))
+
+
+@pytest.mark.parametrize('lookahead', [0, 2])
+@pytest.mark.parametrize('chunk', [1, 199, 200, 201, 777])
+def test_scan_offsets_parallel_equals_scan_offsets(tmp_path, raw_data, chunk, lookahead):
+    data = raw_data(n=24)
+    tempfile = tmp_path / '00001.tmp'
+    tempfile.write_bytes(data)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        offsets = scan_offsets_parallel(data, str(tempfile), executor, chunk_bytes=chunk,
+                                        window=8, lookahead=lookahead)
+
+    np.testing.assert_array_equal(offsets, scan_offsets(data, lookahead=lookahead))
+
+
+@pytest.mark.parametrize('lookahead', [0, 2])
+def test_scan_tmp_range_equals_scan_window(tmp_path, raw_data, lookahead):
+    data = raw_data(seed=2)
+    tempfile = tmp_path / '00001.tmp'
+    tempfile.write_bytes(data)
+
+    for start in range(0, len(data), 333):
+        end = min(start + 777, len(data))
+        np.testing.assert_array_equal(scan_tmp_range(str(tempfile), start, end, lookahead),
+                                      scan_window(data, start, end, lookahead))
+
+
+@pytest.mark.parametrize('lookahead', [0, 2])
+def test_reconcile_offsets_after_a_misaligned_range(raw_data, lookahead):
+    data = raw_data(seed=3)
+    expected = scan_offsets(data, lookahead=lookahead)
+
+    for start in range(1, len(data), 97):
+        end = min(start + 1000, len(data))
+        before = expected[expected < start]
+        resume = int(before[-1]) + ARINC708_LENGTH_BYTES if len(before) else 0
+
+        # The range is scanned as though scanning began at its start, which
+        # may fall inside a message found by the preceding ranges
+        found = scan_window(data, start, end, lookahead)
+        reconciled = reconcile_offsets(data, found, resume, end, lookahead)
+
+        np.testing.assert_array_equal(
+            reconciled, expected[(expected >= start) & (expected < end)], err_msg=str(start)
+        )
+
+
+def byte_loop_offsets(data: bytes) -> list[int]:
+    """
+    Find message offsets as the original scanner did, byte by byte, taking
+    every label as the start of a message.
+    """
+    offsets = []
+    i = 0
+    while i < len(data):
+        if data[i] == ARINC708_DELINIATOR:
+            offsets.append(i)
+            i += ARINC708_LENGTH_BYTES
+            continue
+        i += 1
+    return offsets
+
+
+def make_message(gain: int = 0, range: int = 1) -> np.ndarray:
+    """
+    Make a message with the given gain and range codes, and no other labels.
+    """
+    header = ARINC708_DELINIATOR | (gain << 36) | (range << 42)
+    message = np.zeros(ARINC708_LENGTH_BYTES, dtype=np.uint8)
+    message[:8] = np.frombuffer(header.to_bytes(8, 'little'), dtype=np.uint8)
+    return message
+
+
+def make_junk(n: int, labels: tuple[int, ...] = ()) -> np.ndarray:
+    """
+    Make n bytes of junk, holding labels only at the given positions.
+    """
+    junk = np.random.default_rng(n).integers(0, 256, n, dtype=np.uint8)
+    junk[junk == ARINC708_DELINIATOR] = 0
+    junk[list(labels)] = ARINC708_DELINIATOR
+    return junk
+
+
+def layout(*parts: np.ndarray) -> tuple[bytes, list[int]]:
+    """
+    Join parts of the data, returning it and the offsets of the messages in it.
+    """
+    offsets, position = [], 0
+    for part in parts:
+        if len(part) == ARINC708_LENGTH_BYTES and part[0] == ARINC708_DELINIATOR:
+            offsets.append(position)
+        position += len(part)
+    return np.concatenate(parts).tobytes(), offsets
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_strict_scan_equals_byte_loop(raw_data, seed):
+    random = np.random.default_rng(seed).integers(0, 256, 50000, dtype=np.uint8).tobytes()
+    for data in (random, raw_data(seed=seed)):
+        assert scan_offsets(data, lookahead=0).tolist() == byte_loop_offsets(data)
+
+
+@pytest.mark.parametrize('where', ['junk', 'data'])
+def test_spurious_label_is_rejected(where):
+    messages = [make_message() for _ in range(10)]
+    if where == 'junk':
+        junk = make_junk(50, labels=(10,))
+    else:
+        # The junk label ends inside the next message, at a label in its data
+        junk = make_junk(50, labels=(10,))
+        messages[0][160] = ARINC708_DELINIATOR
+    data, expected = layout(*[make_message() for _ in range(10)], junk, *messages)
+
+    # Strict mode takes the spurious label, and loses the message after it
+    assert scan_offsets(data, lookahead=0).tolist() != expected
+    assert scan_offsets(data).tolist() == expected
+
+
+@pytest.mark.parametrize('gain, kept', [(0, True), (1, False)])
+def test_isolated_message_is_kept_if_valid(gain, kept):
+    data, expected = layout(
+        *[make_message() for _ in range(5)], make_junk(300), make_message(gain=gain),
+        make_junk(300), *[make_message() for _ in range(5)]
+    )
+    if not kept:
+        expected.pop(5)
+    assert scan_offsets(data).tolist() == expected
+
+
+def test_run_at_end_of_data_is_confirmed():
+    # Two messages, too few to confirm by spacing alone, with an unknown gain
+    data, expected = layout(make_junk(300), make_message(gain=1), make_message(gain=1))
+    candidates = np.array(expected)
+
+    assert confirm_candidates(candidates, len(data), 2).all()
+    assert not confirm_candidates(candidates, len(data) + 1, 2).any()
+    assert scan_offsets(data).tolist() == expected
@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+from wxrx.schema import package_digest
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    directory = tmp_path / 'wxrx_test_definitions'
+    (directory / 'products').mkdir(parents=True)
+    (directory / '__init__.py').write_text('')
+    (directory / 'products' / 'wxrx-raw.yaml').write_text('variables: []\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    importlib.invalidate_caches()
+    return directory
+
+
+def test_package_digest_changes_with_definitions(package):
+    before = package_digest(package.name)
+    assert before == package_digest(package.name)
+    assert package.name not in sys.modules
+
+    definition = package / 'products' / 'wxrx-raw.yaml'
+    definition.write_text('variables: [time]\n')
+    stat = definition.stat()
+    os.utime(definition, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert package_digest(package.name) != before
+
+
+def test_package_digest_of_missing_package():
+    assert package_digest('wxrx_no_such_package') == 'unknown'
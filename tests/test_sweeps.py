@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+
+from wxrx.sweeps import SWEEP_DTYPE, SWEEP_SETTINGS, SweepIndex
+
+
+def make_settings(n: int, **changes: tuple[int, float]) -> dict[str, np.ndarray]:
+    """
+    Returns constant settings for n records, except that each setting named
+    in changes takes the given value from the given record on.
+    """
+    settings = {
+        'tilt': np.full(n, 1.5),
+        'range': np.full(n, 80),
+        'gain': np.full(n, 0),
+        'operating_mode': np.full(n, 2),
+    }
+    for name, (start, value) in changes.items():
+        settings[name][start:] = value
+    return settings
+
+
+def make_scan(seed: int = 0, n: int = 2000) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Returns the scan angles of an antenna sweeping back and forth, wrapping
+    through 0, with pauses at the same angle, and settings which change now
+    and then, some of them mid-sweep.
+    """
+    rng = np.random.default_rng(seed)
+    steps = []
+    while len(steps) < n:
+        direction = rng.choice([-1, 1])
+        steps.extend(direction * rng.choice([0, 0.5, 1], size=rng.integers(1, 120)))
+    scan_angle = (np.cumsum(steps[:n]) + 350) % 360
+
+    settings = {}
+    for name in SWEEP_SETTINGS:
+        changes = np.zeros(n, dtype=np.int64)
+        changes[rng.integers(1, n, size=5)] = 1
+        settings[name] = np.cumsum(changes) % 3
+    settings['tilt'] = settings['tilt'] * 0.25
+    return scan_angle, settings
+
+
+def index(scan_angle: np.ndarray, settings: dict[str, np.ndarray],
+          splits: list[int] | None = None) -> SweepIndex:
+    sweeps = SweepIndex()
+    bounds = [0, *(splits or []), len(scan_angle)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        sweeps.add(scan_angle[start:end],
+                   {name: value[start:end] for name, value in settings.items()})
+    return sweeps
+
+
+def record_loop(scan_angle: np.ndarray, settings: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Returns the sweeps of the records, found one record at a time.
+    """
+    sweeps = []
+    direction = 0
+    for i in range(len(scan_angle)):
+        row = tuple(settings[name][i] for name in SWEEP_SETTINGS)
+        previous = direction
+        if i:
+            step = (scan_angle[i] - scan_angle[i - 1] + 180) % 360 - 180
+            direction = int(np.sign(step)) or direction
+        if not i or row != sweeps[-1][2:] or (previous and direction != previous):
+            sweeps.append((i, direction, *row))
+        sweeps[-1] = (sweeps[-1][0], direction, *sweeps[-1][2:])
+    return np.array(sweeps, dtype=SWEEP_DTYPE)
+
+
+def test_split_at_reversal():
+    # The record after a pause at the same angle stays in the sweep
+    scan_angle = np.array([0, 10, 20, 20, 10, 0, 10, 20], dtype=float)
+
+    sweeps, ends = index(scan_angle, make_settings(8)).sweeps()
+
+    np.testing.assert_array_equal(sweeps['start'], [0, 4, 6])
+    np.testing.assert_array_equal(ends, [4, 6, 8])
+    np.testing.assert_array_equal(sweeps['direction'], [1, -1, 1])
+
+
+def test_no_split_when_wrapping_through_zero():
+    scan_angle = np.array([340, 350, 0, 10, 0, 350], dtype=float)
+
+    sweeps, ends = index(scan_angle, make_settings(6)).sweeps()
+
+    np.testing.assert_array_equal(sweeps['start'], [0, 4])
+    np.testing.assert_array_equal(ends, [4, 6])
+    np.testing.assert_array_equal(sweeps['direction'], [1, -1])
+
+
+def test_direction_unknown_until_antenna_moves():
+    sweeps, _ = index(np.full(5, 30.0), make_settings(5)).sweeps()
+
+    np.testing.assert_array_equal(sweeps['start'], [0])
+    np.testing.assert_array_equal(sweeps['direction'], [0])
+
+
+@pytest.mark.parametrize('name,value', [
+    ('tilt', -2.0), ('range', 160), ('gain', 11), ('operating_mode', 4),
+])
+def test_split_at_settings_change(name, value):
+    scan_angle = np.arange(10, dtype=float)
+
+    sweeps, ends = index(scan_angle, make_settings(10, **{name: (6, value)})).sweeps()
+
+    np.testing.assert_array_equal(sweeps['start'], [0, 6])
+    np.testing.assert_array_equal(ends, [6, 10])
+    np.testing.assert_array_equal(sweeps['direction'], [1, 1])
+    assert sweeps[name][0] == make_settings(1)[name][0]
+    assert sweeps[name][1] == value
+
+
+def test_one_block_equals_record_loop():
+    scan_angle, settings = make_scan()
+
+    sweeps, ends = index(scan_angle, settings).sweeps()
+
+    expected = record_loop(scan_angle, settings)
+    assert len(expected) > 20
+    np.testing.assert_array_equal(sweeps, expected)
+    np.testing.assert_array_equal(ends, np.append(expected['start'][1:], len(scan_angle)))
+
+
+@pytest.mark.parametrize('splits', [
+    [1], [2], [3],
+    list(range(1, 2000)),
+    list(range(7, 2000, 7)),
+    list(range(100, 2000, 100)),
+])
+def test_split_blocks_equal_one_block(splits):
+    scan_angle, settings = make_scan()
+    expected = index(scan_angle, settings)
+
+    sweeps = index(scan_angle, settings, splits)
+
+    assert len(sweeps) == len(expected)
+    for actual, wanted in zip(sweeps.sweeps(), expected.sweeps()):
+        np.testing.assert_array_equal(actual, wanted)
+
+
+def test_split_mid_sweep_and_at_boundaries():
+    scan_angle, settings = make_scan(seed=1)
+    expected, expected_ends = index(scan_angle, settings).sweeps()
+
+    # Split at the start of each sweep, just either side of it, and midway
+    # through it
+    starts = expected['start'][1:]
+    middles = (expected['start'] + expected_ends) // 2
+    for split in (*starts, *(starts - 1), *(starts + 1), *middles):
+        if 0 < split < len(scan_angle):
+            sweeps, ends = index(scan_angle, settings, [int(split)]).sweeps()
+            np.testing.assert_array_equal(sweeps, expected)
+            np.testing.assert_array_equal(ends, expected_ends)
+
+
+@pytest.mark.parametrize('split', [1, 250, 999])
+def test_resumed_index_equals_one_block(split):
+    scan_angle, settings = make_scan(seed=2)
+    expected, _ = index(scan_angle, settings).sweeps()
+
+    first, _ = index(scan_angle[:split], {k: v[:split] for k, v in settings.items()}).sweeps()
+    sweeps = SweepIndex(first, split, scan_angle[split - 1])
+    sweeps.add(scan_angle[split:], {k: v[split:] for k, v in settings.items()})
+
+    np.testing.assert_array_equal(sweeps.sweeps()[0], expected)
+
+
+def test_sweeps_from_first():
+    scan_angle, settings = make_scan()
+    sweeps = index(scan_angle, settings, list(range(50, 2000, 50)))
+    expected, expected_ends = sweeps.sweeps()
+
+    for first in (0, 1, len(expected) - 1, len(expected)):
+        later, ends = sweeps.sweeps(first)
+        np.testing.assert_array_equal(later, expected[first:])
+        np.testing.assert_array_equal(ends, expected_ends[first:])
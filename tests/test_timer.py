@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wxrx.follow import LogFollower
+from wxrx.timer import LogIndex, Timer, parse_times
+
+ENTRIES = (
+    '2023-05-01 10:00:00,0,00001.tmp\n2023-05-01 10:00:01,3375,00001.tmp\n'
+    '2023-05-01 10:00:02,6750,00001.tmp\n'
+)
+
+
+@pytest.mark.parametrize('header', [
+    'header\nheader\nheader\ntime,size,file\n',
+    'WxRx\n\nheader\n  \nheader\ntime,size,file\n',
+    '\nheader\nheader\nheader\ntime,size,file\n\n',
+    'header\r\nheader\r\nheader\r\ntime,size,file\r\n',
+    # Too few lines which are not blank, so the first entry is taken as header
+    'WxRx\n\n\ntime,size,file\n\t\n',
+])
+def test_log_header_matches_read_csv(tmp_path, header):
+    logfile = tmp_path / 'flight.log'
+    logfile.write_text(header + ENTRIES)
+
+    # The rule for the header which the log has always been read with
+    baseline = pd.read_csv(logfile, names=['time', 'size', 'tmpfile'], header=3)
+    baseline.index = parse_times(baseline.pop('time').to_numpy())
+
+    expected = LogIndex.from_file(str(logfile)).df
+    assert expected.equals(baseline)
+
+    follower = LogFollower(str(logfile))
+    assert follower.poll()
+    assert follower.index.df.equals(expected)
+
+
+def test_log_follower_waits_for_header(tmp_path):
+    logfile = tmp_path / 'flight.log'
+    logfile.write_text('header\n\nheader\n\n')
+
+    follower = LogFollower(str(logfile))
+    assert not follower.poll()
+
+    with open(logfile, 'a') as f:
+        f.write('header\ntime,size,file\n' + ENTRIES)
+    assert follower.poll()
+    assert len(follower.index.df) == 3
+
+
+def make_timer(sizes):
+    times = pd.date_range('2023-05-01 10:00:00', periods=len(sizes), freq='1s', name='time')
+    df = pd.DataFrame({'size': sizes, 'tmpfile': '00001.tmp'}, index=times)
+    return Timer(LogIndex(df), '00001.tmp', mode='interpolate'), times.to_numpy()
+
+
+def test_interpolation_is_flat_through_a_stall():
+    timer, times = make_timer([0, 1000, 1000, 1000, 2000])
+
+    result = timer.times_at_sizes(np.array([500, 1000, 1500, 2000, 2500]), '00001.tmp')
+
+    assert result[0] == times[0] + np.timedelta64(500, 'ms')
+    # A size reached before the stall takes the time it was first reached,
+    # and one reached after it is interpolated from the end of the stall
+    assert result[1] == times[1]
+    assert result[2] == times[3] + np.timedelta64(500, 'ms')
+    assert result[3] == times[4]
+    assert result[4] == times[4]
+
+
+def test_interpolation_without_stalls_is_linear():
+    sizes = np.cumsum(np.random.default_rng(0).integers(1, 5000, 100))
+    timer, times = make_timer(sizes)
+
+    queries = np.linspace(-1000, sizes[-1] + 1000, 5000)
+    expected = np.interp(queries, sizes, times.astype(np.int64).astype(np.float64))
+
+    result = timer.times_at_sizes(queries, '00001.tmp').astype(np.int64)
+    assert np.abs(result - expected).max() <= 1
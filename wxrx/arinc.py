@@ -1,12 +1,117 @@
 from collections import namedtuple
 
+import numpy as np
+
 SCAN_ANGLES = [0xb4 / 2**i for i in range(12)]
 
 ARINC708_DELINIATOR = 0b10110100 #0o055, LSB first
 ARINC708_LENGTH_BYTES = 200
+ARINC708_HEADER_BYTES = 8
+ARINC708_NUM_BINS = 512
+
+# The number of further labels, spaced exactly one message apart before or after
+# a label, needed to confirm it as the start of a message. With a lookahead of 0,
+# every label is taken as the start of a message.
+DEFAULT_LOOKAHEAD = 2
 
+# A single message. The data is a (512,) uint8 array of the data points, in the
+# order they are given in the message, which is the reverse of the order of the
+# bins in the output.
 Arinc708Message = namedtuple('Arinc708Message', [
     'label', 'control_accept', 'slave', 'spare1', 'mode_annunciation',
     'faults', 'stabilization', 'operating_mode', 'tilt', 'gain', 'range',
     'spare2', 'data_accept', 'scan_angle', 'data'
 ])
+
+# Structured dtype holding the decoded header fields of a block of messages,
+# in the same order as the fields of Arinc708Message.
+ARINC708_HEADER_DTYPE = np.dtype([
+    ('label', np.uint8),
+    ('control_accept', np.uint8),
+    ('slave', np.uint8),
+    ('spare1', np.uint8),
+    ('mode_annunciation', np.uint8),
+    ('faults', np.uint8),
+    ('stabilization', np.uint8),
+    ('operating_mode', np.uint8),
+    ('tilt', np.uint8),
+    ('gain', np.uint8),
+    ('range', np.uint8),
+    ('spare2', np.uint8),
+    ('data_accept', np.uint8),
+    ('scan_angle', np.uint16),
+])
+
+
+class Arinc708Batch:
+    """
+    A block of decoded ARINC 708 messages, held as a struct of arrays: the header
+    fields as a structured array with dtype ARINC708_HEADER_DTYPE, and the data
+    as an (N, 512) uint8 reflectivity array, already in the order of the bins in
+    the output. Each message takes 527 bytes.
+
+    Each header field can be accessed for the whole batch, as batch.gain, or for
+    a single message, as batch[i].gain. Indexing with an integer gives the
+    Arinc708Message, and with a slice or mask gives a smaller batch.
+    """
+
+    __slots__ = ('header', 'reflectivity')
+
+    def __init__(self, header: np.ndarray, reflectivity: np.ndarray) -> None:
+        """
+        Create a new Arinc708Batch object.
+
+        Args:
+            header (np.ndarray): The message headers, with dtype ARINC708_HEADER_DTYPE
+            reflectivity (np.ndarray): The (N, 512) reflectivity, in output bin order
+        """
+        self.header = header
+        self.reflectivity = reflectivity
+
+    @classmethod
+    def empty(cls, n: int = 0) -> 'Arinc708Batch':
+        """
+        Returns a batch of n zeroed messages.
+        """
+        return cls(np.zeros(n, dtype=ARINC708_HEADER_DTYPE),
+                   np.zeros((n, ARINC708_NUM_BINS), dtype=np.uint8))
+
+    @classmethod
+    def concatenate(cls, batches: list['Arinc708Batch']) -> 'Arinc708Batch':
+        """
+        Join batches of messages into a single batch.
+        """
+        if not batches:
+            return cls.empty()
+        return cls(np.concatenate([b.header for b in batches]),
+                   np.concatenate([b.reflectivity for b in batches]))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the memory used by the messages, in bytes.
+        """
+        return self.header.nbytes + self.reflectivity.nbytes
+
+    def __len__(self) -> int:
+        return len(self.header)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name in ARINC708_HEADER_DTYPE.names:
+            return self.header[name]
+        raise AttributeError(f'{type(self).__name__!r} object has no attribute {name!r}')
+
+    def __getitem__(self, index: int | slice | np.ndarray) -> 'Arinc708Message | Arinc708Batch':
+        if isinstance(index, (int, np.integer)):
+            record = self.header[index]
+            return Arinc708Message(
+                **{name: int(record[name]) for name in ARINC708_HEADER_DTYPE.names},
+                data=self.reflectivity[index, ::-1]
+            )
+        return type(self)(self.header[index], self.reflectivity[index])
+
+    def __getstate__(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.header, self.reflectivity
+
+    def __setstate__(self, state: tuple[np.ndarray, np.ndarray]) -> None:
+        self.header, self.reflectivity = state
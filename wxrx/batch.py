@@ -0,0 +1,290 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+import csv
+import dataclasses
+import glob
+import os
+import time
+import traceback
+from typing import Any
+
+from .arinc import DEFAULT_LOOKAHEAD
+from .checkpoint import checkpoint_options, read_manifest
+from .netcdf import COMPRESSION_PRESETS, CompressionOptions, NetCDFWriter
+
+
+@dataclasses.dataclass(frozen=True)
+class Flight:
+    """
+    The input files of a single flight.
+    """
+    name: str
+    # The directory holding the tmp files, to which the output is written unless
+    # an output directory is given for the batch
+    directory: str
+    logfile: str
+    corefile: str
+
+
+@dataclasses.dataclass
+class FlightResult:
+    """
+    The outcome of processing a single flight.
+    """
+    flight: Flight
+    # One of 'processed', 'skipped' or 'failed'
+    status: str
+    elapsed: float = 0.0
+    output: str = ''
+    error: str = ''
+
+
+def read_flight_manifest(filename: str) -> list[Flight]:
+    """
+    Read a manifest of flights. The manifest is a CSV file with logfile and
+    corefile columns, and optionally directory and name columns. Relative paths
+    are relative to the manifest. The directory defaults to that of the logfile,
+    and the name to the name of the logfile.
+
+    Args:
+        filename (str): The filename of the manifest
+
+    Returns:
+        list[Flight]: The flights in the manifest
+    """
+    root = os.path.dirname(os.path.abspath(filename))
+
+    flights = []
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            logfile = os.path.join(root, row['logfile'].strip())
+            corefile = os.path.join(root, row['corefile'].strip())
+            directory = (row.get('directory') or '').strip()
+            directory = os.path.join(root, directory) if directory else os.path.dirname(logfile)
+            name = (row.get('name') or '').strip() or os.path.splitext(os.path.basename(logfile))[0]
+            flights.append(Flight(name, directory, logfile, corefile))
+
+    return flights
+
+
+def find_flights(root: str) -> list[Flight]:
+    """
+    Find the flights in a directory tree. Each directory holding a single log
+    file and a single FAAM core file, core_faam_*.nc, is taken to be a flight.
+    If there are several core files, the 1 Hz file is used.
+
+    Args:
+        root (str): The root of the directory tree
+
+    Returns:
+        list[Flight]: The flights found, sorted by directory
+    """
+    flights = []
+    for directory, _, _ in sorted(os.walk(root)):
+        logfiles = glob.glob(os.path.join(directory, '*.log'))
+        corefiles = sorted(glob.glob(os.path.join(directory, 'core_faam_*.nc')))
+        if len(corefiles) > 1:
+            corefiles = [f for f in corefiles if '1hz' in os.path.basename(f)] or corefiles
+
+        if len(logfiles) != 1 or not corefiles:
+            continue
+
+        name = os.path.splitext(os.path.basename(logfiles[0]))[0]
+        flights.append(Flight(name, os.path.abspath(directory), os.path.abspath(logfiles[0]),
+                              os.path.abspath(corefiles[0])))
+
+    return flights
+
+
+def flight_output_dir(flight: Flight, output_dir: str | None = None) -> str:
+    """
+    Returns the directory to which the output of a flight is written.
+
+    Args:
+        flight (Flight): The flight
+        output_dir (str | None): The output directory of the batch, in which
+            each flight is written to a directory of its name. Defaults to
+            None, writing each flight to its own directory.
+
+    Returns:
+        str: The output directory of the flight
+    """
+    return os.path.join(output_dir, flight.name) if output_dir else flight.directory
+
+
+def output_filename(flight: Flight, compression: CompressionOptions | str = 'default',
+                    output_dir: str | None = None) -> str:
+    """
+    Returns the filename of the output file of a flight.
+
+    Args:
+        flight (Flight): The flight
+        compression (CompressionOptions | str): The compression options
+        output_dir (str | None): The output directory of the batch. Defaults
+            to None, the directory of the flight.
+
+    Returns:
+        str: The filename of the output file
+    """
+    writer = NetCDFWriter(flight.corefile, compression=compression,
+                          output_dir=flight_output_dir(flight, output_dir))
+    return writer.get_filename()
+
+
+def is_up_to_date(flight: Flight, timing: str = 'nearest',
+                  compression: CompressionOptions | str = 'default',
+                  lookahead: int = DEFAULT_LOOKAHEAD, output_dir: str | None = None) -> bool:
+    """
+    Check whether the output of a flight is up to date: it must have been
+    completely processed, with the same options, and be newer than the log file,
+    the core file and every tmp file processed.
+
+    Args:
+        flight (Flight): The flight
+        timing (str): The timing mode
+        compression (CompressionOptions | str): The compression options
+        lookahead (int): The lookahead used to confirm candidate messages
+        output_dir (str | None): The output directory of the batch. Defaults
+            to None, the directory of the flight.
+
+    Returns:
+        bool: True if the output is up to date
+    """
+    if isinstance(compression, str):
+        compression = COMPRESSION_PRESETS[compression]
+
+    output = output_filename(flight, compression, output_dir)
+    manifest = read_manifest(output)
+    if manifest is None or manifest['options'] != checkpoint_options(timing, compression, lookahead):
+        return False
+
+    entries = manifest['entries']
+    if not entries or not all(entry['complete'] for entry in entries):
+        return False
+
+    inputs = [flight.logfile, flight.corefile] + [
+        os.path.join(flight.directory, entry['tmpfile']) for entry in entries
+    ]
+    try:
+        return os.path.getmtime(output) >= max(os.path.getmtime(f) for f in inputs)
+    except OSError:
+        return False
+
+
+def process_flight(flight: Flight, force: bool = False, output_dir: str | None = None,
+                   **kwargs: Any) -> FlightResult:
+    """
+    Process a single flight, catching any error so that it can be reported
+    with the other flights. The tmp files are those named in the log file, in
+    the flight directory, and the output is written to the flight directory,
+    or to a directory of the flight name in output_dir.
+
+    Args:
+        flight (Flight): The flight
+        force (bool): Whether to process the flight from the start, even if its
+            output is up to date
+        output_dir (str | None): The output directory of the batch. Defaults
+            to None, the directory of the flight.
+        **kwargs: Further arguments to process
+
+    Returns:
+        FlightResult: The outcome
+    """
+    from .read_wxrx import process
+
+    start = time.perf_counter()
+    try:
+        timing = kwargs.get('timing', 'nearest')
+        compression = kwargs.get('compression', 'default')
+        lookahead = kwargs.get('lookahead', DEFAULT_LOOKAHEAD)
+        output = output_filename(flight, compression, output_dir)
+
+        if not force and is_up_to_date(flight, timing, compression, lookahead, output_dir):
+            return FlightResult(flight, 'skipped', time.perf_counter() - start, output)
+
+        tmpfiles = sorted(glob.glob(os.path.join(os.path.abspath(flight.directory), '*.tmp')))
+        process(tmpfiles, flight.logfile, flight.corefile, resume=not force,
+                output_dir=flight_output_dir(flight, output_dir), **kwargs)
+
+        return FlightResult(flight, 'processed', time.perf_counter() - start, output)
+
+    except Exception:
+        return FlightResult(flight, 'failed', time.perf_counter() - start, error=traceback.format_exc())
+
+
+def run_batch(flights: list[Flight], workers: int = 1, force: bool = False,
+              with_progress: bool = True, output_dir: str | None = None,
+              **kwargs: Any) -> list[FlightResult]:
+    """
+    Process many flights, scheduling them across a pool of worker processes.
+    Each worker imports the processing modules, and loads the product
+    schema, once, and reuses them for every flight it processes.
+
+    Args:
+        flights (list[Flight]): The flights to process
+        workers (int): The number of worker processes. If 1, flights are
+            processed in this process. Defaults to 1.
+        force (bool): Whether to process flights from the start, even if their
+            output is up to date. Defaults to False.
+        with_progress (bool): Whether to report each flight as it finishes.
+            Defaults to True.
+        output_dir (str | None): The directory in which the output of each
+            flight is written, to a directory of the flight name. Defaults to
+            None, writing the output of each flight to its own directory.
+        **kwargs: Further arguments to process
+
+    Returns:
+        list[FlightResult]: The outcome of each flight, in the order given
+    """
+    kwargs['with_progress'] = False
+
+    def report(result: FlightResult) -> None:
+        if with_progress:
+            print(f'{result.flight.name}: {result.status} in {result.elapsed:.1f} s', flush=True)
+
+    if workers == 1:
+        results = []
+        for flight in flights:
+            results.append(process_flight(flight, force, output_dir, **kwargs))
+            report(results[-1])
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures: list[Future[FlightResult]] = [
+            pool.submit(process_flight, flight, force, output_dir, **kwargs) for flight in flights
+        ]
+        for future in futures:
+            future.add_done_callback(lambda f: report(f.result()))
+        return [future.result() for future in futures]
+
+
+def format_summary(results: list[FlightResult]) -> str:
+    """
+    Format a summary of a batch, giving the outcome and time taken for each
+    flight, and the error of any which failed.
+
+    Args:
+        results (list[FlightResult]): The outcome of each flight
+
+    Returns:
+        str: The summary
+    """
+    width = max([len(result.flight.name) for result in results] + [6])
+    lines = [f'{"Flight":<{width}}  {"Status":<9}  {"Time (s)":>8}  Output']
+    for result in results:
+        lines.append(
+            f'{result.flight.name:<{width}}  {result.status:<9}  {result.elapsed:>8.1f}  '
+            f'{os.path.basename(result.output)}'.rstrip()
+        )
+
+    counts = {status: 0 for status in ('processed', 'skipped', 'failed')}
+    for result in results:
+        counts[result.status] += 1
+    total = sum(result.elapsed for result in results)
+    lines.append(', '.join(f'{count} {status}' for status, count in counts.items()) +
+                 f', {total:.1f} s in total')
+
+    for result in results:
+        if result.status == 'failed':
+            lines.append(f'\n{result.flight.name} failed:\n{result.error}')
+
+    return '\n'.join(lines)
@@ -0,0 +1,265 @@
+from collections.abc import Iterator
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .arinc import Arinc708Batch, ARINC708_HEADER_DTYPE, ARINC708_NUM_BINS, DEFAULT_LOOKAHEAD
+
+# The version of the scanner and decoder. This must be increased whenever a
+# change to either would change the messages decoded from a tmp file, so that
+# messages cached by earlier versions are not used.
+DECODER_VERSION = 4
+
+# The default maximum size of the cache, in bytes
+DEFAULT_CACHE_BYTES = 10 * 2**30
+
+# The size of the reads used when hashing tmp files, in bytes
+HASH_BLOCK_BYTES = 4 * 2**20
+
+# The files holding the cached messages of a tmp file, and their dtypes
+CACHE_ARRAYS = {
+    'offsets': np.dtype(np.int64),
+    'header': ARINC708_HEADER_DTYPE,
+    'reflectivity': np.dtype(np.uint8),
+}
+
+
+def hash_tmp_file(filename: str) -> str:
+    """
+    Hash the contents of a tmp file.
+
+    Args:
+        filename (str): The filename of the tmp file
+
+    Returns:
+        str: The hex digest of the file
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    with open(filename, 'rb') as f:
+        while block := f.read(HASH_BLOCK_BYTES):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class CachedMessages:
+    """
+    The decoded messages of a tmp file, memory mapped from the cache.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the cached messages in a cache entry.
+
+        Args:
+            path (str): The directory of the cache entry
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        self.size: int = meta['size']
+        self.count: int = meta['count']
+
+        shapes = {'offsets': (self.count,), 'header': (self.count,),
+                  'reflectivity': (self.count, ARINC708_NUM_BINS)}
+        arrays = {}
+        for name, dtype in CACHE_ARRAYS.items():
+            if self.count:
+                arrays[name] = np.memmap(os.path.join(path, f'{name}.bin'), dtype=dtype,
+                                         mode='r', shape=shapes[name])
+            else:
+                arrays[name] = np.empty(shapes[name], dtype=dtype)
+
+        self.offsets: np.ndarray = arrays['offsets']
+        self.header: np.ndarray = arrays['header']
+        self.reflectivity: np.ndarray = arrays['reflectivity']
+
+    def blocks(self, block_size: int, start: int = 0
+               ) -> Iterator[tuple[int, np.ndarray, Arinc708Batch]]:
+        """
+        Iterate over the cached messages in blocks.
+
+        Args:
+            block_size (int): The number of messages in each block
+            start (int): The offset of the first message. Messages before it are
+                skipped. Defaults to 0.
+
+        Yields:
+            tuple[int, np.ndarray, Arinc708Batch]: The offset up to which the tmp
+            file has been processed after each block, and the offsets and
+            messages in the block
+        """
+        first = int(np.searchsorted(self.offsets, start))
+        for i in range(first, self.count, block_size):
+            j = min(i + block_size, self.count)
+            consumed = int(self.offsets[j]) if j < self.count else self.size
+            yield (consumed, np.asarray(self.offsets[i:j]),
+                   Arinc708Batch(np.asarray(self.header[i:j]), np.asarray(self.reflectivity[i:j])))
+
+
+class CacheWriter:
+    """
+    Writes the decoded messages of a tmp file to a new cache entry, block by
+    block, so that the whole file need not be held in memory. The entry is
+    written to a temporary directory, which is only moved into place by
+    commit, so an interrupted write never leaves a partial entry.
+    """
+
+    def __init__(self, cache: 'MessageCache', key: str, size: int) -> None:
+        """
+        Create a new CacheWriter object.
+
+        Args:
+            cache (MessageCache): The cache to write to
+            key (str): The key of the entry
+            size (int): The size of the tmp file
+        """
+        self.cache = cache
+        self.key = key
+        self.size = size
+        self.count = 0
+        self.path = os.path.join(cache.directory, f'.{key}.{os.getpid()}.tmp')
+        os.makedirs(self.path, exist_ok=True)
+        self._files = {
+            name: open(os.path.join(self.path, f'{name}.bin'), 'wb') for name in CACHE_ARRAYS
+        }
+
+    def write(self, offsets: np.ndarray, batch: Arinc708Batch) -> None:
+        """
+        Append a block of decoded messages to the entry.
+
+        Args:
+            offsets (np.ndarray): The offsets of the messages
+            batch (Arinc708Batch): The messages
+        """
+        arrays = {'offsets': offsets, 'header': batch.header, 'reflectivity': batch.reflectivity}
+        for name, dtype in CACHE_ARRAYS.items():
+            self._files[name].write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        self.count += len(offsets)
+
+    def commit(self) -> None:
+        """
+        Move the finished entry into the cache, and evict old entries if the
+        cache is now too large.
+        """
+        self._close()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({'version': DECODER_VERSION, 'size': self.size, 'count': self.count}, f)
+
+        final = os.path.join(self.cache.directory, self.key)
+        try:
+            os.rename(self.path, final)
+        except OSError:
+            # Another process has already cached the same file
+            self.abort()
+            return
+
+        self.cache.evict()
+
+    def abort(self) -> None:
+        """
+        Discard the entry.
+        """
+        self._close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+
+class MessageCache:
+    """
+    An on-disk cache of the decoded messages of tmp files, so that a tmp file
+    which has already been processed need not be scanned and decoded again, for
+    example when regenerating the output with new metadata or compression.
+
+    Entries are keyed by the hash of the tmp file, DECODER_VERSION and the
+    lookahead of the scanner, and hold the offsets, headers and reflectivity of
+    the messages as raw binary arrays, which are memory mapped when read. When
+    the cache grows beyond max_bytes, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """
+        Create a new MessageCache object.
+
+        Args:
+            directory (str): The directory holding the cache. It is created if
+                it does not exist. A relative path is taken from the current
+                directory when the cache is created.
+            max_bytes (int): The maximum size of the cache, in bytes
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, tmpfile: str, lookahead: int = DEFAULT_LOOKAHEAD) -> str:
+        """
+        Returns the key of the cache entry for a tmp file.
+
+        Args:
+            tmpfile (str): The filename of the tmp file
+            lookahead (int): The lookahead used to confirm candidate messages,
+                which changes the messages found
+
+        Returns:
+            str: The key
+        """
+        return f'{hash_tmp_file(tmpfile)}-v{DECODER_VERSION}-l{lookahead}'
+
+    def get(self, key: str) -> CachedMessages | None:
+        """
+        Get the cached messages for a key, marking the entry as recently used.
+
+        Args:
+            key (str): The key, from MessageCache.key
+
+        Returns:
+            CachedMessages | None: The cached messages, or None if not cached
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            messages = CachedMessages(path)
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return messages
+
+    def writer(self, key: str, size: int) -> CacheWriter:
+        """
+        Start a new cache entry.
+
+        Args:
+            key (str): The key, from MessageCache.key
+            size (int): The size of the tmp file
+
+        Returns:
+            CacheWriter: The writer for the entry
+        """
+        return CacheWriter(self, key, size)
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache is no larger
+        than max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            with contextlib.suppress(OSError):
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
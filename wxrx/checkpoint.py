@@ -0,0 +1,354 @@
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from netCDF4 import Dataset
+
+from .arinc import DEFAULT_LOOKAHEAD
+from .netcdf import CompressionOptions, NetCDFWriter
+from .quality import FrameQuality
+from .timer import LogIndex
+
+# The version of the checkpoint format, and of the output it describes. A
+# checkpoint with a different version is ignored, and processing restarts.
+CHECKPOINT_VERSION = 3
+
+# The minimum time between writes of the checkpoint, in seconds
+CHECKPOINT_INTERVAL = 10.0
+
+# The size of the reads used when hashing tmp files, in bytes
+HASH_BLOCK_BYTES = 4 * 2**20
+
+
+def checkpoint_filename(filename: str) -> str:
+    """
+    Returns the filename of the checkpoint for an output file.
+
+    Args:
+        filename (str): The filename of the output file
+
+    Returns:
+        str: The filename of the checkpoint
+    """
+    return f'{filename}.checkpoint.json'
+
+
+def checkpoint_options(timing: str, compression: CompressionOptions,
+                       lookahead: int = DEFAULT_LOOKAHEAD) -> dict[str, Any]:
+    """
+    Returns the processing options recorded in a checkpoint, which must match
+    for the checkpoint to be resumed.
+
+    Args:
+        timing (str): The timing mode
+        compression (CompressionOptions): The chunking and compression options
+        lookahead (int): The lookahead used to confirm candidate messages
+
+    Returns:
+        dict[str, Any]: The options
+    """
+    return {'timing': timing, 'compression': dataclasses.asdict(compression),
+            'lookahead': lookahead}
+
+
+def read_manifest(filename: str) -> dict[str, Any] | None:
+    """
+    Read the checkpoint manifest for an output file.
+
+    Args:
+        filename (str): The filename of the output file
+
+    Returns:
+        dict[str, Any] | None: The manifest, or None if there is no valid manifest
+    """
+    try:
+        with open(checkpoint_filename(filename)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != CHECKPOINT_VERSION:
+        return None
+    return manifest
+
+
+def hash_file(filename: str, end: int, hasher: Any = None, start: int = 0) -> Any:
+    """
+    Hash the byte range [start, end) of a file.
+
+    Args:
+        filename (str): The file to hash
+        end (int): The end of the range
+        hasher (Any): A hashlib hash object to update, holding the hash of the
+            file up to start. Defaults to a new blake2b hash.
+        start (int): The start of the range. Defaults to 0.
+
+    Returns:
+        Any: The updated hash object
+    """
+    hasher = hasher or hashlib.blake2b()
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            block = f.read(min(HASH_BLOCK_BYTES, end - position))
+            if not block:
+                break
+            hasher.update(block)
+            position += len(block)
+    return hasher
+
+
+def hash_log(frame: pd.DataFrame) -> str:
+    """
+    Hash the times and sizes of the log entries for a tmp file.
+
+    Args:
+        frame (pd.DataFrame): The log entries, from LogIndex.frame
+
+    Returns:
+        str: The hex digest of the entries
+    """
+    hasher = hashlib.blake2b()
+    hasher.update(frame.index.asi8.tobytes())
+    hasher.update(frame['size'].to_numpy(dtype=np.int64).tobytes())
+    return hasher.hexdigest()
+
+
+@dataclasses.dataclass
+class TmpFileCheckpoint:
+    """
+    The progress made processing a single tmp file.
+    """
+    tmpfile: str
+    # The first record written from the tmp file
+    start_record: int = 0
+    # The number of records written from the tmp file
+    records: int = 0
+    # The offset in the tmp file up to which messages have been written
+    offset: int = 0
+    # The hash of the tmp file up to offset
+    digest: str = ''
+    # The number of log entries for the tmp file when it was processed, and their hash
+    log_rows: int = 0
+    log_digest: str = ''
+    # Whether the whole tmp file has been processed, and its size when it was
+    complete: bool = False
+    size: int = 0
+    # The number of frames and bytes of each quality control class, from
+    # FrameQuality.summary
+    quality: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    @property
+    def end_record(self) -> int:
+        """
+        Returns the record after the last record written from the tmp file.
+        """
+        return self.start_record + self.records
+
+
+class Checkpoint:
+    """
+    A manifest of the progress made writing an output file, so that if
+    processing is interrupted, or more data turns up, it can be resumed without
+    repeating or duplicating records. The manifest is kept next to the output
+    file, and records, for each tmp file, the offset up to which it has been
+    processed and the number of records written from it, along with hashes of
+    the tmp file and log entries used, so that changes to them can be detected.
+
+    The manifest is only written once the output file has been synced, so it
+    never records more than the output file holds. It also records which file
+    holds the records: while the output is being written, this is the staging
+    file, and once it has been moved into place, the output file itself.
+    """
+
+    def __init__(self, filename: str, options: dict[str, Any]) -> None:
+        """
+        Create a new, empty, Checkpoint object.
+
+        Args:
+            filename (str): The filename of the output file
+            options (dict[str, Any]): The processing options which affect the
+                output. A checkpoint made with different options is not resumed.
+        """
+        self.filename = filename
+        self.file = filename
+        self.options = json.loads(json.dumps(options))
+        self.entries: list[TmpFileCheckpoint] = []
+        self._hashers: dict[str, tuple[Any, int]] = {}
+        self._saved = time.monotonic()
+
+    @property
+    def records(self) -> int:
+        """
+        Returns the number of records written to the output file.
+        """
+        return self.entries[-1].end_record if self.entries else 0
+
+    def restore(self, log_index: LogIndex, tmpfiles: list[str]) -> bool:
+        """
+        Load the checkpoint for the output file, if there is one, and check that
+        it can be resumed: the output file must hold at least the records in the
+        checkpoint, and the tmp files and log entries already processed must not
+        have changed, other than by new data being appended to the last of them.
+        If the checkpoint can not be resumed, it is cleared.
+
+        If the last tmp file was complete, but has since grown, the messages at
+        its old end were confirmed by the end of the data, and timed by the log
+        as it was then. It is processed again from its start, replacing the
+        records written from it.
+
+        Args:
+            log_index (LogIndex): The log file
+            tmpfiles (list[str]): The tmp files to process, in order
+
+        Returns:
+            bool: True if processing can be resumed, False if it must restart
+        """
+        self.entries = []
+        self._hashers = {}
+
+        manifest = read_manifest(self.filename)
+        if manifest is None or manifest.get('options') != self.options:
+            return False
+
+        file = manifest.get('file', self.filename)
+        try:
+            with Dataset(file, 'r') as nc:
+                num_records = len(nc.dimensions['time'])
+        except (OSError, KeyError):
+            return False
+
+        entries = [TmpFileCheckpoint(**entry) for entry in manifest['entries']]
+        if len(entries) > len(tmpfiles) or not entries:
+            return False
+
+        last = entries[-1]
+        if last.complete and os.path.exists(last.tmpfile) and os.path.getsize(last.tmpfile) > last.size:
+            entries.pop()
+            if not entries:
+                return False
+
+        for i, (entry, tmpfile) in enumerate(zip(entries, tmpfiles)):
+            if entry.tmpfile != tmpfile or not os.path.exists(tmpfile):
+                return False
+
+            size = os.path.getsize(tmpfile)
+            if entry.complete and size != entry.size:
+                return False
+            if not entry.complete and i < len(entries) - 1:
+                return False
+
+            frame = log_index.frame(tmpfile)
+            if len(frame) < entry.log_rows or hash_log(frame.iloc[:entry.log_rows]) != entry.log_digest:
+                return False
+
+            hasher = hash_file(tmpfile, entry.offset)
+            if size < entry.offset or hasher.hexdigest() != entry.digest:
+                return False
+            self._hashers[tmpfile] = (hasher, entry.offset)
+
+        if entries[-1].end_record > num_records:
+            return False
+
+        self.entries = entries
+        self.file = file
+        return True
+
+    def entry(self, tmpfile: str) -> TmpFileCheckpoint:
+        """
+        Returns the progress for a tmp file, starting it after the records
+        already written if it has not been started.
+
+        Args:
+            tmpfile (str): The tmp file
+
+        Returns:
+            TmpFileCheckpoint: The progress for the tmp file
+        """
+        for entry in self.entries:
+            if entry.tmpfile == tmpfile:
+                return entry
+
+        entry = TmpFileCheckpoint(tmpfile, start_record=self.records)
+        self.entries.append(entry)
+        return entry
+
+    def update(self, entry: TmpFileCheckpoint, offset: int, records: int, log_index: LogIndex,
+               complete: bool = False, quality: FrameQuality | None = None) -> None:
+        """
+        Record progress made processing a tmp file.
+
+        Args:
+            entry (TmpFileCheckpoint): The progress for the tmp file
+            offset (int): The offset up to which messages have now been written
+            records (int): The number of records just written
+            log_index (LogIndex): The log file used to timestamp the records
+            complete (bool): Whether the whole tmp file has now been processed
+            quality (FrameQuality | None): The quality control of the tmp file
+                up to offset, if any
+        """
+        entry.offset = offset
+        entry.records += records
+        if quality:
+            entry.quality = quality.summary()
+        frame = log_index.frame(entry.tmpfile)
+        if entry.log_rows != len(frame):
+            entry.log_rows = len(frame)
+            entry.log_digest = hash_log(frame)
+        if complete:
+            entry.complete = True
+            entry.size = os.path.getsize(entry.tmpfile)
+
+    def save(self, nc: NetCDFWriter, force: bool = False) -> None:
+        """
+        Sync the output file, and write the checkpoint, at most once every
+        CHECKPOINT_INTERVAL seconds unless forced.
+
+        Args:
+            nc (NetCDFWriter): The writer for the output file, which is recorded
+                as holding the records
+            force (bool): Whether to write the checkpoint regardless of when it
+                was last written
+        """
+        if not force and time.monotonic() - self._saved < CHECKPOINT_INTERVAL:
+            return
+
+        for entry in self.entries:
+            hasher, position = self._hashers.get(entry.tmpfile, (None, 0))
+            if hasher is None or position != entry.offset:
+                hasher = hash_file(entry.tmpfile, entry.offset, hasher, start=position)
+                self._hashers[entry.tmpfile] = (hasher, entry.offset)
+            entry.digest = hasher.hexdigest()
+
+        nc.sync()
+        self.file = nc.path
+        self._write()
+
+    def finish(self) -> None:
+        """
+        Record that the output file has been moved into place, and so holds the
+        records, and write the checkpoint.
+        """
+        self.file = self.filename
+        self._write()
+
+    def _write(self) -> None:
+        manifest = {
+            'version': CHECKPOINT_VERSION,
+            'options': self.options,
+            'file': self.file,
+            'entries': [dataclasses.asdict(entry) for entry in self.entries],
+        }
+
+        filename = checkpoint_filename(self.filename)
+        with open(f'{filename}.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f'{filename}.tmp', filename)
+
+        self._saved = time.monotonic()
@@ -1,5 +1,31 @@
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+
 from .arinc import SCAN_ANGLES
 
+# The range in nautical miles of each encoded range value
+RANGES = {
+    1: 5,
+    2: 10,
+    4: 20,
+    8: 40,
+    16: 80,
+    32: 160,
+    63: 315,
+    0: 320
+}
+
+# The gain of each encoded gain value
+GAINS = {
+    63: 1,
+    0: 0,
+    5: -5,
+    11: -11,
+    62: -62
+}
+
 
 def scan_angle_from_int(i: int) -> float:
     """
@@ -40,16 +66,7 @@ def range_from_int(i: int) -> int:
     Returns:
         int: The range in nautical miles.
     """
-    return {
-        1: 5,
-        2: 10,
-        4: 20,
-        8: 40,
-        16: 80,
-        32: 160,
-        63: 315,
-        0: 320
-    }[i]
+    return RANGES[i]
 
 
 def gain_from_int(i: int) -> int:
@@ -64,10 +81,110 @@ def gain_from_int(i: int) -> int:
     Returns:
         int: The gain, or an indicator of calibration.
     """
-    return {
-        63: 1,
-        0: 0,
-        5: -5,
-        11: -11,
-        62: -62
-    }[i]
+    return GAINS[i]
+
+
+def build_table(converter: Callable[[int], Any], size: int, dtype: type) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build a lookup table of a scalar converter over every code from 0 to size - 1.
+
+    Args:
+        converter (Callable[[int], Any]): The converter for a single code
+        size (int): The number of codes
+        dtype (type): The dtype of the table
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The value of each code, and whether it is
+        valid, that is whether the converter gives a value rather than raising a
+        KeyError. The value of an invalid code is 0.
+    """
+    values = np.zeros(size, dtype=dtype)
+    valid = np.ones(size, dtype=bool)
+    for code in range(size):
+        try:
+            values[code] = converter(code)
+        except KeyError:
+            valid[code] = False
+    return values, valid
+
+
+# Lookup tables of every code of each field, as given by the message header
+RANGE_TABLE, RANGE_VALID = build_table(range_from_int, 128, np.int64)
+GAIN_TABLE, GAIN_VALID = build_table(gain_from_int, 64, np.int64)
+TILT_TABLE, TILT_VALID = build_table(tilt_from_int, 128, np.float64)
+SCAN_ANGLE_TABLE, SCAN_ANGLE_VALID = build_table(scan_angle_from_int, 4096, np.float64)
+
+
+def lookup(codes: np.ndarray, table: np.ndarray, valid: np.ndarray) -> np.ma.MaskedArray:
+    """
+    Convert an array of codes with a lookup table. Codes which are not valid,
+    or are outside the table, are masked.
+
+    Args:
+        codes (np.ndarray): The encoded values
+        table (np.ndarray): The value of each code
+        valid (np.ndarray): Whether each code is valid
+
+    Returns:
+        np.ma.MaskedArray: The converted values
+    """
+    codes = np.asarray(codes, dtype=np.intp)
+    inside = (codes >= 0) & (codes < len(table))
+    index = np.where(inside, codes, 0)
+    return np.ma.masked_array(table[index], mask=~(inside & valid[index]))
+
+
+def ranges_from_ints(codes: np.ndarray) -> np.ma.MaskedArray:
+    """
+    Returns the range in nautical miles of each encoded range value, as given
+    by range_from_int. Values which are not in the lookup table are masked.
+
+    Args:
+        codes (np.ndarray): The encoded range values
+
+    Returns:
+        np.ma.MaskedArray: The ranges in nautical miles
+    """
+    return lookup(codes, RANGE_TABLE, RANGE_VALID)
+
+
+def gains_from_ints(codes: np.ndarray) -> np.ma.MaskedArray:
+    """
+    Returns the gain of each encoded gain value, as given by gain_from_int.
+    Values which are not in the lookup table are masked.
+
+    Args:
+        codes (np.ndarray): The encoded gain values
+
+    Returns:
+        np.ma.MaskedArray: The gains
+    """
+    return lookup(codes, GAIN_TABLE, GAIN_VALID)
+
+
+def tilts_from_ints(codes: np.ndarray) -> np.ma.MaskedArray:
+    """
+    Returns the tilt angle in degrees of each encoded tilt value, as given by
+    tilt_from_int. Values which are not 7 bit codes are masked.
+
+    Args:
+        codes (np.ndarray): The 7 bit encoded tilt values
+
+    Returns:
+        np.ma.MaskedArray: The tilt angles in degrees
+    """
+    return lookup(codes, TILT_TABLE, TILT_VALID)
+
+
+def scan_angles_from_ints(codes: np.ndarray) -> np.ma.MaskedArray:
+    """
+    Returns the scan angle in degrees of each encoded scan angle, as given by
+    scan_angle_from_int. Values which are not 12 bit codes are masked.
+
+    Args:
+        codes (np.ndarray): The 12 bit encoded scan angles
+
+    Returns:
+        np.ma.MaskedArray: The scan angles in degrees
+    """
+    return lookup(codes, SCAN_ANGLE_TABLE, SCAN_ANGLE_VALID)
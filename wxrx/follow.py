@@ -0,0 +1,230 @@
+import contextlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .arinc import DEFAULT_LOOKAHEAD
+from .checkpoint import checkpoint_filename
+from .netcdf import CompressionOptions, NetCDFWriter
+from .pipeline import DEFAULT_BLOCK_BYTES, BlockScanner, decode_blocks, read_blocks, timestamp_blocks
+from .quality import FrameQuality
+from .timer import LogIndex, Timer, log_header_bytes, parse_times
+
+
+class LogFollower:
+    """
+    Follows a log file which is still being written, parsing only the lines
+    appended since the last poll.
+    """
+
+    def __init__(self, logfile: str) -> None:
+        """
+        Create a new LogFollower object.
+
+        Args:
+            logfile (str): Path to the logfile to follow
+        """
+        self.logfile = logfile
+        self._position = 0
+        self._partial = b''
+        self._times: list[pd.DatetimeIndex] = []
+        self._sizes: list[np.ndarray] = []
+        self._tmpfiles: list[np.ndarray] = []
+        self._index: LogIndex | None = None
+
+    def poll(self) -> bool:
+        """
+        Read and parse any complete lines appended to the log file.
+
+        Returns:
+            bool: True if any new entries were read, False otherwise
+        """
+        if not os.path.exists(self.logfile):
+            return False
+
+        with open(self.logfile, 'rb') as f:
+            if not self._position:
+                header = log_header_bytes(f)
+                if header is None:
+                    return False
+                self._position = header
+            f.seek(self._position)
+            data = f.read()
+        self._position += len(data)
+
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+
+        rows = [line.decode().strip().split(',') for line in lines if line.strip()]
+        if not rows:
+            return False
+
+        times, sizes, tmpfiles = zip(*rows)
+        self._times.append(parse_times(np.array(times)))
+        self._sizes.append(np.array(sizes, dtype=np.int64))
+        self._tmpfiles.append(np.array(tmpfiles, dtype=object))
+        self._index = None
+        return True
+
+    @property
+    def index(self) -> LogIndex:
+        """
+        Returns the entries read so far from the log file.
+        """
+        if self._index is None:
+            times = self._times[0].append(self._times[1:]) if self._times else pd.DatetimeIndex([], name='time')
+            self._index = LogIndex(pd.DataFrame({
+                'size': np.concatenate(self._sizes or [np.empty(0, dtype=np.int64)]),
+                'tmpfile': np.concatenate(self._tmpfiles or [np.empty(0, dtype=object)]),
+            }, index=times))
+        return self._index
+
+
+class TmpFileFollower:
+    """
+    Follows a tmp file which is still being written, scanning only the bytes
+    appended since the last poll. A partial message at the end of the file is
+    held back until it is complete.
+    """
+
+    def __init__(self, tempfile: str, block_size: int = DEFAULT_BLOCK_BYTES,
+                 lookahead: int = DEFAULT_LOOKAHEAD) -> None:
+        """
+        Create a new TmpFileFollower object.
+
+        Args:
+            tempfile (str): Path to the tmp file to follow
+            block_size (int): The size of the blocks in which the file is read
+            lookahead (int): The lookahead used to confirm candidate messages
+        """
+        self.tempfile = tempfile
+        self.block_size = block_size
+        self.scanner = BlockScanner(lookahead=lookahead)
+        self.quality = FrameQuality(tempfile)
+        self.finished = False
+
+    def poll(self, end: int | None = None, finish: bool = False) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Scan the bytes appended to the tmp file since the last poll.
+
+        Args:
+            end (int | None): The offset up to which to read. Defaults to the end
+                of the file.
+            finish (bool): Whether the file is complete, in which case any partial
+                message at the end is also returned, and the file is not polled again.
+
+        Returns:
+            list[tuple[np.ndarray, np.ndarray]]: The offsets and messages found
+        """
+        if self.finished or not os.path.exists(self.tempfile):
+            return []
+
+        blocks = read_blocks(self.tempfile, self.block_size, start=self.scanner.position,
+                             use_mmap=False, end=end)
+        scanned = [self.scanner.scan(block) for block in blocks]
+
+        if finish:
+            scanned.append(self.scanner.finish())
+            self.finished = True
+
+        return scanned
+
+
+def follow(logfile: str, corefile: str, poll_interval: float = 5.0,
+           idle_timeout: float | None = None, with_progress: bool = True,
+           compression: CompressionOptions | str = 'default', timing: str = 'nearest',
+           block_size: int = DEFAULT_BLOCK_BYTES, output_dir: str = '.',
+           lookahead: int = DEFAULT_LOOKAHEAD) -> None:
+    """
+    Process tmp files while they are still being recorded, appending newly
+    completed messages to the output NetCDF file at every poll.
+
+    The tmp files are those named in the log file. Messages are only decoded once
+    the log shows they have been written, so that they can be timestamped, and
+    the file is synced after every poll, so that it can be read while it is being
+    written. When a new tmp file appears in the log, the previous one is taken
+    to be complete. Following stops on a keyboard interrupt, or once neither the
+    log nor the tmp files have grown for idle_timeout seconds, in which case the
+    last tmp file is also taken to be complete.
+
+    Args:
+        logfile (str): The filename of the log file
+        corefile (str): The filename of the core file
+        poll_interval (float): The time between polls, in seconds. Defaults to 5.
+        idle_timeout (float | None): The time without any new data after which
+            to stop, in seconds. Defaults to None, following until interrupted.
+        with_progress (bool): Whether to report the messages written at each poll,
+            and any quality control problems in each tmp file. Defaults to True.
+        compression (CompressionOptions | str): The chunking and compression options
+            for the output file, or the name of a preset. Defaults to 'default'.
+        timing (str): How message times are derived from the log file, either
+            'nearest' (to 1 second) or 'interpolate'. Defaults to 'nearest'.
+        block_size (int): The size of the blocks in which tmp files are read, in bytes
+        output_dir (str): The directory to which the output file is written. It
+            is written in place, rather than staged, so that it can be read while
+            following. Defaults to the current directory.
+        lookahead (int): The lookahead used to confirm candidate messages.
+            Messages are only decoded once this many more have been written.
+            Defaults to DEFAULT_LOOKAHEAD.
+    """
+    log = LogFollower(logfile)
+    followers: dict[str, TmpFileFollower] = {}
+    last_activity = time.monotonic()
+
+    with NetCDFWriter(corefile, compression=compression, output_dir=output_dir, atomic=False) as nc:
+        # The output file is rewritten, so any checkpoint for it no longer applies
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(checkpoint_filename(nc.filename))
+
+        try:
+            while True:
+                log_grew = log.poll()
+                idle = (
+                    idle_timeout is not None
+                    and time.monotonic() - last_activity > idle_timeout
+                )
+
+                index = log.index
+                tmpfiles = index.tmpfiles
+                written = 0
+
+                for i, tmpfile in enumerate(tmpfiles):
+                    follower = followers.setdefault(tmpfile, TmpFileFollower(tmpfile, block_size, lookahead))
+                    if follower.finished:
+                        continue
+
+                    if i < len(tmpfiles) - 1 or idle:
+                        scanned = follower.poll(finish=True)
+                    else:
+                        # Only decode messages the log shows have been written
+                        scanned = follower.poll(end=int(index.frame(tmpfile)['size'].max()))
+
+                    if any(len(offsets) for offsets, _ in scanned):
+                        t = Timer(index, tmpfile, mode=timing)
+                        for offsets, times, batch in timestamp_blocks(decode_blocks(scanned), t, tmpfile):
+                            nc.write_messages(times, batch)
+                            follower.quality.add(offsets, batch.header)
+                            written += len(times)
+
+                    if follower.finished:
+                        follower.quality.finish()
+                        if with_progress and follower.quality.problems():
+                            print(f'Warning: {tmpfile}: {follower.quality.problems()}', flush=True)
+
+                if written or log_grew:
+                    nc.write_quality([(f.tempfile, f.quality.summary()) for f in followers.values()])
+                    nc.sync()
+                    last_activity = time.monotonic()
+
+                if written and with_progress:
+                    print(f'{time.strftime("%H:%M:%S")}: wrote {written} messages', flush=True)
+
+                if idle:
+                    break
+
+                time.sleep(poll_interval)
+
+        except KeyboardInterrupt:
+            pass
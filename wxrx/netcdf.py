@@ -1,15 +1,17 @@
+import dataclasses
 import datetime
+import os
+import shutil
 from typing import Any
 import uuid
 
 import numpy as np
 
-from netCDF4 import Dataset
-from faam_data import get_product
-from vocal.schema_types import type_from_spec
-
-from .arinc import Arinc708Message
-from .converters import scan_angle_from_int, gain_from_int, range_from_int, tilt_from_int
+from .arinc import Arinc708Batch, Arinc708Message
+from .converters import gains_from_ints, ranges_from_ints, scan_angles_from_ints, tilts_from_ints
+from .quality import QC_CLASSES
+from .schema import decode_value, load_schema
+from .sweeps import SWEEP_DTYPE, SWEEP_SETTINGS, SweepIndex
 from . import __version__ as wxrx_version
 
 
@@ -49,6 +51,10 @@ ENUM_DATA = {
     'Severe Turbulence': 7
 }
 
+# The number of records read at once when indexing the sweeps of an existing
+# file
+SWEEP_READ_RECORDS = 2**20
+
 def get_duration(start_time: datetime.datetime, end_time: datetime.datetime) -> str:
     """
     Get the duration of the flight in ISO8601 format
@@ -72,9 +78,23 @@ def GLOBAL_OVERWRITES(writer: 'NetCDFWriter') -> dict[str, Any]:
     Get the global attributes for the netCDF file which are not defined in the product definition
     or in the core file.
     """
-    start_time = datetime.datetime.utcfromtimestamp(int(writer.nc['time'][0]))
-    end_time = datetime.datetime.utcfromtimestamp(int(writer.nc['time'][-1]))
-    duration = get_duration(start_time, end_time)
+    # When appending, records after the last written may be left over from
+    # an earlier run. If nothing has been written, for example when following
+    # stops before recording starts, there is no time coverage.
+    coverage: dict[str, Any] = dict.fromkeys(
+        ('time_coverage_duration', 'time_coverage_end', 'time_coverage_start')
+    )
+    start_date = writer.flight_date.strftime('%Y-%m-%d')
+    if writer.num_records:
+        start_time = datetime.datetime.utcfromtimestamp(int(writer.nc['time'][0]))
+        end_time = datetime.datetime.utcfromtimestamp(int(writer.nc['time'][writer.num_records - 1]))
+        start_date = start_time.strftime('%Y-%m-%d')
+        coverage = {
+            'time_coverage_duration': get_duration(start_time, end_time),
+            'time_coverage_end': end_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'time_coverage_start': start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        }
+
     return {
         'comment': ('This file is a netCDF representation of the weather radar data from '
                     'the ARINC708 databus.'),
@@ -90,30 +110,150 @@ def GLOBAL_OVERWRITES(writer: 'NetCDFWriter') -> dict[str, Any]:
         'revision_number': np.int32(0),
         'revision_date': datetime.date.today().strftime('%Y-%m-%d'),
         'uuid': str(uuid.uuid4()),
-        'time_coverage_duration': duration,
-        'time_coverage_end': end_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        'time_coverage_start': start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
-        'title': f'FAAM Weather Radar Data for flight {writer.flight_number} on {start_time.strftime("%Y-%m-%d")}',
+        **coverage,
+        'title': f'FAAM Weather Radar Data for flight {writer.flight_number} on {start_date}',
         'summary': f'This file contains the weather radar data from the FAAM aircraft, captured during flight {writer.flight_number}',
-        'id': writer.filename.replace('.nc', ''),
+        'id': os.path.basename(writer.filename).replace('.nc', ''),
 }
 
+@dataclasses.dataclass(frozen=True)
+class CompressionOptions:
+    """
+    Chunking and compression options for the variables in the netCDF file.
+
+    Variables along the unlimited time dimension are chunked with chunk_records
+    records, and are not chunked along any other dimension, unless overridden
+    for a given variable in chunksizes.
+    """
+    zlib: bool = True
+    complevel: int = 4
+    shuffle: bool = True
+    chunk_records: int = 4096
+    chunksizes: dict[str, tuple[int, ...]] = dataclasses.field(default_factory=dict)
+
+    def variable_kwargs(self, name: str, shape: tuple[int | None, ...]) -> dict[str, Any]:
+        """
+        Get the keyword arguments to pass to createVariable for a variable.
+
+        Args:
+            name (str): The name of the variable
+            shape (tuple[int | None, ...]): The size of each dimension of the
+                variable, with None for the unlimited dimension
+
+        Returns:
+            dict[str, Any]: Keyword arguments for createVariable
+        """
+        if name in self.chunksizes:
+            chunksizes = tuple(self.chunksizes[name])
+        else:
+            chunksizes = tuple(self.chunk_records if size is None else size for size in shape)
+
+        kwargs: dict[str, Any] = {'zlib': self.zlib, 'chunksizes': chunksizes}
+        if self.zlib:
+            kwargs.update(complevel=self.complevel, shuffle=self.shuffle)
+        return kwargs
+
+
+COMPRESSION_PRESETS = {
+    # Chunks match the size of the blocks written by write_messages, and keep
+    # whole reflectivity rays together, for reading slices in time
+    'default': CompressionOptions(),
+    # Cheapest compression, for quick-look processing
+    'fast': CompressionOptions(complevel=1),
+    # Smallest files, for archiving
+    'small': CompressionOptions(complevel=9, chunk_records=16384),
+    # No compression at all
+    'none': CompressionOptions(zlib=False),
+}
+
+
+def move_file(src: str, dst: str) -> None:
+    """
+    Move a file, replacing dst atomically, so that a partial file never
+    appears at dst. If src is on another filesystem, it is first copied to a
+    temporary file alongside dst.
+
+    Args:
+        src (str): The file to move
+        dst (str): The destination
+    """
+    try:
+        os.replace(src, dst)
+        return
+    except OSError:
+        pass
+
+    tmp = os.path.join(os.path.dirname(dst), f'.{os.path.basename(dst)}.part')
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.remove(src)
+
+
 class NetCDFWriter:
     """
     A class to write a netCDF file from the ARINC708 databus weather radar data.
     """
 
-    def __init__(self, corefile: str) -> None:
+    def __init__(self, corefile: str, buffer_size: int = 4096,
+                 compression: CompressionOptions | str = 'default',
+                 append_at: int | None = None, append_from: str | None = None,
+                 output_dir: str = '.', staging_dir: str | None = None,
+                 atomic: bool = True) -> None:
         """
         Create a new NetCDFWriter object.
 
         Args:
             corefile (str): Path to the core file to use for the metadata
+            buffer_size (int): The number of messages given to write_message to
+                buffer before writing them to the file. Defaults to 4096.
+            compression (CompressionOptions | str): The chunking and compression
+                options, or the name of one of COMPRESSION_PRESETS. Defaults to
+                'default'.
+            append_at (int | None): If given, the existing output file is opened
+                for appending, and messages are written from this record on,
+                overwriting any records after it. Defaults to None, creating a
+                new file.
+            append_from (str | None): The existing file to append to. Unless it is
+                the staging file, it is first copied to the staging file. Defaults
+                to the staging file.
+            output_dir (str): The directory to which the netCDF file is written.
+                Defaults to the current directory.
+            staging_dir (str | None): The directory in which the netCDF file is
+                written before it is moved to output_dir, for example fast local
+                storage. Defaults to output_dir.
+            atomic (bool): Whether to write to a temporary staging file, which
+                is only moved to output_dir, replacing any existing file, once it
+                has been written successfully. Otherwise the file is written in
+                place. Defaults to True.
         """
+        if isinstance(compression, str):
+            compression = COMPRESSION_PRESETS[compression]
+
         self.corefile = corefile
+        self.compression = compression
         self.filename: str = ''
         self.flight_date: datetime.datetime = datetime.datetime.min
         self.flight_number: str = ''
+        self.buffer_size = buffer_size
+        self.append_at = append_at
+        self.append_from = append_from
+        self.output_dir = output_dir
+        self.staging_dir = staging_dir
+        self.atomic = atomic
+        self.path: str = ''
+        # Messages given to write_message, waiting to be written
+        self._buffer = Arinc708Batch.empty(buffer_size)
+        self._buffer_times = np.empty(buffer_size, dtype=np.float64)
+        self._buffered = 0
+        self._num_records = 0
+        self.sweeps = SweepIndex()
+        # The number of sweeps which have ended, and been written to the file
+        self._sweeps_written = 0
 
     def _get_filename(self, corefile: str) -> str:
         """
@@ -125,101 +265,347 @@ class NetCDFWriter:
         Returns:
             str: Filename for the netCDF file
         """
+        from netCDF4 import Dataset
+
         with Dataset(corefile, 'r') as nc:
             self.flight_number = nc.getncattr('flight_number')
             self.flight_date = datetime.datetime.strptime(nc.getncattr('flight_date'), '%Y-%m-%d')
             return f'faam-wxrx_{self.flight_date.strftime("%Y%m%d")}_r0_{self.flight_number}_l0.nc'
-        
+
+    def get_filename(self) -> str:
+        """
+        Get the path of the netCDF file in the output directory, before it is opened.
+
+        Returns:
+            str: Path of the netCDF file
+        """
+        return os.path.normpath(os.path.join(self.output_dir, self._get_filename(self.corefile)))
+
+    def get_staging_filename(self) -> str:
+        """
+        Get the path to which the netCDF file is written before it is moved to
+        the output directory. If writing is not atomic, this is the path of the
+        netCDF file itself.
+
+        Returns:
+            str: Path of the staging file
+        """
+        filename = self.get_filename()
+        if not self.atomic:
+            return filename
+
+        directory = self.staging_dir or os.path.dirname(filename)
+        return os.path.join(directory, f'.{os.path.basename(filename)}.part')
+
+    @property
+    def num_records(self) -> int:
+        """
+        Returns the number of records written, including any in an appended file
+        before append_at.
+        """
+        return self._num_records + self._buffered
 
     def init_file(self) -> None:
         """
         Initialise the netCDF file, creating the dimensions and variables from the
-        product definition.
+        product schema.
         """
-        product = get_product('wxrx-raw')
-        for dimension in product.dimensions:
+        schema = load_schema('wxrx-raw')
+        sizes = {}
+        for dimension in schema.dimensions:
             self.nc.createDimension(dimension.name, dimension.size)
+            sizes[dimension.name] = dimension.size
 
-        for variable in product.variables:
+        for variable in schema.variables:
 
             ncvar = self.nc.createVariable(
-                variable.meta.name,
-                type_from_spec(variable.meta.datatype),
+                variable.name,
+                variable.dtype,
                 variable.dimensions,
-                fill_value=variable.attributes.FillValue,
-                zlib=True
+                fill_value=decode_value(variable.fill_value),
+                **self.compression.variable_kwargs(
+                    variable.name, tuple(sizes[d] for d in variable.dimensions)
+                )
             )
-            setattr(self, variable.meta.name, ncvar)
+            setattr(self, variable.name, ncvar)
 
-            for key, value in variable.attributes:
-                if value is None or key == 'FillValue' or 'derived_from_file' in key:
-                    continue
-                if key == 'frequency':
-                    value = np.int32(value)
+            for key, value in variable.ncattrs().items():
                 setattr(ncvar, key, value)
         
 
 
+    def write_messages(self, times: np.ndarray, batch: Arinc708Batch) -> None:
+        """
+        Write a block of ARINC708 messages to the netCDF file.
+
+        If the gain, range, tilt or scan angle of a message can not be decoded,
+        that field is written as a fill value. The remaining fields of the
+        message are written as usual.
+
+        Args:
+            times (np.ndarray): Time of each message, in seconds since the epoch
+            batch (Arinc708Batch): The messages
+        """
+        self.flush()
+
+        n = len(times)
+        if not n:
+            return
+
+        fields = batch.header
+
+        gain = gains_from_ints(fields['gain'])
+        range = ranges_from_ints(fields['range'])
+        tilt = tilts_from_ints(fields['tilt'])
+        scan_angle = scan_angles_from_ints(fields['scan_angle'])
+
+        s = slice(self._num_records, self._num_records + n)
+        self.time[s] = times
+        self.control_accept[s] = fields['control_accept']
+        self.slave[s] = fields['slave']
+        self.mode_annunciation[s] = fields['mode_annunciation']
+        self.faults[s] = fields['faults']
+        self.stabilization[s] = fields['stabilization']
+        self.operating_mode[s] = fields['operating_mode']
+        self.tilt[s] = tilt
+        self.gain[s] = gain
+        self.range[s] = range
+        self.data_accept[s] = fields['data_accept']
+        self.scan_angle[s] = scan_angle
+        self.reflectivity[s, :] = batch.reflectivity
+
+        # The sweeps are found from the values as written, so that they can be
+        # found again from the file when appending to it
+        settings = {'tilt': tilt, 'range': range, 'gain': gain,
+                    'operating_mode': fields['operating_mode']}
+        self.sweeps.add(
+            self._as_written('scan_angle', scan_angle),
+            {name: self._as_written(name, value) for name, value in settings.items()}
+        )
+
+        self._num_records += n
+
+    def _as_written(self, name: str, values: np.ndarray) -> np.ndarray:
+        """
+        Returns values as they are read back from a variable, with the dtype
+        of the variable and masked values filled.
+        """
+        ncvar = self.nc[name]
+        fill_value = getattr(ncvar, '_FillValue', 0)
+        return np.ma.filled(values, fill_value).astype(ncvar.dtype, copy=False)
+
     def write_message(self, time: float, message: Arinc708Message) -> None:
         """
-        Write a single ARINC708 message to the netCDF file.
+        Write a single ARINC708 message to the netCDF file. Messages are buffered,
+        and written in blocks of buffer_size messages.
 
         Args:
             time (float): Time of the message, in seconds since the epoch
             message (Arinc708Message): The ARINC708 message to write
         """
-        i = len(self.time)
-        try:
-            self.time[i] = time
-            self.control_accept[i] = message.control_accept
-            self.slave[i] = message.slave
-            self.mode_annunciation[i] = message.mode_annunciation
-            self.faults[i] = message.faults
-            self.stabilization[i] = message.stabilization
-            self.operating_mode[i] = message.operating_mode
-            self.tilt[i] = tilt_from_int(message.tilt)
-            self.gain[i] = gain_from_int(message.gain)
-            self.range[i] = range_from_int(message.range)
-            self.data_accept[i] = message.data_accept
-            self.scan_angle[i] = scan_angle_from_int(message.scan_angle)
-            self.reflectivity[i, :] = message.data[::-1]
-        except Exception as e:
-            pass
+        i = self._buffered
+        self._buffer_times[i] = time
+        self._buffer.header[i] = message[:-1]
+        self._buffer.reflectivity[i] = message.data[::-1]
+        self._buffered += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write any messages buffered by write_message to the netCDF file.
+        """
+        n, self._buffered = self._buffered, 0
+        if not n:
+            return
+
+        self.write_messages(self._buffer_times[:n], self._buffer[:n])
+
+    def write_quality(self, quality: list[tuple[str, dict[str, Any]]]) -> None:
+        """
+        Write the quality control counts of each tmp file, as variables along
+        the tmpfile and qc_class dimensions, replacing any already written.
+
+        Args:
+            quality (list[tuple[str, dict[str, Any]]]): The name of each tmp
+                file, and its counts, from FrameQuality.summary
+        """
+        if 'tmpfile' not in self.nc.dimensions:
+            self.nc.createDimension('tmpfile', None)
+            self.nc.createDimension('qc_class', len(QC_CLASSES))
+
+            tmpfile = self.nc.createVariable('qc_tmpfile', str, ('tmpfile',))
+            tmpfile.long_name = 'Name of the raw ARINC708 file'
+
+            for name, long_name in (('qc_frames', 'Number of frames'), ('qc_bytes', 'Number of bytes')):
+                ncvar = self.nc.createVariable(name, np.int64, ('tmpfile', 'qc_class'))
+                ncvar.long_name = f'{long_name} of each quality control class in each raw ARINC708 file'
+                ncvar.qc_classes = ' '.join(QC_CLASSES)
+
+        for i, (tmpfile, summary) in enumerate(quality):
+            self.nc['qc_tmpfile'][i] = os.path.basename(tmpfile)
+            self.nc['qc_frames'][i, :] = [summary['frames'].get(c, 0) for c in QC_CLASSES]
+            self.nc['qc_bytes'][i, :] = [summary['bytes'].get(c, 0) for c in QC_CLASSES]
+
+    def write_sweeps(self) -> None:
+        """
+        Write the sweeps of the records written so far, as variables along the
+        sweep dimension, so that each sweep can be read as a contiguous slice of
+        records, from sweep_start_record to sweep_end_record. Only the sweeps
+        found since they were last written are written.
+        """
+        if 'sweep' not in self.nc.dimensions:
+            self.nc.createDimension('sweep', None)
+
+            variables = [
+                ('sweep_start_record', np.int64, -1,
+                 {'long_name': 'Index along the time dimension of the first record of the sweep'}),
+                ('sweep_end_record', np.int64, -1,
+                 {'long_name': 'Index along the time dimension one past the last record of the sweep'}),
+                ('sweep_direction', np.int8, None,
+                 {'long_name': ('Direction of the antenna through the sweep: 1 for increasing '
+                                'scan angle, -1 for decreasing, 0 if it did not move')}),
+            ]
+            # The settings of each sweep are described as those of each record
+            for name in SWEEP_SETTINGS:
+                record = self.nc[name]
+                attrs = {key: record.getncattr(key) for key in record.ncattrs() if key != '_FillValue'}
+                attrs['long_name'] = f'{attrs.get("long_name", name)} of the sweep'
+                variables.append((f'sweep_{name}', record.dtype, getattr(record, '_FillValue', None), attrs))
+
+            for name, dtype, fill_value, attrs in variables:
+                ncvar = self.nc.createVariable(name, dtype, ('sweep',), fill_value=fill_value,
+                                               **self.compression.variable_kwargs(name, (None,)))
+                ncvar.setncatts(attrs)
+
+        first = self._sweeps_written
+        sweeps, ends = self.sweeps.sweeps(first)
+        if not len(sweeps):
+            return
+
+        s = slice(first, first + len(sweeps))
+        self.nc['sweep_start_record'][s] = sweeps['start']
+        self.nc['sweep_end_record'][s] = ends
+        self.nc['sweep_direction'][s] = sweeps['direction']
+        for name in SWEEP_SETTINGS:
+            # Masked values were filled with the fill value of the variable
+            self.nc[f'sweep_{name}'][s] = sweeps[name].astype(self.nc[name].dtype)
+
+        # Any sweeps left from an earlier run, beyond those written, are cleared
+        stale = len(self.nc.dimensions['sweep']) - s.stop
+        if stale > 0:
+            for name in ('sweep_start_record', 'sweep_end_record'):
+                self.nc[name][s.stop:] = np.full(stale, -1)
+
+        # The last sweep may yet be extended, so is written again next time
+        self._sweeps_written = max(len(self.sweeps) - 1, 0)
+
+    def _restore_sweeps(self, records: int) -> None:
+        """
+        Index the sweeps of the first records of an appended file. Those already
+        written to it are read back, except the last, which may have been cut
+        short, so its records are indexed again.
+        """
+        sweeps = np.empty(0, dtype=SWEEP_DTYPE)
+        if 'sweep' in self.nc.dimensions:
+            start = self.nc['sweep_start_record'][:]
+            kept = np.ma.filled(start, records) < records
+            sweeps = np.empty(int(kept.sum()), dtype=SWEEP_DTYPE)
+            sweeps['start'] = start[kept]
+            sweeps['direction'] = self.nc['sweep_direction'][:][kept]
+            for name in SWEEP_SETTINGS:
+                sweeps[name] = self._as_written(f'sweep_{name}', self.nc[f'sweep_{name}'][:])[kept]
+
+        resume = int(sweeps['start'][-1]) if len(sweeps) else 0
+        if resume:
+            self.sweeps = SweepIndex(sweeps[:-1], resume, self.nc['scan_angle'][resume - 1])
+        else:
+            self.sweeps = SweepIndex()
+
+        for i in range(resume, records, SWEEP_READ_RECORDS):
+            s = slice(i, min(i + SWEEP_READ_RECORDS, records))
+            self.sweeps.add(
+                self._as_written('scan_angle', self.nc['scan_angle'][s]),
+                {name: self._as_written(name, self.nc[name][s]) for name in SWEEP_SETTINGS}
+            )
+        # Only those read back, before the last, are already written as they are
+        self._sweeps_written = max(len(sweeps) - 1, 0)
+
+    def sync(self) -> None:
+        """
+        Write any buffered messages, and the sweeps found so far, and sync the
+        netCDF file to disk, so that the messages written so far can be read
+        while the file is still open.
+        """
+        self.flush()
+        self.write_sweeps()
+        self.nc.sync()
 
     def __enter__(self) -> 'NetCDFWriter':
         """
         Context manager entry point. On entry, the netCDF file is opened and initialised.
         """
-        self.filename = self._get_filename(self.corefile)
-        self.nc = Dataset(self.filename, 'w')
+        from netCDF4 import Dataset
+
+        self.filename = self.get_filename()
+        self.path = self.get_staging_filename()
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        if self.append_at is not None:
+            append_from = self.append_from or self.path
+            if append_from != self.path:
+                shutil.copyfile(append_from, self.path)
+            self.nc = Dataset(self.path, 'a')
+            self._num_records = self.append_at
+            for name, ncvar in self.nc.variables.items():
+                setattr(self, name, ncvar)
+            self._restore_sweeps(self.append_at)
+            return self
+
+        self.nc = Dataset(self.path, 'w')
+        self._num_records = 0
+        self.sweeps = SweepIndex()
+        self._sweeps_written = 0
         self.init_file()
         return self
     
     def __exit__(self, exc_type: type, exc_value: Exception, traceback: object) -> None:
         """
         Context manager exit point. On exit, the netCDF file is closed and the global
-        attributes are written. Though not in that order.
+        attributes are written. Though not in that order. If writing is atomic and
+        no exception was raised, the staging file is then moved to the output
+        directory.
 
         Args:
             exc_type (type): Exception type
             exc_value (Exception): Exception value
             traceback (object): Traceback object
         """
-        overwrites = GLOBAL_OVERWRITES(self)
-        
-        with Dataset(self.corefile, 'r') as nc:
-            for attr in nc.ncattrs():
-                value = nc.getncattr(attr)
-                
-                if attr in overwrites:
-                    value = overwrites[attr]
-
-                    while callable(value):
-                        value = value()
-
-                if value is not None:
-                    self.nc.setncattr(attr, value)
-        self.nc.close()
+        from netCDF4 import Dataset
+
+        try:
+            self.flush()
+            self.write_sweeps()
+            overwrites = GLOBAL_OVERWRITES(self)
+
+            with Dataset(self.corefile, 'r') as nc:
+                for attr in nc.ncattrs():
+                    value = nc.getncattr(attr)
+
+                    if attr in overwrites:
+                        value = overwrites[attr]
+
+                        while callable(value):
+                            value = value()
+
+                    if value is not None:
+                        self.nc.setncattr(attr, value)
+        finally:
+            self.nc.close()
+
+        if exc_type is None and self.path != self.filename:
+            move_file(self.path, self.filename)
 
         
 
@@ -0,0 +1,55 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future
+import os
+from typing import Any
+
+
+def get_jobs(jobs: int) -> int:
+    """
+    Returns the number of worker processes to use. A value of 0 or less means
+    one per available core.
+
+    Args:
+        jobs (int): The requested number of jobs
+
+    Returns:
+        int: The number of worker processes to use
+    """
+    if jobs > 0:
+        return jobs
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def map_ordered(executor: Executor, fn: Callable[..., Any], iterable: Iterable[tuple],
+                window: int) -> Iterator[tuple[tuple, Any]]:
+    """
+    Map a function over an iterable of argument tuples using an executor, yielding
+    each argument tuple along with its result in the order of the iterable. At most
+    window tasks are in flight at once, which bounds the memory held by results
+    which are waiting to be consumed.
+
+    Args:
+        executor (Executor): The executor to submit tasks to
+        fn (Callable[..., Any]): The function to call
+        iterable (Iterable[tuple]): The arguments for each call
+        window (int): The maximum number of tasks in flight
+
+    Yields:
+        tuple[tuple, Any]: The arguments and result of each call
+    """
+    pending: deque[tuple[tuple, Future]] = deque()
+
+    try:
+        for args in iterable:
+            pending.append((args, executor.submit(fn, *args)))
+            if len(pending) >= window:
+                args, future = pending.popleft()
+                yield args, future.result()
+
+        while pending:
+            args, future = pending.popleft()
+            yield args, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,397 @@
+from collections.abc import Callable, Iterable, Iterator
+import queue
+import threading
+from typing import Any, TypeVar
+
+import numpy as np
+from tqdm import tqdm
+
+from .arinc import Arinc708Batch, ARINC708_LENGTH_BYTES, DEFAULT_LOOKAHEAD
+from .cache import CachedMessages
+from .netcdf import NetCDFWriter
+from .quality import FrameQuality
+from .read_wxrx import (
+    BLOCK_MESSAGES, confirm_margin, extract_messages, load_tmp_file, parse_messages, scan_offsets
+)
+from .stats import NO_STATS, Stats
+from .timer import Timer, epoch_seconds
+
+T = TypeVar('T')
+
+# The default size of the blocks read from each tmp file, in bytes
+DEFAULT_BLOCK_BYTES = 4 * 2**20
+
+
+class BlockScanner:
+    """
+    Scans raw ARINC 708 data which arrives in consecutive blocks, giving the same
+    messages as scan_offsets over the whole data. A message is only given once
+    it is complete, and once enough data follows it to confirm it, so the data
+    from the first message not yet given, along with the margin before it used
+    to confirm candidates, is held back until the next block arrives.
+    """
+
+    def __init__(self, start: int = 0, lookahead: int = DEFAULT_LOOKAHEAD) -> None:
+        """
+        Create a new BlockScanner object.
+
+        Args:
+            start (int): The offset in the file at which to start scanning.
+                Defaults to 0.
+            lookahead (int): The lookahead used to confirm candidates. Defaults
+                to DEFAULT_LOOKAHEAD.
+        """
+        self.lookahead = lookahead
+        self.margin = confirm_margin(lookahead)
+        # The first block starts the margin before start, so that candidates
+        # at start are confirmed as they would be by scanning the whole file
+        self.position = max(start - self.margin, 0)
+        self._carry = np.empty(0, dtype=np.uint8)
+        self._carry_start = self.position
+        self._resume = start
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns the number of bytes held back until the next block.
+        """
+        return len(self._carry)
+
+    @property
+    def consumed(self) -> int:
+        """
+        Returns the offset up to which all messages have been given. Scanning may
+        be restarted from here without skipping or repeating messages.
+        """
+        return self._resume
+
+    def scan(self, block: bytes | np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scan the next block of data for messages.
+
+        Args:
+            block (bytes | np.ndarray): The next block of data
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The offsets of the messages, in the
+            file, and the (N, 200) messages
+        """
+        block = np.frombuffer(block, dtype=np.uint8)
+        buffer = np.concatenate([self._carry, block]) if len(self._carry) else block
+        buffer_start = self._carry_start
+
+        self.position += len(block)
+
+        offsets = scan_offsets(buffer, start=self._resume - buffer_start, lookahead=self.lookahead)
+
+        # A message is ready once it is complete, and the data after it is
+        # enough to confirm it. Candidates before the first message which is
+        # not ready can no longer change.
+        if self.lookahead:
+            limit = len(buffer) - self.margin
+        else:
+            limit = len(buffer) - ARINC708_LENGTH_BYTES + 1
+        ready = offsets[:np.searchsorted(offsets, limit)]
+
+        resume = self._resume - buffer_start
+        if len(ready):
+            resume = int(ready[-1]) + ARINC708_LENGTH_BYTES
+        resume = max(resume, limit)
+
+        carry = max(resume - self.margin, 0)
+        self._carry = buffer[carry:].copy()
+        self._carry_start = buffer_start + carry
+        self._resume = buffer_start + resume
+
+        return ready + buffer_start, extract_messages(buffer, ready)
+
+    def finish(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Flush the messages held back at the end of the data, which can not be
+        confirmed by any more data. As with extract_messages, a message
+        truncated by the end of the data is zero padded.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The offsets of the messages, and the
+            messages
+        """
+        carry, self._carry = self._carry, np.empty(0, dtype=np.uint8)
+        offsets = scan_offsets(carry, start=max(self._resume - self._carry_start, 0),
+                               lookahead=self.lookahead)
+
+        buffer_start = self._carry_start
+        self._carry_start = self._resume = max(self.position, self._resume)
+        return offsets + buffer_start, extract_messages(carry, offsets)
+
+
+def read_blocks(filename: str, block_size: int = DEFAULT_BLOCK_BYTES, start: int = 0,
+                use_mmap: bool = True, end: int | None = None) -> Iterator[np.ndarray]:
+    """
+    Read a file in consecutive blocks.
+
+    Args:
+        filename (str): The file to read
+        block_size (int): The size of each block, in bytes
+        start (int): The offset at which to start reading. Defaults to 0.
+        use_mmap (bool): Whether to give views onto the memory mapped file, rather
+            than reading each block. Defaults to True.
+        end (int | None): The offset at which to stop reading. Defaults to the
+            end of the file.
+
+    Yields:
+        np.ndarray: Each block, as a uint8 array
+    """
+    if use_mmap:
+        data = load_tmp_file(filename, use_mmap=True)[:end]
+        for offset in range(start, len(data), block_size):
+            yield data[offset : offset + block_size]
+        return
+
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        position = start
+        while end is None or position < end:
+            size = block_size if end is None else min(block_size, end - position)
+            block = f.read(size)
+            if not block:
+                break
+            position += len(block)
+            yield np.frombuffer(block, dtype=np.uint8)
+
+
+def prefetch(iterable: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """
+    Advance an iterable in a background thread, keeping up to depth items ready,
+    so that (for example) reading the next block overlaps processing this one.
+
+    Args:
+        iterable (Iterable[T]): The iterable to advance
+        depth (int): The maximum number of items to keep ready
+
+    Yields:
+        T: The items of the iterable
+    """
+    items: queue.Queue[tuple[bool, Any]] = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item: tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker() -> None:
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+            put((True, done))
+        except BaseException as e:
+            put((False, e))
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                raise item
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def scan_blocks(blocks: Iterable[np.ndarray], scanner: BlockScanner | None = None,
+                finish: bool = True, stats: Stats = NO_STATS
+                ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Scan consecutive blocks of raw ARINC 708 data for messages.
+
+    Args:
+        blocks (Iterable[np.ndarray]): The blocks of data
+        scanner (BlockScanner | None): The scanner to use. Defaults to a new
+            scanner, starting at offset 0.
+        finish (bool): Whether to flush a partial message at the end of the
+            data. Defaults to True.
+        stats (Stats): The statistics to record the scan in. Defaults to NO_STATS.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray]: The offsets of the messages in each block,
+        and the messages
+    """
+    scanner = scanner or BlockScanner()
+    for block in blocks:
+        with stats.stage('scan', len(block)):
+            offsets, messages = scanner.scan(block)
+        stats.count('scan', messages=len(offsets))
+        yield offsets, messages
+    if finish:
+        offsets, messages = scanner.finish()
+        stats.count('scan', messages=len(offsets))
+        yield offsets, messages
+
+
+def decode_blocks(scanned: Iterable[tuple[np.ndarray, np.ndarray]], stats: Stats = NO_STATS
+                  ) -> Iterator[tuple[np.ndarray, Arinc708Batch]]:
+    """
+    Decode blocks of messages.
+
+    Args:
+        scanned (Iterable[tuple[np.ndarray, np.ndarray]]): The offsets and messages
+            of each block
+        stats (Stats): The statistics to record the decoding in. Defaults to NO_STATS.
+
+    Yields:
+        tuple[np.ndarray, Arinc708Batch]: The offsets and messages of each block
+    """
+    for offsets, messages in scanned:
+        if len(offsets):
+            with stats.stage('decode', messages.nbytes):
+                batch = parse_messages(messages)
+            stats.count('decode', messages=len(offsets))
+            yield offsets, batch
+
+
+def timestamp_blocks(decoded: Iterable[tuple[np.ndarray, Arinc708Batch]], t: Timer,
+                     tempfile: str, stats: Stats = NO_STATS
+                     ) -> Iterator[tuple[np.ndarray, np.ndarray, Arinc708Batch]]:
+    """
+    Add the time of each message to blocks of decoded messages.
+
+    Args:
+        decoded (Iterable[tuple[np.ndarray, Arinc708Batch]]): The offsets and
+            messages of each block
+        t (Timer): The timer object, used to convert the offsets to timestamps
+        tempfile (str): The filename of the raw ARINC 708 file
+        stats (Stats): The statistics to record the timestamping in. Defaults to
+            NO_STATS.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray, Arinc708Batch]: The offsets, times and
+        messages of each block
+    """
+    for offsets, batch in decoded:
+        with stats.stage('timestamp'):
+            times = epoch_seconds(t.times_at_sizes(offsets, tempfile))
+        stats.count('timestamp', messages=len(offsets))
+        yield offsets, times, batch
+
+
+def stream_tmp_file(tempfile: str, t: Timer, nc: NetCDFWriter, pbar: tqdm | None = None,
+                    block_size: int = DEFAULT_BLOCK_BYTES, use_mmap: bool = True, start: int = 0,
+                    callback: Callable[[int, int], None] | None = None,
+                    on_decoded: Callable[[np.ndarray, Arinc708Batch], None] | None = None,
+                    quality: FrameQuality | None = None, lookahead: int = DEFAULT_LOOKAHEAD,
+                    stats: Stats = NO_STATS) -> None:
+    """
+    Process a single raw ARINC 708 file as a stream of fixed size blocks, and
+    write the output to a NetCDF file. Blocks are read ahead in a background
+    thread, and memory use is bounded by the block size, rather than the size of
+    the file.
+
+    Args:
+        tempfile (str): The filename of the raw ARINC 708 file
+        t (Timer): The timer object, used to convert the index of the message to a timestamp
+        nc (NetCDFWriter): The NetCDF writer object
+        pbar (tqdm|None): The progress bar object
+        block_size (int): The size of the blocks read from the file, in bytes
+        use_mmap (bool): Whether to memory map the file, rather than reading it
+        start (int): The offset at which to start, which must be the start of a
+            message, or the end of the messages already processed. Defaults to 0.
+        callback (Callable[[int, int], None] | None): If given, called after each
+            block is written with the offset up to which the file has been
+            processed, and the number of messages written
+        on_decoded (Callable[[np.ndarray, Arinc708Batch], None] | None): If given,
+            called with the offsets and messages of each block decoded
+        quality (FrameQuality | None): If given, the frames of each block are
+            classified in it
+        lookahead (int): The lookahead used to confirm candidates. Defaults to
+            DEFAULT_LOOKAHEAD.
+        stats (Stats): The statistics to record each stage in. Defaults to NO_STATS.
+    """
+    scanner = BlockScanner(start, lookahead)
+    blocks = prefetch(stats.timed(
+        'read', read_blocks(tempfile, block_size, start=scanner.position, use_mmap=use_mmap)
+    ))
+
+    stages = timestamp_blocks(
+        decode_blocks(scan_blocks(blocks, scanner, stats=stats), stats=stats), t, tempfile,
+        stats=stats
+    )
+
+    position = 0
+    for offsets, times, batch in stages:
+        with stats.stage('write'):
+            nc.write_messages(times, batch)
+        stats.count('write', messages=len(times))
+
+        if on_decoded:
+            on_decoded(offsets, batch)
+
+        if quality:
+            quality.add(offsets, batch.header)
+
+        if callback:
+            callback(scanner.consumed, len(times))
+
+        if pbar:
+            pbar.update(scanner.position - position)
+        position = scanner.position
+
+    if callback:
+        callback(scanner.consumed, 0)
+
+
+def replay_tmp_file(cached: CachedMessages, tempfile: str, t: Timer, nc: NetCDFWriter,
+                    pbar: tqdm | None = None, block_size: int = BLOCK_MESSAGES, start: int = 0,
+                    callback: Callable[[int, int], None] | None = None,
+                    quality: FrameQuality | None = None, stats: Stats = NO_STATS) -> None:
+    """
+    Write the cached messages of a single raw ARINC 708 file to a NetCDF file,
+    without scanning or decoding the file.
+
+    Args:
+        cached (CachedMessages): The cached messages of the file
+        tempfile (str): The filename of the raw ARINC 708 file
+        t (Timer): The timer object, used to convert the index of the message to a timestamp
+        nc (NetCDFWriter): The NetCDF writer object
+        pbar (tqdm|None): The progress bar object
+        block_size (int): The number of messages to write at once
+        start (int): The offset of the first message to write. Defaults to 0.
+        callback (Callable[[int, int], None] | None): If given, called after each
+            block is written with the offset up to which the file has been
+            processed, and the number of messages written
+        quality (FrameQuality | None): If given, the frames of each block are
+            classified in it
+        stats (Stats): The statistics to record each stage in. Defaults to NO_STATS.
+    """
+    blocks = stats.timed('cache', cached.blocks(block_size, start),
+                         size=lambda block: len(block[1]) * ARINC708_LENGTH_BYTES)
+
+    position = 0
+    for consumed, offsets, batch in blocks:
+        with stats.stage('timestamp'):
+            times = epoch_seconds(t.times_at_sizes(offsets, tempfile))
+        stats.count('timestamp', messages=len(offsets))
+
+        with stats.stage('write'):
+            nc.write_messages(times, batch)
+        stats.count('write', messages=len(offsets))
+
+        if quality:
+            quality.add(offsets, batch.header)
+
+        if callback:
+            callback(consumed, len(offsets))
+
+        if pbar:
+            pbar.update(consumed - position)
+        position = consumed
@@ -0,0 +1,181 @@
+import os
+from typing import Any
+
+import numpy as np
+
+from .arinc import ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES
+from .converters import GAIN_VALID, RANGE_VALID
+
+# The classes of frame, in the order in which they are reported. Every byte of
+# a tmp file is in exactly one class:
+#   valid: a complete message, whose gain and range can be decoded
+#   bad_label: bytes skipped where a message was expected, holding no label
+#   truncated: a message cut off by the end of the file
+#   unknown_code: a complete message whose gain or range can not be decoded
+#   resync_skip: bytes skipped where a message was expected, holding one or
+#       more labels which the scanner rejected as the start of a message
+QC_CLASSES = ('valid', 'bad_label', 'truncated', 'unknown_code', 'resync_skip')
+
+# The maximum number of byte ranges recorded for each tmp file
+MAX_QC_RANGES = 10000
+
+
+class FrameQuality:
+    """
+    Classifies the frames of a tmp file, counting the frames and bytes of each
+    class in QC_CLASSES, and recording the byte ranges of those which are not
+    messages.
+
+    Frames are classified a block at a time, from the offsets and headers of
+    the messages scanned and decoded, so it adds little to the cost of decoding.
+    Skipped bytes are found from the gaps between consecutive messages, and are
+    only read to tell bad labels from resync skips.
+    """
+
+    def __init__(self, tmpfile: str, start: int = 0, data: bytes | np.ndarray | None = None,
+                 summary: dict[str, Any] | None = None) -> None:
+        """
+        Create a new FrameQuality object.
+
+        Args:
+            tmpfile (str): The filename of the tmp file
+            start (int): The offset in the tmp file of the first message which
+                will be added. Defaults to 0.
+            data (bytes | np.ndarray | None): The raw data of the tmp file, if it
+                is loaded, from which skipped bytes are read. Defaults to None,
+                reading them from the file.
+            summary (dict[str, Any] | None): The counts, from summary, of the
+                frames already added, if resuming. Classification then resumes
+                where it left off, rather than at start. Defaults to None.
+        """
+        self.tmpfile = tmpfile
+        self.frames = dict.fromkeys(QC_CLASSES, 0)
+        self.bytes = dict.fromkeys(QC_CLASSES, 0)
+        # The byte ranges classified in this run which are not complete
+        # messages, as (start, end, class)
+        self.ranges: list[tuple[int, int, str]] = []
+        self.size = 0
+        # The end of the last message added
+        self._position = start
+        if summary:
+            self.frames.update(summary['frames'])
+            self.bytes.update(summary['bytes'])
+            self._position = summary['position']
+        self._data = data
+
+    def _count(self, name: str, frames: int, nbytes: int) -> None:
+        self.frames[name] += frames
+        self.bytes[name] += nbytes
+
+    def _record(self, starts: np.ndarray, ends: np.ndarray, name: str) -> None:
+        space = MAX_QC_RANGES - len(self.ranges)
+        if space > 0:
+            self.ranges += [(s, e, name) for s, e in zip(starts[:space].tolist(), ends[:space].tolist())]
+
+    def _read_skipped(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Returns the skipped bytes in the given ranges, concatenated.
+        """
+        lengths = ends - starts
+        if self._data is not None:
+            buffer = np.frombuffer(self._data, dtype=np.uint8)
+            first = np.cumsum(lengths) - lengths
+            index = np.repeat(starts - first, lengths) + np.arange(lengths.sum())
+            return buffer[index]
+
+        chunks = []
+        with open(self.tmpfile, 'rb') as f:
+            for start, length in zip(starts.tolist(), lengths.tolist()):
+                f.seek(start)
+                chunks.append(f.read(length))
+        return np.frombuffer(b''.join(chunks), dtype=np.uint8)
+
+    def _skip(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        """
+        Classify the skipped byte ranges [starts, ends) as bad labels or resync
+        skips.
+        """
+        if not len(starts):
+            return
+
+        lengths = ends - starts
+        labels = self._read_skipped(starts, ends) == ARINC708_DELINIATOR
+        resync = np.add.reduceat(labels, np.cumsum(lengths) - lengths) > 0
+
+        for name, selected in (('bad_label', ~resync), ('resync_skip', resync)):
+            self._count(name, int(selected.sum()), int(lengths[selected].sum()))
+            self._record(starts[selected], ends[selected], name)
+
+    def add(self, offsets: np.ndarray, header: np.ndarray) -> None:
+        """
+        Classify a block of messages, and the bytes skipped before them.
+
+        Args:
+            offsets (np.ndarray): The offsets of the messages in the tmp file,
+                following those already added
+            header (np.ndarray): The decoded headers of the messages
+        """
+        if not len(offsets):
+            return
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        expected = np.empty_like(offsets)
+        expected[0] = self._position
+        expected[1:] = offsets[:-1] + ARINC708_LENGTH_BYTES
+        skipped = offsets > expected
+        self._skip(expected[skipped], offsets[skipped])
+        self._position = int(offsets[-1]) + ARINC708_LENGTH_BYTES
+
+        # Only the last message of a file can be truncated, and the file may
+        # have grown since its size was last checked
+        if self._position > self.size:
+            self.size = os.path.getsize(self.tmpfile)
+        truncated = offsets + ARINC708_LENGTH_BYTES > self.size
+        if truncated.any():
+            starts = offsets[truncated]
+            self._count('truncated', len(starts), int((self.size - starts).sum()))
+            self._record(starts, np.full_like(starts, self.size), 'truncated')
+
+        complete = ~truncated
+        unknown = ~(GAIN_VALID[header['gain']] & RANGE_VALID[header['range']]) & complete
+        n_unknown = int(unknown.sum())
+        n_valid = int(complete.sum()) - n_unknown
+        self._count('unknown_code', n_unknown, n_unknown * ARINC708_LENGTH_BYTES)
+        self._count('valid', n_valid, n_valid * ARINC708_LENGTH_BYTES)
+
+    def finish(self, size: int | None = None) -> None:
+        """
+        Classify any bytes skipped after the last message, once the whole tmp
+        file has been added.
+
+        Args:
+            size (int | None): The size of the tmp file. Defaults to its current size.
+        """
+        self.size = os.path.getsize(self.tmpfile) if size is None else size
+        if self._position < self.size:
+            self._skip(np.array([self._position]), np.array([self.size]))
+            self._position = self.size
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Returns the number of frames and bytes of each class, and the offset up
+        to which they have been classified, suitable for writing as JSON.
+        """
+        return {'frames': dict(self.frames), 'bytes': dict(self.bytes), 'position': self._position}
+
+    def report(self) -> dict[str, Any]:
+        """
+        Returns the summary, with the byte ranges which are not complete
+        messages, suitable for writing as JSON.
+        """
+        return {**self.summary(), 'ranges': [list(r) for r in self.ranges]}
+
+    def problems(self) -> str:
+        """
+        Returns a description of the frames which are not valid, or an empty
+        string if they all are.
+        """
+        return ', '.join(
+            f'{self.frames[name]} {name.replace("_", " ")} ({self.bytes[name]} bytes)'
+            for name in QC_CLASSES[1:] if self.frames[name]
+        )
@@ -1,11 +1,111 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from concurrent.futures import Executor, ProcessPoolExecutor
+import contextlib
+import mmap
 import os
 
+import numpy as np
 from tqdm import tqdm
 
-from .arinc import Arinc708Message, ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES
-from .netcdf import NetCDFWriter
-from .timer import Timer
+from .arinc import (
+    Arinc708Batch, Arinc708Message, ARINC708_DELINIATOR, ARINC708_LENGTH_BYTES, ARINC708_HEADER_BYTES,
+    ARINC708_HEADER_DTYPE, ARINC708_NUM_BINS, DEFAULT_LOOKAHEAD
+)
+from .cache import MessageCache
+from .checkpoint import Checkpoint, checkpoint_options
+from .converters import GAIN_VALID, RANGE_VALID
+from .netcdf import CompressionOptions, NetCDFWriter
+from .parallel import get_jobs, map_ordered
+from .quality import FrameQuality
+from .stats import NO_STATS, Stats
+from .timer import LogIndex, Timer, epoch_seconds
+
+# The number of messages to decode and write at once
+BLOCK_MESSAGES = 4096
+
+# The number of messages decoded by each task, when decoding in parallel
+PARALLEL_BLOCK_MESSAGES = 16384
+
+# The number of bytes scanned by each task, when scanning in parallel
+SCAN_CHUNK_BYTES = 64 * 2**20
+
+
+# The layout of the 64 bit message header, as (field, shift, mask). See the
+# ARINC 708 specification for details.
+HEADER_LAYOUT = (
+    # First 8 bits are the label
+    ('label', 0, 0xff),
+    # Bit 9 and 10 are the control accept
+    ('control_accept', 8, 0x3),
+    # Bit 11 is the slave bit
+    ('slave', 10, 0x1),
+    # Bits 12 and 13 are spare
+    ('spare1', 11, 0x3),
+    # Bits 14 to 18 are the mode annunciation
+    ('mode_annunciation', 13, 0x1f),
+    # Bits 19 to 25 are the faults
+    ('faults', 18, 0x7f),
+    # Bit 26 is the stabilization bit
+    ('stabilization', 25, 0x1),
+    # Bits 27 to 29 are the operating mode
+    ('operating_mode', 26, 0x7),
+    # Bits 30 to 36 are the tilt
+    ('tilt', 29, 0x7f),
+    # Bits 37 to 42 are the gain
+    ('gain', 36, 0x3f),
+    # Bits 43 to 48 are the range
+    ('range', 42, 0x7f),
+    # Bit 49 is the spare
+    ('spare2', 48, 0x1),
+    # Bits 50 and 51 are the data accept
+    ('data_accept', 49, 0x3),
+    # Bits 52 to 63 are the scan angle
+    ('scan_angle', 51, 0xfff),
+)
+
+# Each 3 byte group of the payload holds 8 data points of 3 bits each
+_BIN_SHIFTS = np.arange(0, 24, 3, dtype=np.uint32)
+
+
+def parse_messages(messages: np.ndarray) -> Arinc708Batch:
+    """
+    Parse a block of ARINC 708 messages at once. See the ARINC 708 specification
+    for details.
+
+    Short (truncated) messages should be zero padded to ARINC708_LENGTH_BYTES,
+    which gives the same result as parsing them with parse_message.
+
+    Args:
+        messages (np.ndarray): An (N, 200) uint8 array of raw messages
+
+    Returns:
+        Arinc708Batch: The N message headers, and their data points as an
+        (N, 512) reflectivity array in output bin order
+    """
+    messages = np.asarray(messages, dtype=np.uint8).reshape(-1, ARINC708_LENGTH_BYTES)
+    n = len(messages)
+
+    # Each message has a 64 bit little endian header
+    b = np.ascontiguousarray(messages[:, :ARINC708_HEADER_BYTES]).view('<u8').ravel()
+
+    header = np.empty(n, dtype=ARINC708_HEADER_DTYPE)
+    for name, shift, mask in HEADER_LAYOUT:
+        header[name] = (b >> np.uint64(shift)) & np.uint64(mask)
+
+    # The rest of the message is the data. Each data point is 3 bits, so every
+    # 3 bytes hold 8 data points, the first in the least significant bits.
+    groups = messages[:, ARINC708_HEADER_BYTES:].reshape(n, -1, 3)
+    words = groups[..., 0].astype(np.uint32)
+    words |= groups[..., 1].astype(np.uint32) << 8
+    words |= groups[..., 2].astype(np.uint32) << 16
+
+    data = np.empty(words.shape + (len(_BIN_SHIFTS),), dtype=np.uint8)
+    for i, shift in enumerate(_BIN_SHIFTS):
+        data[..., i] = (words >> shift) & 0x7
+
+    # Data points are given most significant first, so unpacking them least
+    # significant first gives the bins in output order
+    return Arinc708Batch(header, data.reshape(n, ARINC708_NUM_BINS))
 
 
 def parse_message(data: bytes) -> Arinc708Message:
@@ -18,180 +118,705 @@ def parse_message(data: bytes) -> Arinc708Message:
     Returns:
         Arinc708Message: The parsed message
     """
+    raw = np.frombuffer(data, dtype=np.uint8)[:ARINC708_LENGTH_BYTES]
+    message = np.zeros((1, ARINC708_LENGTH_BYTES), dtype=np.uint8)
+    message[0, :len(raw)] = raw
 
-    # Each message has a 64 bit header
-    header = data[0:8]
-    b = int.from_bytes(header, 'little')
+    return parse_messages(message)[0]
 
-    # First 8 bits are the label
-    label = b & 0xff
-    
-    # Bit 9 and 10 are the control accept
-    control_accept = (b >> 8) & 0x3
 
-    # Bit 11 is the slave bit
-    slave = (b >> 10) & 0x1
-    # print('slave', bin(slave))
+def load_tmp_file(filename: str, use_mmap: bool = True) -> bytes | np.ndarray:
+    """
+    Load a raw ARINC 708 file.
 
-    # Bits 12 and 13 are spare
-    spare1 = (b >> 11) & 0x3
+    By default the file is memory mapped rather than read, so that the data,
+    and any message sliced from it, is a read-only view onto the file and no
+    copy of the file is held in memory.
 
-    # Bits 14 to 18 are the mode annunciation
-    mode_annunciation = (b >> 13) & 0x1f
+    Args:
+        filename (str): The filename of the raw ARINC 708 file
+        use_mmap (bool): Whether to memory map the file. Defaults to True.
 
-    # Bits 19 to 25 are the faults
-    faults = (b >> 18) & 0x7f
+    Returns:
+        bytes | np.ndarray: The raw ARINC 708 data, as bytes, or as a uint8
+        array backed by the memory mapped file
+    """
+    with open(filename, 'rb') as f:
+        if not use_mmap:
+            return f.read()
 
-    # Bit 26 is the stabilization bit
-    stabilization = (b >> 25) & 0x1
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.empty(0, dtype=np.uint8)
 
-    # Bits 27 to 29 are the operating mode
-    operating_mode = (b >> 26) & 0x7
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    # Bits 30 to 36 are the tilt
-    tilt = (b >> 29) & 0x7f
+    if hasattr(mapped, 'madvise'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
 
-    # Bits 37 to 42 are the gain
-    gain = (b >> 36) & 0x3f
+    return np.frombuffer(mapped, dtype=np.uint8)
 
-    # Bits 43 to 48 are the range
-    range = (b >> 42) & 0x7f
 
-    # Bit 49 is the spare
-    spare2 = (b >> 48) & 0x1
+def follow_links(links: np.ndarray) -> np.ndarray:
+    """
+    Follow chains of links to their ends by pointer doubling.
 
-    # Bits 50 and 51 are the data accept
-    data_accept = (b >> 49) & 0x3
+    Args:
+        links (np.ndarray): The index of the item linked to by each item, or
+            its own index if it is the end of a chain
 
-    # Bits 52 to 63 are the scan angle
-    scan_angle = (b >> 51) & 0xfff
-
-    # The rest of the message is the data. Each data point is 3 bits.
-    # We convert the data to an integer and then shift it to get the data points.
-    data = int.from_bytes(data[8:], 'little')
-
-    data_buffer = []
-    
-    rshift = 1533 # 1533 = 1600 - 64 - 3
-    while(rshift >= 0):
-        data_buffer.append(data >> rshift & 0x7)
-        rshift -= 3
-
-    # Return a named tuple with the parsed data
-    return Arinc708Message(
-        label=label,
-        control_accept=control_accept,
-        slave=slave,
-        spare1=spare1,
-        mode_annunciation=mode_annunciation,
-        faults=faults,
-        stabilization=stabilization,
-        operating_mode=operating_mode,
-        tilt=tilt,
-        gain=gain,
-        range=range,
-        spare2=spare2,
-        data_accept=data_accept,
-        scan_angle=scan_angle,
-        data=data_buffer
+    Returns:
+        np.ndarray: The index of the end of the chain from each item
+    """
+    while True:
+        jumped = links[links]
+        if np.array_equal(jumped, links):
+            return links
+        links = jumped
+
+
+def confirm_candidates(candidates: np.ndarray, length: int, lookahead: int) -> np.ndarray:
+    """
+    Confirm candidate message starts by the spacing of the labels around them.
+    A candidate is confirmed if it is one of a run of at least lookahead + 1
+    candidates spaced exactly one message apart, or if its run reaches the end
+    of the data, so that it can not be refuted.
+
+    Args:
+        candidates (np.ndarray): The sorted offsets of the labels in the data
+        length (int): The length of the data
+        lookahead (int): The number of further candidates, one message apart
+            before or after a candidate, needed to confirm it
+
+    Returns:
+        np.ndarray: Whether each candidate is confirmed
+    """
+    n = len(candidates)
+    index = np.arange(n)
+
+    following = np.searchsorted(candidates, candidates + ARINC708_LENGTH_BYTES)
+    linked = following < n
+    linked[linked] = candidates[following[linked]] == candidates[linked] + ARINC708_LENGTH_BYTES
+
+    preceding = np.searchsorted(candidates, candidates - ARINC708_LENGTH_BYTES)
+    linked_back = preceding < n
+    linked_back[linked_back] = (
+        candidates[preceding[linked_back]] == candidates[linked_back] - ARINC708_LENGTH_BYTES
     )
 
+    last = candidates[follow_links(np.where(linked, following, index))]
+    first = candidates[follow_links(np.where(linked_back, preceding, index))]
 
-def load_tmp_file(filename: str) -> bytes:
+    runs = (last - first) // ARINC708_LENGTH_BYTES + 1
+    return (runs > lookahead) | (last + ARINC708_LENGTH_BYTES >= length)
+
+
+def header_valid(buffer: np.ndarray, offsets: np.ndarray) -> np.ndarray:
     """
-    Load a raw ARINC 708 file.
+    Check whether the messages at the given offsets have a gain and range code
+    which can be decoded.
 
     Args:
-        filename (str): The filename of the raw ARINC 708 file
+        buffer (np.ndarray): The raw ARINC 708 data, as a uint8 array
+        offsets (np.ndarray): The offsets of the messages, each followed by at
+            least a full header
 
     Returns:
-        bytes: The raw ARINC 708 data
+        np.ndarray: Whether each message has a known gain and range code
     """
-    with open(filename, 'rb') as f:
-        return f.read()
+    index = offsets[:, np.newaxis] + np.arange(ARINC708_HEADER_BYTES)
+    header = buffer[index].view('<u8').ravel()
+
+    layout = {name: (shift, mask) for name, shift, mask in HEADER_LAYOUT}
+    valid = np.ones(len(offsets), dtype=bool)
+    for name, table in (('gain', GAIN_VALID), ('range', RANGE_VALID)):
+        shift, mask = layout[name]
+        valid &= table[((header >> np.uint64(shift)) & np.uint64(mask)).astype(np.intp)]
+    return valid
 
 
-def scan_tmp_data(data: bytes) -> Generator[tuple[int, Arinc708Message], None, None]:
+def accept_candidates(buffer: np.ndarray, candidates: np.ndarray, lookahead: int) -> np.ndarray:
     """
-    Scan a raw ARINC 708 file and yield each message.
+    Choose the candidate message starts to be taken as messages. Candidates
+    confirmed by confirm_candidates are taken. A candidate which is not
+    confirmed, such as a message isolated between runs of junk, is still taken
+    if it is not refuted, that is no confirmed candidate lies within one message
+    length of it, and its header has a known gain and range code.
+
+    The choice for a candidate depends only on the data within
+    confirm_margin(lookahead) bytes either side of it.
 
     Args:
-        data (bytes): The raw ARINC 708 data
+        buffer (np.ndarray): The raw ARINC 708 data, as a uint8 array
+        candidates (np.ndarray): The sorted offsets of the labels in the data
+        lookahead (int): The number of further candidates, one message apart
+            before or after a candidate, needed to confirm it
 
-    Yields:
-        tuple[int, Arinc708Message]: The index of the message and the message
+    Returns:
+        np.ndarray: Whether each candidate is taken
+    """
+    accepted = confirm_candidates(candidates, len(buffer), lookahead)
+    confirmed = candidates[accepted]
+    unconfirmed = np.flatnonzero(~accepted)
+    if not len(unconfirmed):
+        return accepted
+
+    # An unconfirmed candidate is at least one message length from the end of
+    # the data, so its header is complete
+    offsets = candidates[unconfirmed]
+    following = np.searchsorted(confirmed, offsets)
+    after = np.append(confirmed, np.iinfo(np.int64).max)[following]
+    before = np.insert(confirmed, 0, np.iinfo(np.int64).min // 2)[following]
+    unrefuted = (after - offsets >= ARINC708_LENGTH_BYTES) & (offsets - before >= ARINC708_LENGTH_BYTES)
+
+    accepted[unconfirmed[unrefuted]] = header_valid(buffer, offsets[unrefuted])
+    return accepted
+
+
+def confirm_margin(lookahead: int) -> int:
     """
+    Returns the number of bytes of data either side of a candidate message
+    start on which the choice of whether to take it depends.
 
+    Args:
+        lookahead (int): The lookahead used to confirm candidates
+
+    Returns:
+        int: The margin, in bytes. With a lookahead of 0, every candidate is
+        taken, so it is 0.
+    """
+    return (lookahead + 1) * ARINC708_LENGTH_BYTES if lookahead else 0
+
+
+def scan_offsets(data: bytes | np.ndarray, start: int = 0,
+                 lookahead: int = DEFAULT_LOOKAHEAD) -> np.ndarray:
+    """
+    Scan raw ARINC 708 data for the offsets of each message.
+
+    A byte equal to ARINC708_DELINIATOR is a candidate for the start of a
+    message. With a lookahead of 0 (strict mode), every candidate is taken as
+    the start of a message. Otherwise, a label in the data of a message, or in
+    junk between messages, would misalign the messages after it, so only
+    candidates chosen by accept_candidates are taken. Either way, scanning
+    resumes ARINC708_LENGTH_BYTES after each message.
+
+    Rather than walking the data byte by byte, all candidates are found at
+    once, and runs of candidates spaced exactly one message apart are accepted
+    together.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data
+        start (int): The offset at which to start scanning. Data before it is
+            only used to confirm candidates. Defaults to 0.
+        lookahead (int): The number of further candidates, one message apart
+            before or after a candidate, needed to confirm it. Defaults to
+            DEFAULT_LOOKAHEAD.
+
+    Returns:
+        np.ndarray: The int64 offsets of each message in the data
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    context = max(start - confirm_margin(lookahead), 0)
+    candidates = np.flatnonzero(buffer[context:] == ARINC708_DELINIATOR).astype(np.int64)
+    candidates += context
+
+    if lookahead and len(candidates):
+        candidates = candidates[accept_candidates(buffer, candidates, lookahead)]
+    candidates = candidates[np.searchsorted(candidates, start):]
+
+    n = len(candidates)
+    if not n:
+        return candidates
+
+    # Link each candidate to the one exactly one message length later, if any.
+    # If a member of such a chain is accepted, so is the rest of the chain.
+    following = np.searchsorted(candidates, candidates + ARINC708_LENGTH_BYTES)
+    linked = following < n
+    linked[linked] = candidates[following[linked]] == candidates[linked] + ARINC708_LENGTH_BYTES
+
+    # Find the last member of each chain
+    last = follow_links(np.where(linked, following, np.arange(n)))
+
+    # After a chain ends, scanning resumes at the first candidate at least one
+    # message length after it
+    resume = np.searchsorted(candidates, candidates[last] + ARINC708_LENGTH_BYTES).tolist()
+    path = []
     i = 0
+    while i < n:
+        path.append(i)
+        i = resume[i]
+
+    starts, ends = candidates[path], candidates[last[path]]
+    counts = (ends - starts) // ARINC708_LENGTH_BYTES + 1
+    first = np.cumsum(counts) - counts
+    steps = np.arange(counts.sum(), dtype=np.int64) - np.repeat(first, counts)
+    return np.repeat(starts, counts) + steps * ARINC708_LENGTH_BYTES
+
+
+def scan_window(data: bytes | np.ndarray, start: int, end: int,
+                lookahead: int = DEFAULT_LOOKAHEAD) -> np.ndarray:
+    """
+    Scan the byte range [start, end) of raw ARINC 708 data for the offsets of
+    each message, as though scanning began at start. The data either side of
+    the range is used to confirm candidates, so that they are confirmed as
+    they would be by scanning the whole data.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data
+        start (int): The start of the range
+        end (int): The end of the range
+        lookahead (int): The lookahead used to confirm candidates
+
+    Returns:
+        np.ndarray: The int64 offsets of each message starting in the range
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    low = max(start - confirm_margin(lookahead), 0)
+    high = end + confirm_margin(lookahead)
+
+    offsets = scan_offsets(buffer[low:high], start=start - low, lookahead=lookahead) + low
+    return offsets[offsets < end]
+
+
+def scan_tmp_range(tempfile: str, start: int, end: int,
+                   lookahead: int = DEFAULT_LOOKAHEAD) -> np.ndarray:
+    """
+    Scan the byte range [start, end) of a raw ARINC 708 file for the offsets of
+    each message, as though scanning began at start. This is suitable for running
+    in a worker process; the results for each range must then be reconciled with
+    reconcile_offsets.
+
+    Args:
+        tempfile (str): The filename of the raw ARINC 708 file
+        start (int): The start of the range
+        end (int): The end of the range
+        lookahead (int): The lookahead used to confirm candidates
+
+    Returns:
+        np.ndarray: The int64 offsets of each message starting in the range
+    """
+    # Read enough either side of the range to confirm candidates near its ends
+    low = max(start - confirm_margin(lookahead), 0)
+    high = end + confirm_margin(lookahead)
+    with open(tempfile, 'rb') as f:
+        f.seek(low)
+        data = f.read(high - low)
+
+    return scan_window(data, start - low, end - low, lookahead) + low
+
 
+def reconcile_offsets(data: bytes | np.ndarray, offsets: np.ndarray, resume: int,
+                      end: int, lookahead: int = DEFAULT_LOOKAHEAD) -> np.ndarray:
+    """
+    Correct the offsets found by scanning a range of the data in isolation, given
+    the offset at which scanning actually resumes after the preceding ranges. The
+    data is rescanned from the resume offset until the greedy scan converges with
+    the given offsets, which is usually within a few messages.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data
+        offsets (np.ndarray): The offsets found by scan_tmp_range for the range
+        resume (int): The offset at which scanning resumes, that is one message
+            length after the last message found in the preceding ranges
+        end (int): The end of the range
+        lookahead (int): The lookahead used to confirm candidates
+
+    Returns:
+        np.ndarray: The offsets in the range, as found by scanning the whole data
+    """
+    if not len(offsets) or offsets[0] >= resume:
+        # Scanning reaches the first message in the range either way
+        return offsets
+
+    if resume >= end:
+        return offsets[:0]
+
+    offsets = offsets[offsets >= resume]
+
+    rescanned = []
+    window = 16 * ARINC708_LENGTH_BYTES
+    while resume < end:
+        stop = min(resume + window, end)
+        found = scan_window(data, resume, stop, lookahead)
+
+        converged = np.flatnonzero(np.isin(found, offsets))
+        if len(converged):
+            first = found[converged[0]]
+            rescanned += [found[:converged[0]], offsets[offsets >= first]]
+            return np.concatenate(rescanned)
+
+        rescanned.append(found)
+        if len(found):
+            resume = max(int(found[-1]) + ARINC708_LENGTH_BYTES, stop)
+        else:
+            resume = stop
+        window *= 2
+
+    return np.concatenate(rescanned)
+
+
+def scan_offsets_parallel(data: bytes | np.ndarray, tempfile: str, executor: Executor,
+                          chunk_bytes: int=SCAN_CHUNK_BYTES, window: int=2,
+                          lookahead: int=DEFAULT_LOOKAHEAD) -> np.ndarray:
+    """
+    Scan a raw ARINC 708 file for the offsets of each message, splitting it into
+    byte ranges which are scanned by an executor. The offsets found are identical
+    to those from scan_offsets.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data of the file
+        tempfile (str): The filename of the raw ARINC 708 file
+        executor (Executor): The executor to scan the ranges with
+        chunk_bytes (int): The size of each range
+        window (int): The maximum number of ranges being scanned at once
+        lookahead (int): The lookahead used to confirm candidates
+
+    Returns:
+        np.ndarray: The int64 offsets of each message in the data
+    """
     data_len = len(data)
-    while i < data_len:
-        d = data[i]
+    ranges = (
+        (tempfile, start, min(start + chunk_bytes, data_len), lookahead)
+        for start in range(0, data_len, chunk_bytes)
+    )
+
+    offsets = [np.empty(0, dtype=np.int64)]
+    resume = 0
+    for (_, _, end, _), found in map_ordered(executor, scan_tmp_range, ranges, window):
+        found = reconcile_offsets(data, found, resume, end, lookahead)
+        if len(found):
+            resume = int(found[-1]) + ARINC708_LENGTH_BYTES
+        offsets.append(found)
 
-        if d == ARINC708_DELINIATOR:
-            yield i, data[i : i + ARINC708_LENGTH_BYTES]
+    return np.concatenate(offsets)
 
-            i += ARINC708_LENGTH_BYTES
-            continue
 
-        i += 1
+def scan_tmp_data(data: bytes | np.ndarray) -> Generator[tuple[int, Arinc708Message], None, None]:
+    """
+    Scan a raw ARINC 708 file and yield each message. If data is an array, each
+    message is a view onto it, rather than a copy.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data
+
+    Yields:
+        tuple[int, Arinc708Message]: The index of the message and the message
+    """
+    for i in scan_offsets(data).tolist():
+        yield i, data[i : i + ARINC708_LENGTH_BYTES]
+
+
+def extract_messages(data: bytes | np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Gather the messages at the given offsets into an (N, 200) array, suitable
+    for parse_messages. Messages truncated by the end of the data are zero padded.
+
+    Args:
+        data (bytes | np.ndarray): The raw ARINC 708 data
+        offsets (np.ndarray): The offsets of the messages, from scan_offsets
+
+    Returns:
+        np.ndarray: An (N, 200) uint8 array of messages
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    messages = np.zeros((len(offsets), ARINC708_LENGTH_BYTES), dtype=np.uint8)
+
+    complete = offsets <= len(buffer) - ARINC708_LENGTH_BYTES
+    if complete.any():
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, ARINC708_LENGTH_BYTES)
+        messages[complete] = windows[offsets[complete]]
+
+    for i in np.flatnonzero(~complete):
+        truncated = buffer[offsets[i]:]
+        messages[i, :len(truncated)] = truncated
+
+    return messages
 
 
-def process_tmp_file(data: bytes, tempfile: str, t: Timer, nc: NetCDFWriter, pbar: tqdm|None=None):
+def decode_tmp_range(tempfile: str, offsets: np.ndarray) -> Arinc708Batch:
+    """
+    Read and decode the messages at the given offsets in a raw ARINC 708 file.
+    Only the range of the file spanned by the messages is read, so this is
+    suitable for running in a worker process.
+
+    Args:
+        tempfile (str): The filename of the raw ARINC 708 file
+        offsets (np.ndarray): The offsets of the messages, from scan_offsets
+
+    Returns:
+        Arinc708Batch: The messages, as given by parse_messages
+    """
+    start = int(offsets[0])
+    with open(tempfile, 'rb') as f:
+        f.seek(start)
+        data = f.read(int(offsets[-1]) - start + ARINC708_LENGTH_BYTES)
+
+    return parse_messages(extract_messages(data, offsets - start))
+
+
+def process_tmp_file(data: bytes | np.ndarray, tempfile: str, t: Timer, nc: NetCDFWriter,
+                     pbar: tqdm|None=None, block_size: int=BLOCK_MESSAGES,
+                     executor: Executor|None=None, window: int=2, start: int=0,
+                     callback: Callable[[int, int], None]|None=None,
+                     on_decoded: Callable[[np.ndarray, Arinc708Batch], None]|None=None,
+                     quality: FrameQuality|None=None, lookahead: int=DEFAULT_LOOKAHEAD,
+                     stats: Stats=NO_STATS):
     """
     Process a single raw ARINC 708 file and write the output to a NetCDF file.
+    Messages are decoded and written in blocks of block_size messages.
 
     Args:
-        data (bytes): The raw ARINC 708 data
+        data (bytes | np.ndarray): The raw ARINC 708 data
         tempfile (str): The filename of the raw ARINC 708 file
         t (Timer): The timer object, used to convert the index of the message to a timestamp
         nc (NetCDFWriter): The NetCDF writer object
         pbar (tqdm|None): The progress bar object
+        block_size (int): The number of messages to decode at once
+        executor (Executor|None): If given, the file is scanned in byte ranges, and
+            blocks are decoded, by this executor, rather than in this process.
+            Blocks are still written in order.
+        window (int): The maximum number of blocks being decoded by the executor
+            at once
+        start (int): The offset of the first message to process. Messages before
+            it are skipped. Defaults to 0.
+        callback (Callable[[int, int], None]|None): If given, called after each
+            block is written with the offset up to which the file has been
+            processed, and the number of messages written
+        on_decoded (Callable[[np.ndarray, Arinc708Batch], None]|None): If given,
+            called with the offsets and messages of each block decoded
+        quality (FrameQuality|None): If given, the frames of each block are
+            classified in it
+        lookahead (int): The lookahead used to confirm candidates. Defaults to
+            DEFAULT_LOOKAHEAD.
+        stats (Stats): The statistics to record each stage in. With an executor,
+            the scan and decode times are those spent waiting for the workers.
+            Defaults to NO_STATS.
     """
+    with stats.stage('scan', len(data)):
+        if executor is None:
+            offsets = scan_offsets(data, lookahead=lookahead)
+        else:
+            offsets = scan_offsets_parallel(data, tempfile, executor, window=window,
+                                            lookahead=lookahead)
+    stats.count('scan', messages=len(offsets))
+    offsets = offsets[np.searchsorted(offsets, start):]
+
+    blocks = (
+        (tempfile, offsets[start : start + block_size])
+        for start in range(0, len(offsets), block_size)
+    )
+
+    if executor is None:
+        decoded = (
+            (args, parse_messages(extract_messages(data, args[1]))) for args in blocks
+        )
+    else:
+        decoded = map_ordered(executor, decode_tmp_range, blocks, window)
+
+    decoded = stats.timed('decode', decoded,
+                          size=lambda item: len(item[0][1]) * ARINC708_LENGTH_BYTES)
+
     old_index = 0
-    for index, raw_message in scan_tmp_data(data):
-        parsed_message = parse_message(raw_message)
-        time = t.time_at_size(index, tempfile).timestamp()
-        nc.write_message(time, parsed_message)
+    for (_, block), batch in decoded:
+        stats.count('decode', messages=len(block))
+
+        with stats.stage('timestamp'):
+            times = epoch_seconds(t.times_at_sizes(block, tempfile))
+        stats.count('timestamp', messages=len(times))
+
+        with stats.stage('write'):
+            nc.write_messages(times, batch)
+        stats.count('write', messages=len(times))
+
+        if on_decoded:
+            on_decoded(block, batch)
+
+        if quality:
+            quality.add(block, batch.header)
+
+        if callback:
+            callback(min(int(block[-1]) + ARINC708_LENGTH_BYTES, len(data)), len(times))
+
         if pbar:
-            pbar.update(index - old_index)
-        old_index = index
+            pbar.update(block[-1] - old_index)
+        old_index = block[-1]
 
 
-def process(tempfiles: list[str], logfile: str, corefile: str, with_progress: bool=True) -> None:
+def process(tempfiles: list[str], logfile: str, corefile: str, with_progress: bool=True,
+            use_mmap: bool=True, compression: CompressionOptions | str='default',
+            timing: str='nearest', jobs: int=1, block_size: int | None=None,
+            resume: bool=True, cache: MessageCache | None=None, output_dir: str='.',
+            staging_dir: str | None=None, lookahead: int=DEFAULT_LOOKAHEAD,
+            stats: Stats | None=None) -> None:
     """
     Process a list of raw ARINC 708 files and write the output to a NetCDF file.
+    The tmp files named in the log file are processed, in the order logged. Each
+    is taken from the given tmp file of the same name, or else from the current
+    directory.
+
+    Progress is recorded in a checkpoint next to the output file. If resume is
+    set and the checkpoint is still valid, the existing output file is appended
+    to, and only data which has not already been processed is processed. This
+    is the case if an earlier run was interrupted, or if data has since been
+    appended to the last tmp file or new tmp files added to the end of the log.
+
+    If a cache is given, the decoded messages of each tmp file processed from
+    the start are stored in it, and tmp files already in the cache are not
+    scanned or decoded again.
 
     Args:
         tempfiles (list[str]): A list of raw ARINC 708 files
         logfile (str): The filename of the log file
         corefile (str): The filename of the core file
-        with_progress (bool): Whether to show a progress bar. Defaults to True.
+        with_progress (bool): Whether to show a progress bar, and warn of any
+            quality control problems in each tmp file. Defaults to True.
+        use_mmap (bool): Whether to memory map the tmp files, rather than reading
+            them into memory. Defaults to True.
+        compression (CompressionOptions | str): The chunking and compression options
+            for the output file, or the name of a preset. Defaults to 'default'.
+        timing (str): How message times are derived from the log file, either
+            'nearest' (to 1 second) or 'interpolate'. Defaults to 'nearest'.
+        jobs (int): The number of processes used to decode messages. If greater
+            than 1, messages are decoded in a process pool, and written in order
+            by this process. If 0, one process per core is used. Defaults to 1.
+        block_size (int | None): When decoding in this process, tmp files are
+            streamed in blocks of this many bytes, bounding memory use. Defaults
+            to DEFAULT_BLOCK_BYTES.
+        resume (bool): Whether to resume from the checkpoint of an earlier run,
+            if it is valid. Defaults to True.
+        cache (MessageCache | None): The cache of decoded messages. Defaults to
+            None, not using a cache.
+        output_dir (str): The directory to which the NetCDF file is written.
+            Defaults to the current directory.
+        staging_dir (str | None): The directory in which the NetCDF file is
+            written, before it is moved to output_dir once complete. Defaults
+            to output_dir.
+        lookahead (int): The number of further labels, one message apart
+            before or after a label, needed to confirm it as the start of a
+            message. 0 takes every label as the start of a message. Defaults
+            to DEFAULT_LOOKAHEAD.
+        stats (Stats | None): If given, the time spent in each stage of
+            processing, and the data handled, are recorded in it. Defaults to
+            None, recording nothing.
     """
+    from .pipeline import DEFAULT_BLOCK_BYTES, replay_tmp_file, stream_tmp_file
+
     if with_progress:
         _tqdm = tqdm
     else:
         _tqdm = lambda x: x
 
 
-    filtered_tempfiles = Timer.get_tempfiles(logfile)
+    stats = stats or NO_STATS
 
-    excluded_tempfiles = set(tempfiles) - set(filtered_tempfiles)
+    with stats.stage('log', os.path.getsize(logfile)):
+        log_index = LogIndex.from_file(logfile)
+    # The tmp files are those named in the log, found by name among those given,
+    # so that they need not be in the current directory
+    paths = {os.path.basename(tempfile): tempfile for tempfile in tempfiles}
+    logged = Timer.get_tempfiles(log_index)
+    filtered_tempfiles = [paths.get(name, name) for name in logged]
+
+    excluded_tempfiles = set(paths) - set(logged)
     for tempfile in excluded_tempfiles:
-        print(f'Excluding {tempfile} from processing: no time data')
+        print(f'Excluding {paths[tempfile]} from processing: no time data')
             
-    with NetCDFWriter(corefile) as nc:
-
-        for tempfile in _tqdm(filtered_tempfiles):
-            t = Timer(logfile, tempfile)
+    jobs = get_jobs(jobs)
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        kwargs = {'executor': pool, 'block_size': PARALLEL_BLOCK_MESSAGES, 'window': 2 * jobs}
+    else:
+        pool = contextlib.nullcontext()
+        kwargs = {}
 
-            data = load_tmp_file(tempfile)
-            data_len = len(data)
+    writer = NetCDFWriter(corefile, compression=compression, output_dir=output_dir,
+                          staging_dir=staging_dir)
+    checkpoint = Checkpoint(writer.get_filename(),
+                            checkpoint_options(timing, writer.compression, lookahead))
+    if resume and checkpoint.restore(log_index, filtered_tempfiles):
+        writer.append_at = checkpoint.records
+        writer.append_from = checkpoint.file
+        print(f'Resuming {writer.get_filename()} from record {checkpoint.records}')
 
-            args = [data, tempfile, t, nc]
+    with pool, writer as nc:
 
-            if with_progress:
-                with _tqdm(total=data_len) as pbar:
-                    process_tmp_file(*args, pbar)
-            else:
-                process_tmp_file(*args)
\ No newline at end of file
+        for tempfile in _tqdm(filtered_tempfiles):
+            entry = checkpoint.entry(tempfile)
+            if entry.complete:
+                continue
+
+            def update(offset: int, records: int) -> None:
+                with stats.stage('checkpoint'):
+                    checkpoint.update(entry, offset, records, log_index, quality=quality)
+                    checkpoint.save(nc)
+
+            def on_decoded(offsets: np.ndarray, batch: Arinc708Batch) -> None:
+                with stats.stage('cache', batch.nbytes):
+                    store.write(offsets, batch)
+
+            with stats.file(tempfile, os.path.getsize(tempfile)):
+                with stats.stage('cache'):
+                    key = cache.key(tempfile, lookahead) if cache else ''
+                    cached = cache.get(key) if cache else None
+                store = None
+                if cache and cached is None and entry.offset == 0:
+                    store = cache.writer(key, os.path.getsize(tempfile))
+
+                t = Timer(log_index, tempfile, mode=timing)
+
+                # The skipped bytes classified by quality are read from the data
+                # when it is loaded anyway, or memory mapped
+                data = None
+                if cached is None and jobs > 1:
+                    data = load_tmp_file(tempfile, use_mmap=use_mmap)
+                elif use_mmap:
+                    data = load_tmp_file(tempfile)
+                quality = FrameQuality(tempfile, start=entry.offset, data=data,
+                                       summary=entry.quality)
+                pbar = tqdm(total=os.path.getsize(tempfile)) if with_progress else None
+
+                try:
+                    with pbar or contextlib.nullcontext():
+                        if cached is not None:
+                            replay_tmp_file(cached, tempfile, t, nc, pbar, start=entry.offset,
+                                            callback=update, quality=quality, stats=stats)
+                        elif jobs > 1:
+                            process_tmp_file(data, tempfile, t, nc, pbar, start=entry.offset,
+                                             callback=update,
+                                             on_decoded=on_decoded if store else None,
+                                             quality=quality, lookahead=lookahead, stats=stats,
+                                             **kwargs)
+                        else:
+                            stream_tmp_file(tempfile, t, nc, pbar,
+                                            block_size=block_size or DEFAULT_BLOCK_BYTES,
+                                            use_mmap=use_mmap, start=entry.offset,
+                                            callback=update,
+                                            on_decoded=on_decoded if store else None,
+                                            quality=quality, lookahead=lookahead, stats=stats)
+                except BaseException:
+                    if store:
+                        store.abort()
+                    raise
+
+                if store:
+                    with stats.stage('cache'):
+                        store.commit()
+
+                quality.finish()
+                stats.quality(quality.report())
+                if with_progress and quality.problems():
+                    print(f'Warning: {tempfile}: {quality.problems()}')
+
+                with stats.stage('checkpoint'):
+                    checkpoint.update(entry, entry.offset, 0, log_index, complete=True,
+                                      quality=quality)
+                    checkpoint.save(nc, force=True)
+
+        nc.write_quality([(entry.tmpfile, entry.quality) for entry in checkpoint.entries])
+
+        stale = len(nc.nc.dimensions['time']) - nc.num_records
+        if stale > 0:
+            print(f'Warning: {nc.filename} holds {stale} records from an interrupted run '
+                  'beyond those written; reprocess with --restart to remove them')
+
+    checkpoint.finish()
@@ -0,0 +1,275 @@
+import dataclasses
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+from typing import Any
+
+import numpy as np
+
+from . import __version__ as wxrx_version
+
+# The version of the schema format. Cached schemas with a different version
+# are ignored.
+SCHEMA_VERSION = 1
+
+# Attributes of the product definition which are not written to the file
+SKIPPED_ATTRIBUTES = ('FillValue',)
+
+
+def encode_value(value: Any) -> Any:
+    """
+    Encode an attribute value as JSON, keeping the dtype of NumPy values.
+
+    Args:
+        value (Any): The value to encode
+
+    Returns:
+        Any: The JSON serialisable value
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return {'__ndarray__': np.asarray(value).tolist(), 'dtype': np.asarray(value).dtype.str,
+                'scalar': isinstance(value, np.generic)}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    """
+    Decode an attribute value encoded by encode_value.
+
+    Args:
+        value (Any): The encoded value
+
+    Returns:
+        Any: The value
+    """
+    if isinstance(value, dict) and '__ndarray__' in value:
+        array = np.asarray(value['__ndarray__'], dtype=value['dtype'])
+        return array[()] if value['scalar'] else array
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class DimensionSchema:
+    """
+    A dimension of the product. A size of None is unlimited.
+    """
+    name: str
+    size: int | None
+
+
+@dataclasses.dataclass(frozen=True)
+class VariableSchema:
+    """
+    A variable of the product, with its attributes already resolved to the
+    values written to the file.
+    """
+    name: str
+    # The NumPy dtype string of the variable, such as '<f8'
+    datatype: str
+    dimensions: tuple[str, ...]
+    fill_value: Any
+    attributes: dict[str, Any]
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Returns the dtype of the variable.
+        """
+        return np.dtype(self.datatype)
+
+    def ncattrs(self) -> dict[str, Any]:
+        """
+        Returns the attributes to write to the variable.
+        """
+        return {key: decode_value(value) for key, value in self.attributes.items()}
+
+
+@dataclasses.dataclass(frozen=True)
+class ProductSchema:
+    """
+    The layout of a product (its dimensions and variables, with their dtypes,
+    fill values and attributes) resolved from the faam_data product definition
+    into plain values, so that it can be cached and reused without importing
+    faam_data or vocal.
+    """
+    name: str
+    dimensions: tuple[DimensionSchema, ...]
+    variables: tuple[VariableSchema, ...]
+
+    @classmethod
+    def from_product(cls, name: str) -> 'ProductSchema':
+        """
+        Resolve a product definition from faam_data.
+
+        Args:
+            name (str): The name of the product
+
+        Returns:
+            ProductSchema: The schema of the product
+        """
+        from faam_data import get_product
+        from vocal.schema_types import type_from_spec
+
+        product = get_product(name)
+
+        variables = []
+        for variable in product.variables:
+            attributes = {}
+            for key, value in variable.attributes:
+                if value is None or key in SKIPPED_ATTRIBUTES or 'derived_from_file' in key:
+                    continue
+                if key == 'frequency':
+                    value = np.int32(value)
+                attributes[key] = encode_value(value)
+
+            variables.append(VariableSchema(
+                name=variable.meta.name,
+                datatype=np.dtype(type_from_spec(variable.meta.datatype)).str,
+                dimensions=tuple(variable.dimensions),
+                fill_value=encode_value(variable.attributes.FillValue),
+                attributes=attributes,
+            ))
+
+        return cls(
+            name=name,
+            dimensions=tuple(DimensionSchema(d.name, d.size) for d in product.dimensions),
+            variables=tuple(variables),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Returns the schema as a JSON serialisable dict.
+        """
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'ProductSchema':
+        """
+        Create a schema from a dict given by to_dict.
+
+        Args:
+            data (dict[str, Any]): The schema, as a dict
+
+        Returns:
+            ProductSchema: The schema
+        """
+        return cls(
+            name=data['name'],
+            dimensions=tuple(DimensionSchema(**d) for d in data['dimensions']),
+            variables=tuple(
+                VariableSchema(**{**v, 'dimensions': tuple(v['dimensions'])})
+                for v in data['variables']
+            ),
+        )
+
+
+def schema_cache_dir() -> str | None:
+    """
+    Returns the directory in which product schemas are cached. This is given
+    by $WXRX_SCHEMA_CACHE, and defaults to ~/.cache/faam-wxrx. If
+    $WXRX_SCHEMA_CACHE is empty, schemas are not cached on disk.
+    """
+    directory = os.environ.get('WXRX_SCHEMA_CACHE')
+    if directory is None:
+        return os.path.join(os.path.expanduser('~'), '.cache', 'faam-wxrx')
+    return directory or None
+
+
+def package_digest(package: str) -> str:
+    """
+    Returns a digest of the path, size and modification time of each file of
+    an installed package, found without importing it. faam_data and vocal are
+    often installed in editable mode, in which case their product definitions
+    can change without their versions changing.
+
+    Args:
+        package (str): The name of the package
+
+    Returns:
+        str: The digest, or 'unknown' if the package can not be found
+    """
+    try:
+        spec = importlib.util.find_spec(package)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.submodule_search_locations:
+        return 'unknown'
+
+    files = []
+    for location in spec.submodule_search_locations:
+        for root, dirs, filenames in os.walk(location):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append(f'{os.path.relpath(path, location)}:{stat.st_size}:{stat.st_mtime_ns}')
+
+    return hashlib.blake2b('\n'.join(files).encode(), digest_size=8).hexdigest()
+
+
+def schema_key(name: str) -> str:
+    """
+    Returns the key of the cached schema of a product. The key changes with
+    the versions of this package, faam_data and vocal, and with the files of
+    faam_data and vocal, so that a schema is resolved again when any of them
+    is updated.
+
+    Args:
+        name (str): The name of the product
+
+    Returns:
+        str: The key
+    """
+    versions = [str(SCHEMA_VERSION), wxrx_version]
+    for package in ('faam_data', 'vocal'):
+        try:
+            versions.append(importlib.metadata.version(package))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append('unknown')
+        versions.append(package_digest(package))
+
+    digest = hashlib.blake2b('/'.join(versions).encode(), digest_size=8).hexdigest()
+    return f'{name}-{digest}'
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(name: str) -> ProductSchema:
+    """
+    Load the schema of a product. Schemas are loaded once per process, and
+    cached on disk, so that faam_data and vocal are only imported when the
+    cached schema is missing or out of date.
+
+    Args:
+        name (str): The name of the product
+
+    Returns:
+        ProductSchema: The schema of the product
+    """
+    directory = schema_cache_dir()
+    filename = os.path.join(directory, f'{schema_key(name)}.json') if directory else ''
+
+    if filename:
+        try:
+            with open(filename) as f:
+                return ProductSchema.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    schema = ProductSchema.from_product(name)
+
+    if filename:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(f'{filename}.{os.getpid()}.tmp', 'w') as f:
+                json.dump(schema.to_dict(), f, indent=2)
+            os.replace(f'{filename}.{os.getpid()}.tmp', filename)
+        except OSError:
+            pass
+
+    return schema
@@ -0,0 +1,258 @@
+from collections.abc import Callable, Iterable, Iterator
+import contextlib
+import dataclasses
+import json
+import sys
+import threading
+import time
+from typing import Any, TypeVar
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+T = TypeVar('T')
+
+# The stages of processing, in the order in which they are reported
+STAGES = ('log', 'cache', 'read', 'scan', 'decode', 'timestamp', 'write', 'checkpoint')
+
+
+def peak_rss() -> int:
+    """
+    Returns the peak resident set size of this process so far, in bytes, or 0
+    if it is not available.
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives the peak in KiB, and macOS in bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@dataclasses.dataclass
+class StageStats:
+    """
+    The time spent in, and the data handled by, a stage of processing.
+    """
+    # Wall clock and CPU time of the thread running the stage, in seconds
+    wall: float = 0.0
+    cpu: float = 0.0
+    calls: int = 0
+    bytes: int = 0
+    messages: int = 0
+    # The peak resident set size of the process at the end of the stage, in bytes
+    peak_rss: int = 0
+
+
+@dataclasses.dataclass
+class FileStats:
+    """
+    The time spent processing a single tmp file, and the stages it was spent in.
+    """
+    tmpfile: str
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes: int = 0
+    messages: int = 0
+    peak_rss: int = 0
+    stages: dict[str, StageStats] = dataclasses.field(default_factory=dict)
+    # The quality control of the tmp file, from FrameQuality.report
+    quality: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+class Stats:
+    """
+    Collects the wall clock time, CPU time, bytes, messages and peak memory of
+    each stage of processing, overall and for each tmp file.
+
+    Stages are timed with stage, which is called once per block, so the cost of
+    collecting statistics is small compared to the work in each block. When
+    statistics are not wanted, NO_STATS is used instead, which does nothing.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a new Stats object. The overall times are measured from now.
+        """
+        self.stages: dict[str, StageStats] = {}
+        self.files: list[FileStats] = []
+        self._file: FileStats | None = None
+        self._lock = threading.Lock()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def _add(self, name: str, wall: float = 0.0, cpu: float = 0.0, calls: int = 0,
+             bytes: int = 0, messages: int = 0) -> None:
+        """
+        Add to the totals of a stage, overall and for the current tmp file.
+        """
+        rss = peak_rss() if calls else 0
+        with self._lock:
+            targets = [self.stages]
+            if self._file is not None:
+                targets.append(self._file.stages)
+            for stages in targets:
+                stage = stages.setdefault(name, StageStats())
+                stage.wall += wall
+                stage.cpu += cpu
+                stage.calls += calls
+                stage.bytes += bytes
+                stage.messages += messages
+                stage.peak_rss = max(stage.peak_rss, rss)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, bytes: int = 0) -> Iterator[None]:
+        """
+        Time a call of a stage. The CPU time is that of the calling thread.
+
+        Args:
+            name (str): The name of the stage, one of STAGES
+            bytes (int): The number of bytes handled by the call
+        """
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.thread_time() - cpu, 1, bytes)
+
+    def count(self, name: str, bytes: int = 0, messages: int = 0) -> None:
+        """
+        Count the bytes or messages handled by a stage, without timing it.
+
+        Args:
+            name (str): The name of the stage, one of STAGES
+            bytes (int): The number of bytes handled
+            messages (int): The number of messages handled
+        """
+        self._add(name, bytes=bytes, messages=messages)
+
+    def timed(self, name: str, iterable: Iterable[T],
+              size: Callable[[T], int] = len) -> Iterator[T]:
+        """
+        Time each step of an iterable as a call of a stage, counting the bytes
+        of each item. This is suitable for the innermost iterable of a pipeline,
+        such as the blocks read from a file.
+
+        Args:
+            name (str): The name of the stage, one of STAGES
+            iterable (Iterable[T]): The iterable
+            size (Callable[[T], int]): Gives the number of bytes of each item.
+                Defaults to len.
+
+        Yields:
+            T: The items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self.count(name, bytes=size(item))
+            yield item
+
+    def quality(self, report: dict[str, Any]) -> None:
+        """
+        Record the quality control of the current tmp file.
+
+        Args:
+            report (dict[str, Any]): The report, from FrameQuality.report
+        """
+        if self._file is not None:
+            self._file.quality = report
+
+    @contextlib.contextmanager
+    def file(self, tmpfile: str, size: int = 0) -> Iterator[None]:
+        """
+        Attribute the stages run within the context to a tmp file.
+
+        Args:
+            tmpfile (str): The name of the tmp file
+            size (int): The size of the tmp file, in bytes
+        """
+        stats = FileStats(tmpfile, bytes=size)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self._file = stats
+        try:
+            yield
+        finally:
+            self._file = None
+            stats.wall = time.perf_counter() - wall
+            stats.cpu = time.process_time() - cpu
+            stats.peak_rss = peak_rss()
+            write = stats.stages.get('write')
+            stats.messages = write.messages if write else 0
+            self.files.append(stats)
+
+    def report(self) -> dict[str, Any]:
+        """
+        Returns a report of the statistics collected, suitable for writing as
+        JSON. Throughput is given in MB of tmp file per second of wall clock time.
+        """
+        wall = time.perf_counter() - self._wall
+        size = sum(f.bytes for f in self.files)
+        write = self.stages.get('write')
+
+        def ordered(stages: dict[str, StageStats]) -> dict[str, dict[str, Any]]:
+            names = [s for s in STAGES if s in stages] + [s for s in stages if s not in STAGES]
+            return {name: dataclasses.asdict(stages[name]) for name in names}
+
+        return {
+            'wall': wall,
+            'cpu': time.process_time() - self._cpu,
+            'peak_rss': peak_rss(),
+            'bytes': size,
+            'messages': write.messages if write else 0,
+            'throughput': size / 1e6 / wall if wall else 0.0,
+            'stages': ordered(self.stages),
+            'files': [
+                {**dataclasses.asdict(f), 'stages': ordered(f.stages)} for f in self.files
+            ],
+        }
+
+    def write(self, filename: str) -> None:
+        """
+        Write the report to a JSON file.
+
+        Args:
+            filename (str): The filename of the report
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class NullStats(Stats):
+    """
+    Statistics which are not collected. Every method does nothing.
+    """
+
+    def __init__(self) -> None:
+        self.stages = {}
+        self.files = []
+
+    def stage(self, name: str, bytes: int = 0) -> contextlib.nullcontext:
+        return _NULL_CONTEXT
+
+    def count(self, name: str, bytes: int = 0, messages: int = 0) -> None:
+        pass
+
+    def timed(self, name: str, iterable: Iterable[T],
+              size: Callable[[T], int] = len) -> Iterable[T]:
+        return iterable
+
+    def quality(self, report: dict[str, Any]) -> None:
+        pass
+
+    def file(self, tmpfile: str, size: int = 0) -> contextlib.nullcontext:
+        return _NULL_CONTEXT
+
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+# The statistics used when none are wanted
+NO_STATS = NullStats()
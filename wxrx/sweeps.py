@@ -0,0 +1,144 @@
+import numpy as np
+
+# The settings which are constant through a sweep, as written to the output
+# file. A change in any of them starts a new sweep.
+SWEEP_SETTINGS = ('tilt', 'range', 'gain', 'operating_mode')
+
+# A single sweep: the index of its first record, and the direction of the
+# antenna through it, 1 for increasing scan angle, -1 for decreasing, or 0 if
+# the antenna has not yet moved, followed by its settings. The end of a sweep
+# is the start of the next.
+SWEEP_DTYPE = np.dtype([
+    ('start', np.int64),
+    ('direction', np.int8),
+    ('tilt', np.float64),
+    ('range', np.int64),
+    ('gain', np.int64),
+    ('operating_mode', np.int64),
+])
+
+
+class SweepIndex:
+    """
+    Segments the records of the output file into sweeps of the antenna, so
+    that each sweep can be read as a contiguous slice of records.
+
+    A sweep ends where the antenna reverses direction, that is where the sign
+    of the change in scan angle between consecutive records changes, ignoring
+    records at the same scan angle, or where any of SWEEP_SETTINGS changes.
+    Records are added a block at a time, and the boundaries found by change
+    detection over the whole block at once.
+    """
+
+    def __init__(self, sweeps: np.ndarray | None = None, records: int = 0,
+                 last_angle: float = 0.0) -> None:
+        """
+        Create a new SweepIndex object.
+
+        Args:
+            sweeps (np.ndarray | None): The sweeps already indexed, with dtype
+                SWEEP_DTYPE, if resuming, for example from an existing output
+                file. The last holds the last record indexed. Defaults to None.
+            records (int): The number of records already indexed. Defaults to 0.
+            last_angle (float): The scan angle of the last record indexed.
+                Defaults to 0.
+        """
+        # The sweeps which have ended, in blocks
+        self._closed: list[np.ndarray] = [np.empty(0, dtype=SWEEP_DTYPE)]
+        # The sweep holding the last record added
+        self._open = np.zeros(1, dtype=SWEEP_DTYPE)
+        self._last_angle = float(last_angle)
+        self.records = records
+        if records:
+            self._closed = [sweeps[:-1].copy()]
+            self._open = sweeps[-1:].copy()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of sweeps, including the one holding the last record.
+        """
+        return sum(len(closed) for closed in self._closed) + (1 if self.records else 0)
+
+    def add(self, scan_angle: np.ndarray, settings: dict[str, np.ndarray]) -> None:
+        """
+        Add a block of records, following those already added.
+
+        Args:
+            scan_angle (np.ndarray): The scan angle of each record, in degrees
+            settings (dict[str, np.ndarray]): The value of each of
+                SWEEP_SETTINGS for each record, as written to the output file,
+                with any masked values filled
+        """
+        n = len(scan_angle)
+        if not n:
+            return
+
+        scan_angle = np.asarray(scan_angle, dtype=np.float64)
+        values = {name: np.asarray(settings[name]) for name in SWEEP_SETTINGS}
+
+        # The change in scan angle from the previous record, wrapped to the
+        # shorter way round
+        step = np.diff(scan_angle, prepend=self._last_angle)
+        step = (step + 180) % 360 - 180
+        sign = np.sign(step).astype(np.int8)
+
+        changed = np.zeros(n, dtype=bool)
+        for name in SWEEP_SETTINGS:
+            changed |= values[name] != np.concatenate((self._open[name], values[name][:-1]))
+
+        if not self.records:
+            # The first record starts the first sweep
+            sign[0] = 0
+            changed[0] = True
+
+        # The direction of the antenna at each record, carrying the last
+        # direction through records at the same scan angle
+        moved = np.where(sign != 0, np.arange(n), -1)
+        np.maximum.accumulate(moved, out=moved)
+        direction = np.where(moved >= 0, sign[np.maximum(moved, 0)], self._open['direction'][0])
+        previous = np.concatenate((self._open['direction'], direction[:-1]))
+        reverses = (previous != 0) & (direction != previous)
+
+        starts = np.flatnonzero(changed | reverses)
+
+        # The direction of each sweep is that of its last record, as it is only
+        # unknown before the antenna first moves
+        ends = np.append(starts[1:], n)
+        if len(starts) and starts[0] > 0:
+            self._open['direction'] = direction[starts[0] - 1]
+        elif not len(starts):
+            self._open['direction'] = direction[-1]
+
+        if len(starts):
+            sweeps = np.empty(len(starts), dtype=SWEEP_DTYPE)
+            sweeps['start'] = starts + self.records
+            sweeps['direction'] = direction[ends - 1]
+            for name in SWEEP_SETTINGS:
+                sweeps[name] = values[name][starts]
+
+            if self.records:
+                self._closed.append(self._open)
+            self._closed.append(sweeps[:-1])
+            self._open = sweeps[-1:]
+
+        self._last_angle = scan_angle[-1]
+        self.records += n
+
+    def sweeps(self, first: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the sweeps from the given index on, and the end of each.
+
+        Args:
+            first (int): The index of the first sweep returned. Defaults to 0.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The sweeps, with dtype SWEEP_DTYPE,
+            and the index one past the last record of each
+        """
+        if len(self._closed) > 1:
+            self._closed = [np.concatenate(self._closed)]
+        closed = self._closed[0]
+        sweeps = closed[first:]
+        if self.records:
+            sweeps = np.concatenate((sweeps, self._open[max(first - len(closed), 0):]))
+        return sweeps, np.append(sweeps['start'][1:], self.records)[:len(sweeps)]
@@ -1,44 +1,183 @@
 import datetime
 import os
+from typing import BinaryIO
 
+import numpy as np
 import pandas as pd
 
+
+def epoch_seconds(times: np.ndarray) -> np.ndarray:
+    """
+    Convert an array of datetime64 values to seconds since the epoch.
+
+    Args:
+        times (np.ndarray): The times to convert
+
+    Returns:
+        np.ndarray: The times, as float seconds since 1970-01-01
+    """
+    return times.astype('datetime64[ns]').astype(np.int64) / 1e9
+
+
+TIMING_MODES = ('nearest', 'interpolate')
+
+# The number of lines at the start of a log file before the first entry, not
+# counting blank lines, as with pd.read_csv(header=3)
+LOG_HEADER_LINES = 4
+
+
+def log_header_bytes(f: BinaryIO) -> int | None:
+    """
+    Returns the length of the header at the start of a log file, that is up to
+    the end of its LOG_HEADER_LINES-th line which is not blank. The file is read
+    from its start.
+
+    Args:
+        f (BinaryIO): The log file, opened in binary mode
+
+    Returns:
+        int | None: The offset of the first entry, or None if the file does not
+        yet hold the whole header
+    """
+    f.seek(0)
+    length = 0
+    lines = 0
+    while lines < LOG_HEADER_LINES:
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            return None
+        length += len(line)
+        if line.strip():
+            lines += 1
+    return length
+
+
+def parse_times(values: np.ndarray) -> pd.DatetimeIndex:
+    """
+    Parse an array of time strings. ISO 8601 times are parsed directly by NumPy,
+    which is much faster than pandas' date inference; anything else falls back
+    to pandas.
+
+    Args:
+        values (np.ndarray): The time strings to parse
+
+    Returns:
+        pd.DatetimeIndex: The parsed times
+    """
+    try:
+        return pd.DatetimeIndex(np.asarray(values, dtype='datetime64[ns]'), name='time')
+    except ValueError:
+        return pd.DatetimeIndex(pd.to_datetime(values), name='time')
+
+
+class LogIndex:
+    """
+    A parsed logfile, giving the size of each tmpfile over time. The logfile is
+    read once, and split by tmpfile, so that it can be shared between the Timers
+    for each tmpfile.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        """
+        Create a new LogIndex object.
+
+        Args:
+            df (pd.DataFrame): The log, indexed by time, with size and tmpfile columns
+        """
+        self.df = df
+        self._frames = {
+            tmpfile: frame for tmpfile, frame in df.groupby('tmpfile', sort=False)
+        }
+
+    @classmethod
+    def from_file(cls, logfile: str) -> 'LogIndex':
+        """
+        Read and parse a logfile.
+
+        Args:
+            logfile (str): Path to the logfile
+
+        Returns:
+            LogIndex: The parsed logfile
+        """
+        with open(logfile, 'rb') as f:
+            start = log_header_bytes(f)
+            if start is None:
+                raise ValueError(f'Incomplete header in log file: {logfile}')
+            f.seek(start)
+            df = pd.read_csv(
+                f,
+                names=['time', 'size', 'tmpfile'],
+                header=None
+            )
+        df.index = parse_times(df.pop('time').to_numpy())
+        return cls(df)
+
+    @property
+    def tmpfiles(self) -> list[str]:
+        """
+        Returns the tmpfiles in the log, in the order in which they first appear.
+        """
+        return list(self._frames)
+
+    def frame(self, tmpfile: str='') -> pd.DataFrame:
+        """
+        Returns the log for the given tmpfile.
+
+        Args:
+            tmpfile (str): The tmpfile. If not given, the whole log is returned.
+
+        Returns:
+            pd.DataFrame: The log for the tmpfile
+        """
+        if not tmpfile:
+            return self.df
+        return self._frames.get(os.path.basename(tmpfile), self.df.iloc[:0])
+
+
 class Timer:
     """
     Provides a timer for a given logfile and tmpfile. This allows the time at which
     a given size was reached to be calculated. This is used to add a timestamp to
     the ARINC708 data, which is not timestamped.
+
+    In 'nearest' mode, the time is that of the nearest entry in the log, resampled
+    to 1 second. In 'interpolate' mode, the time is linearly interpolated by size
+    between the entries in the log, giving sub-second times.
     """
 
-    def __init__(self, logfile: str, tmpfile: str = '') -> None:
+    def __init__(self, logfile: str | LogIndex, tmpfile: str = '', mode: str = 'nearest') -> None:
         """
         Create a new Timer object.
 
         Args:
-            logfile (str): Path to the logfile to use for the timer
+            logfile (str | LogIndex): Path to the logfile to use for the timer, or
+                the already parsed logfile
             tmpfile (str): The tmpfile to use for the timer.
+            mode (str): The timing mode, one of TIMING_MODES. Defaults to 'nearest'.
         """
-        self.df = pd.read_csv(
-            logfile,
-            parse_dates=[0],
-            names=['time', 'size', 'tmpfile'],
-            header=3,
-            index_col=0
-        )
+        if mode not in TIMING_MODES:
+            raise ValueError(f'Unknown timing mode: {mode}')
+        self.mode = mode
 
-        if not tmpfile and self.df.tmpfile.nunique() != 1:
-            raise ValueError(f'No tmpfile specified and logfile contains multiple tmpfiles')
+        if not isinstance(logfile, LogIndex):
+            logfile = LogIndex.from_file(logfile)
 
-        if tmpfile:
-            self.df = self.df[self.df.tmpfile == os.path.basename(tmpfile)]
+        if not tmpfile and len(logfile.tmpfiles) != 1:
+            raise ValueError(f'No tmpfile specified and logfile contains multiple tmpfiles')
 
-        self.df = self.df.drop_duplicates()
+        # The unresampled log keeps repeated sizes, which mark a stall
+        self.log = logfile.frame(tmpfile)
+        self.df = self.log.drop_duplicates()
         self.df = self.df.asfreq('1s').interpolate()
         self.df.tmpfile.fillna(method='ffill', inplace=True)
 
         if len(self.df) == 0:
             raise ValueError(f'No data for {os.path.basename(tmpfile)}')
 
+        self._lookups: dict[str, tuple[np.ndarray, np.ndarray, bool]] = {}
+        self._knots: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
     
     @property
     def date(self) -> datetime.date:
@@ -63,25 +202,146 @@ class Timer:
         return tempfile in self.df.tmpfile.unique()
     
     @classmethod
-    def get_tempfiles(cls, logfile: str) -> list[str]:
+    def get_tempfiles(cls, logfile: str | LogIndex) -> list[str]:
         """
         Returns a list of tempfiles in the given logfile.
 
         Args:
-            logfile (str): The logfile to check
+            logfile (str | LogIndex): The logfile to check, or the already parsed logfile
 
         Returns:
             list[str]: A list of tempfiles in the given logfile
         """
-        data = pd.read_csv(
-            logfile,
-            parse_dates=[0],
-            names=['time', 'size', 'tmpfile'],
-            header=3,
-            index_col=0
-        )
-        return data.tmpfile.unique().tolist()
+        if not isinstance(logfile, LogIndex):
+            logfile = LogIndex.from_file(logfile)
+        return logfile.tmpfiles
     
+    def _lookup(self, tmpfile: str='') -> tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Returns the sizes and times in the log for the given tempfile, as arrays,
+        and whether the sizes are sorted. These are computed once per tempfile.
+
+        Args:
+            tmpfile (str): The tempfile to get the sizes and times for
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, bool]: The sizes, the times, and whether
+            the sizes are sorted
+        """
+        tmpfile = os.path.basename(tmpfile)
+        if tmpfile not in self._lookups:
+            df = self.df[self.df.tmpfile == tmpfile] if tmpfile else self.df
+            sizes = df['size'].to_numpy(dtype=np.float64)
+            times = df.index.to_numpy(dtype='datetime64[ns]')
+
+            valid = ~np.isnan(sizes)
+            sizes, times = sizes[valid], times[valid]
+
+            self._lookups[tmpfile] = (sizes, times, bool(np.all(np.diff(sizes) >= 0)))
+
+        return self._lookups[tmpfile]
+
+    def _interpolation_knots(self, tmpfile: str='') -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the sizes and times in the unresampled log for the given tempfile,
+        keeping the first entry at which each new maximum size was reached, and
+        the last entry before the next, so that the time is flat through a stall
+        in recording. Each size appears at most twice, and the sizes never
+        decrease. These are computed once per tempfile.
+
+        Args:
+            tmpfile (str): The tempfile to get the sizes and times for
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The sizes and the times, as nanoseconds
+            since the epoch
+        """
+        tmpfile = os.path.basename(tmpfile)
+        if tmpfile not in self._knots:
+            log = self.log[self.log.tmpfile == tmpfile] if tmpfile else self.log
+            sizes = log['size'].to_numpy(dtype=np.float64)
+            times = log.index.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+            valid = ~np.isnan(sizes)
+            sizes, times = sizes[valid], times[valid]
+
+            running_max = np.maximum.accumulate(sizes)
+            previous_max = np.concatenate([[-np.inf], running_max[:-1]])
+            first = running_max > previous_max
+            last = np.append(running_max[1:] > running_max[:-1], True)
+            keep = first | last
+
+            self._knots[tmpfile] = (running_max[keep], times[keep].astype(np.float64))
+
+        return self._knots[tmpfile]
+
+    def times_at_sizes(self, sizes: np.ndarray, tmpfile: str='') -> np.ndarray:
+        """
+        Returns the times at which each of the given sizes was reached.
+
+        In 'nearest' mode, this is the time of the log entry with the nearest
+        size, taking the earliest if more than one is equally near. In
+        'interpolate' mode, this is interpolated between the log entries either
+        side of the size, and clipped to the times of the first and last entries.
+
+        Args:
+            sizes (np.ndarray): The sizes to check for
+            tmpfile (str): The tempfile to check for
+
+        Returns:
+            np.ndarray: The datetime64 times at which the sizes were reached.
+        """
+        if self.mode == 'interpolate':
+            knot_sizes, knot_times = self._interpolation_knots(tmpfile)
+            if not len(knot_sizes):
+                raise ValueError(f'No data for {os.path.basename(tmpfile)}')
+
+            sizes = np.asarray(sizes, dtype=np.float64)
+
+            # Interpolate from the last knot below each size to the first at or
+            # above it, so that a size at the start of a stall takes the time
+            # it was first reached, and one past it the time the stall ended
+            above = np.searchsorted(knot_sizes, sizes, side='left')
+            below = np.maximum(above - 1, 0)
+            above = np.minimum(above, len(knot_sizes) - 1)
+            span = knot_sizes[above] - knot_sizes[below]
+            fraction = np.divide(sizes - knot_sizes[below], span,
+                                 out=np.ones_like(sizes), where=span > 0)
+            fraction = np.clip(fraction, 0, 1)
+
+            times = knot_times[below] + fraction * (knot_times[above] - knot_times[below])
+            return np.round(times).astype(np.int64).astype('datetime64[ns]')
+
+        log_sizes, log_times, is_sorted = self._lookup(tmpfile)
+        sizes = np.asarray(sizes, dtype=np.float64)
+
+        if not len(log_sizes):
+            raise ValueError(f'No data for {os.path.basename(tmpfile)}')
+
+        if not is_sorted:
+            # The tmpfile has been truncated or rewritten, so fall back to a
+            # brute force search for the nearest size
+            index = np.concatenate([
+                np.abs(log_sizes - sizes[i : i + 1024, np.newaxis]).argmin(axis=1)
+                for i in range(0, len(sizes), 1024)
+            ] or [np.empty(0, dtype=np.intp)])
+            return log_times[index]
+
+        n = len(log_sizes)
+        above = np.searchsorted(log_sizes, sizes, side='left')
+        below = above - 1
+
+        above_clipped = np.minimum(above, n - 1)
+        below_clipped = np.maximum(below, 0)
+        distance_above = np.where(above < n, log_sizes[above_clipped] - sizes, np.inf)
+        distance_below = np.where(below >= 0, sizes - log_sizes[below_clipped], np.inf)
+
+        # On a tie, the earlier entry, and the first of any repeated sizes, wins
+        first_below = np.searchsorted(log_sizes, log_sizes[below_clipped], side='left')
+        index = np.where(distance_below <= distance_above, first_below, above_clipped)
+
+        return log_times[index]
+
     def time_at_size(self, size: int, tmpfile: str='') -> pd.Timestamp:
         """
         Returns the time at which the given size was reached.
@@ -93,14 +353,4 @@ class Timer:
         Returns:
             pd.Timestamp: The nearest time to which the given size was reached.
         """
-        
-        # get the index of self.df where the size is closest to the requested size
-        if tmpfile:
-            tmpfile = os.path.basename(tmpfile)
-            return self.df[self.df.tmpfile == tmpfile]['size'].sub(size).abs().idxmin()
-        return self.df['size'].sub(size).abs().idxmin()
-            
-        
-
-        
-
+        return pd.Timestamp(self.times_at_sizes(np.array([size]), tmpfile)[0])